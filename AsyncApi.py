@@ -0,0 +1,293 @@
+"""
+asyncio API for translation and execution.
+
+The blocking work (parsing/rendering big queries, sqlite3 calls) runs on a BoundedExecutor: a fixed
+number of threads, with callers beyond that waiting on the event loop for a free slot. Many concurrent
+requests then share a fixed thread budget and the event loop is never blocked.
+
+Usage:
+    sql = await mongo_to_sql_async('db.user.find({id: 1})')
+
+    async with AsyncSqliteExecutor('app.db', pool_size=4) as executor:
+        async for document in executor.find('db.user.find({age: {$gt: 21}})').batch_size(500):
+            ...
+        documents = await executor.find('db.user.find({})').to_list()
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import weakref
+
+from Main import mongo_to_sql
+from SqliteExecutor import SqliteExecutor, DEFAULT_POOL_SIZE, DEFAULT_BATCH_SIZE
+
+DEFAULT_MAX_WORKERS = 4
+# queries shorter than this are translated on the event loop. Handing them to a thread costs more
+INLINE_MAX_LENGTH = 2048
+
+_default_executor = None
+
+
+class BoundedExecutor:
+    """
+    Runs blocking calls on max_workers threads. At most max_pending calls are submitted at a time; further
+    callers wait asynchronously for a slot, which gives backpressure instead of an unbounded work queue.
+    A slot is only freed when its call has finished, even if the awaiting task was cancelled.
+    """
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, max_pending: int = None):
+        """
+        :param max_workers: number of threads
+        :param max_pending: max calls submitted at a time (running or queued). Defaults to max_workers
+        """
+        assert max_workers > 0, 'max_workers must be positive'
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max_workers
+        self._threads = ThreadPoolExecutor(max_workers, thread_name_prefix='mongo-sql')
+        self._slots = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore (they belong to one loop)
+
+    def _semaphore(self, loop) -> asyncio.Semaphore:
+        """
+        :param loop: the running event loop
+        :return: the semaphore limiting the calls made from that loop
+        """
+        semaphore = self._slots.get(loop)
+        if semaphore is None:
+            semaphore = self._slots[loop] = asyncio.Semaphore(self.max_pending)
+        return semaphore
+
+    async def run(self, function, *args):
+        """
+        Run function(*args) on a thread once a slot is free
+        :param function: blocking callable
+        :param args: its arguments
+        :return: its return value (exceptions are raised here)
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore(loop)
+        await semaphore.acquire()
+        try:
+            future = self._threads.submit(function, *args)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:  # the loop is closed, nothing waits on the semaphore anymore
+                pass
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the threads
+        :param wait: wait for the running calls to finish
+        """
+        self._threads.shutdown(wait)
+
+
+def default_executor() -> BoundedExecutor:
+    """
+    :return: the BoundedExecutor shared by the calls that are not given one
+    """
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = BoundedExecutor()
+    return _default_executor
+
+
+async def mongo_to_sql_async(mongo: str, executor: BoundedExecutor = None, **options):
+    """
+    Async mongo_to_sql. Queries longer than INLINE_MAX_LENGTH are translated on the executor threads.
+
+    Ex/ await mongo_to_sql_async('db.user.find({id: 1})', paramstyle='qmark')
+    :param mongo: mongo query
+    :param executor: optional BoundedExecutor. Defaults to a shared one
+    :param options: keyword arguments of mongo_to_sql (cache, paramstyle, in_threshold, optimize, ...)
+    :return: see mongo_to_sql
+    """
+    if len(mongo) < INLINE_MAX_LENGTH:
+        return mongo_to_sql(mongo, **options)
+    return await (executor or default_executor()).run(_translate, mongo, options)
+
+
+def _translate(mongo: str, options: dict):
+    """
+    mongo_to_sql with the keyword arguments in a dict (BoundedExecutor.run only passes positional arguments)
+    """
+    return mongo_to_sql(mongo, **options)
+
+
+class AsyncMongoCursor:
+    """
+    Async version of MongoCursor. The query is translated and run on the executor when the first document
+    is read, then every batch is fetched on the executor too.
+
+    A cursor holds a pooled connection between batches, so it first waits (on the event loop, without
+    taking a thread) for one of the permits of its AsyncSqliteExecutor. Only cursors that are sure to get
+    a connection then occupy a thread. The permit is given back once the cursor is exhausted or closed.
+
+    Ex/ async for document in cursor: ...  or  await cursor.to_list()
+    """
+    def __init__(self, executor: SqliteExecutor, threads: BoundedExecutor, mongo: str,
+                 batch_size: int = DEFAULT_BATCH_SIZE, after=None, permits=None):
+        """
+        :param executor: the synchronous executor that translates and runs the query
+        :param threads: executor to run the blocking calls on
+        :param mongo: mongo query
+        :param batch_size: rows fetched per round trip
+        :param after: keyset pagination. see SqliteExecutor.find
+        :param permits: optional callable returning the asyncio.Semaphore of connections of the running loop
+        """
+        assert batch_size > 0, 'batch_size must be positive'
+        self._executor = executor
+        self._threads = threads
+        self._mongo = mongo
+        self._batch_size = batch_size
+        self._after = after
+        self._permits = permits
+        self._permit = None  # the semaphore a permit was taken from, until it is given back
+        self._lock = asyncio.Lock()  # one read or close at a time: they share the connection
+        self._started = False
+        self._cursor = None
+        self._documents = deque()
+        self._closed = False
+
+    def batch_size(self, size: int):
+        """
+        Set the number of rows fetched per round trip. Must be called before the first read.
+        :param size: positive row count
+        :return: this cursor, so calls can be chained
+        """
+        assert not self._started, 'cannot change the batch size of a cursor that has started'
+        assert size > 0, 'batch_size must be positive'
+        self._batch_size = size
+        return self
+
+    def _open(self) -> list:
+        """
+        Translate and run the query. Runs on an executor thread
+        :return: the first batch
+        """
+        self._cursor = self._executor.find(self._mongo, self._batch_size, self._after)
+        return self._cursor.next_batch()
+
+    def _release_permit(self):
+        """
+        Give the connection permit back. Safe to call more than once
+        """
+        permit, self._permit = self._permit, None
+        if permit is not None:
+            permit.release()
+
+    async def _read(self) -> list:
+        """
+        Read the next batch on the executor, opening the cursor first if needed
+        :return: list of documents, empty once the cursor is exhausted
+        """
+        async with self._lock:
+            if self._closed or (self._cursor is not None and not self._cursor.alive):
+                return []
+            if not self._started:
+                self._started = True
+                if self._permits is not None:
+                    permit = self._permits()
+                    await permit.acquire()
+                    self._permit = permit
+            try:
+                documents = await self._threads.run(self._open if self._cursor is None else self._cursor.next_batch)
+            except BaseException:
+                if self._cursor is None or not self._cursor.alive:  # the connection went back to the pool
+                    self._release_permit()
+                raise
+            if not self._cursor.alive:
+                self._release_permit()
+            return documents
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if not self._documents:
+            self._documents.extend(await self._read())
+            if not self._documents:
+                raise StopAsyncIteration
+        return self._documents.popleft()
+
+    async def to_list(self) -> list:
+        """
+        :return: all remaining documents
+        """
+        return [document async for document in self]
+
+    async def close(self):
+        """
+        Stop reading and give the connection back to the pool. Waits for a batch being read, then closes
+        on the executor since the connection must not be used from two threads at once. Safe to call more than once
+        """
+        self._closed = True
+        self._documents.clear()
+        async with self._lock:
+            if self._cursor is not None and self._cursor.alive:
+                await self._threads.run(self._cursor.close)
+            self._release_permit()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class AsyncSqliteExecutor:
+    """
+    Async version of SqliteExecutor. By default it gets one thread per pooled connection.
+    Cursors wait for a connection on the event loop (see AsyncMongoCursor), so a thread is never blocked
+    waiting for a connection that another cursor holds between batches.
+    """
+    def __init__(self, database: str, pool_size: int = DEFAULT_POOL_SIZE, threads: BoundedExecutor = None,
+                 **executor_kwargs):
+        """
+        :param database: sqlite3 database path or URI
+        :param pool_size: maximum number of open connections
+        :param threads: optional BoundedExecutor to share with other code. Defaults to pool_size threads
+        :param executor_kwargs: other SqliteExecutor arguments (optimize, in_threshold, in_strategy, timeout, ...)
+        """
+        self.executor = SqliteExecutor(database, pool_size, **executor_kwargs)
+        self._own_threads = threads is None
+        self.threads = threads or BoundedExecutor(pool_size)
+        self._permits = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore of pool_size connections
+
+    def _connection_permits(self) -> asyncio.Semaphore:
+        """
+        :return: the semaphore counting the free connections for the cursors of the running loop
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = self._permits.get(loop)
+        if semaphore is None:
+            semaphore = self._permits[loop] = asyncio.Semaphore(self.executor.pool.size)
+        return semaphore
+
+    def find(self, mongo: str, batch_size: int = DEFAULT_BATCH_SIZE, after=None) -> AsyncMongoCursor:
+        """
+        :param mongo: mongo find/count/distinct query
+        :param batch_size: rows fetched per round trip
+        :param after: keyset pagination. see SqliteExecutor.find
+        :return: lazy AsyncMongoCursor. Nothing runs until it is iterated. Exhaust or close it to free its connection
+        """
+        return AsyncMongoCursor(self.executor, self.threads, mongo, batch_size, after, self._connection_permits)
+
+    async def close(self):
+        """
+        Close the connection pool (and the threads, unless they were shared)
+        """
+        self.executor.close()
+        if self._own_threads:
+            self.threads.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
@@ -0,0 +1,236 @@
+"""
+Evaluate mongo queries over in-memory columns (a mapping of field name -> NumPy array) without going
+through SQL. The conditions become vectorized boolean masks: comparisons are array comparisons, $in is
+np.isin, and $and/$or are & and | of the masks of their branches. The projection selects columns.
+
+The result is the rows the translated SQL would return:
+    * null is None in object arrays and NaN in float arrays. A comparison with a null never matches,
+      except {a: null} and {a: {$ne: null}} (IS NULL / IS NOT NULL)
+    * a missing column raises KeyError, like an unknown column in SQL
+    * values of another type than the column never match $eq/$in ('1' is not 1), and order comparisons
+      between them raise TypeError
+    * sort columns cannot hold None
+
+NumPy is only needed by this module.
+
+Usage:
+    columns = {'id': np.arange(5), 'age': np.array([30, 12, 45, 20, 61])}
+    evaluate('db.user.find({age: {$gte: 20}}, {id: 1}).sort({age: -1})', columns)  # {'id': array([4, 2, 0, 3])}
+    evaluate('db.user.count({age: {$lt: 18}})', columns)  # 1
+    condition_mask({'age': {'$in': [12, 20]}}, columns)  # array([False, True, False, True, False])
+"""
+import numpy as np
+
+from MongoConstants import MONGO_LESS_THAN, MONGO_LESS_THAN_EQ, MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ, \
+    MONGO_NOT_EQUAL, MONGO_EQUAL, MONGO_ASCENDING
+from mongo_to_python.MongoQueryParser import MongoQuery, parse, FIND, COUNT
+from mongo_to_python.QueryAst import Node, FieldPredicate, In, Between, And, Or, from_dict
+from mongo_to_python.QueryOptimizer import optimize_query
+
+_COMPARISONS = {MONGO_EQUAL: np.equal, MONGO_NOT_EQUAL: np.not_equal, MONGO_LESS_THAN: np.less,
+                MONGO_LESS_THAN_EQ: np.less_equal, MONGO_GREATER_THAN: np.greater,
+                MONGO_GREATER_THAN_EQ: np.greater_equal}
+_NUMERIC_KINDS = 'biuf'  # dtype kinds of bool, int, unsigned and float arrays
+_TEXT_KINDS = 'US'
+_END = object()  # marks an exhausted iterator in condition_mask
+
+
+def _row_count(columns: dict) -> int:
+    """
+    :param columns: field name -> array
+    :return: number of rows. Every column must have it
+    """
+    assert columns, 'need at least one column'
+    sizes = set(map(len, columns.values()))
+    assert len(sizes) == 1, f'All columns must have the same length, got {sorted(sizes)}'
+    return sizes.pop()
+
+
+def null_mask(column: np.ndarray):
+    """
+    :param column: array
+    :return: boolean mask of the null rows (None in object arrays, NaN in float arrays).
+        None if the dtype cannot hold nulls
+    """
+    kind = column.dtype.kind
+    if kind == 'O':
+        return np.equal(column, None)
+    elif kind == 'f':
+        return np.isnan(column)
+    return None
+
+
+def _comparable(column: np.ndarray, value) -> bool:
+    """
+    :return: False if the value has another type than the values of the column (Ex/ a string for an int column)
+    """
+    kind = column.dtype.kind
+    if kind in _NUMERIC_KINDS:
+        return type(value) != str
+    elif kind in _TEXT_KINDS:
+        return type(value) == str
+    return True
+
+
+def _compare(column: np.ndarray, operator: str, value) -> np.ndarray:
+    """
+    Ex/ ([1, 5, None], '$gt', 2) -> [False, True, False]
+    :param column: array
+    :param operator: one of QueryAst.FIELD_OPERATORS
+    :param value: primitive
+    :return: mask of the rows where the comparison is true
+    """
+    null = null_mask(column)
+    if value is None:  # only IS NULL / IS NOT NULL can be true
+        if operator == MONGO_EQUAL:
+            return np.zeros(len(column), bool) if null is None else null
+        elif operator == MONGO_NOT_EQUAL:
+            return np.ones(len(column), bool) if null is None else ~null
+        return np.zeros(len(column), bool)
+    if not _comparable(column, value) and operator in (MONGO_EQUAL, MONGO_NOT_EQUAL):
+        if operator == MONGO_EQUAL:
+            return np.zeros(len(column), bool)
+        return np.ones(len(column), bool) if null is None else ~null
+    comparison = _COMPARISONS[operator]
+    if null is None or column.dtype.kind == 'f':  # NaN already compares false, except for !=
+        mask = comparison(column, value)
+        return mask & ~null if operator == MONGO_NOT_EQUAL and null is not None else mask
+    mask = np.zeros(len(column), bool)  # None cannot be compared, only the other rows are
+    valid = ~null
+    mask[valid] = comparison(column[valid], value)
+    return mask
+
+
+def _in(column: np.ndarray, values: tuple) -> np.ndarray:
+    """
+    :param column: array
+    :param values: $in values
+    :return: mask of the rows whose value is in values. null is never in the list (x IN (NULL) is not true)
+    """
+    if column.dtype.kind == 'O':
+        value_set = frozenset(x for x in values if x is not None)
+        return np.fromiter(map(value_set.__contains__, column), bool, len(column))
+    values = [x for x in values if x is not None and _comparable(column, x)]
+    if not values:
+        return np.zeros(len(column), bool)
+    return np.isin(column, values)
+
+
+def _leaf_mask(node: Node, columns: dict, size: int) -> np.ndarray:
+    """
+    :param node: FieldPredicate, In, Between or Never
+    :param columns: field name -> array
+    :param size: number of rows
+    :return: mask of the rows matching the node
+    """
+    node_type = type(node)
+    if node_type == FieldPredicate:
+        return _compare(columns[node.field], node.operator, node.literal.value)
+    elif node_type == In:
+        return _in(columns[node.field], node.values)
+    elif node_type == Between:
+        column = columns[node.field]
+        return _compare(column, MONGO_GREATER_THAN_EQ, node.low.value) & \
+            _compare(column, MONGO_LESS_THAN_EQ, node.high.value)
+    return np.zeros(size, bool)  # Never
+
+
+def condition_mask(conditions, columns: dict) -> np.ndarray:
+    """
+    Ex/ ({a: {$gt: 1}, $or: [{b: 1}, {b: 2}]}, columns) -> (a > 1) & ((b == 1) | (b == 2))
+    Junctions are folded into one mask each, in place, and stop early once the mask is all False ($and)
+    or all True ($or). Walked with an explicit stack, so deep queries do not hit the recursion limit.
+    :param conditions: query AST, or mongo query arg encoded as dict
+    :param columns: field name -> array. All of the same length
+    :return: boolean array, True for the rows that match
+    """
+    node = conditions if isinstance(conditions, Node) else from_dict(conditions)
+    size = _row_count(columns)
+    if type(node) != And and type(node) != Or:
+        return _leaf_mask(node, columns, size)
+    # frames: [iterator of the children, is an And, mask folded so far]
+    stack = [[iter(node.children), type(node) == And, np.full(size, type(node) == And)]]
+    while True:
+        children, is_and, mask = stack[-1]
+        decided = not mask.any() if is_and else mask.all()
+        child = _END if decided else next(children, _END)
+        if child is _END:
+            stack.pop()
+            if not stack:
+                return mask
+            child_mask = mask
+        elif type(child) == And or type(child) == Or:
+            stack.append([iter(child.children), type(child) == And, np.full(size, type(child) == And)])
+            continue
+        else:
+            child_mask = _leaf_mask(child, columns, size)
+        parent = stack[-1]
+        (np.logical_and if parent[1] else np.logical_or)(parent[2], child_mask, out=parent[2])
+
+
+def _sorted_rows(rows: np.ndarray, sort: list, columns: dict) -> np.ndarray:
+    """
+    :param rows: indexes of the matching rows
+    :param sort: list of (field, MONGO_ASCENDING or MONGO_DESCENDING)
+    :return: rows in sort order. Ties keep their order
+    """
+    keys = []
+    for field, direction in reversed(sort):  # np.lexsort sorts by the last key first
+        _, ranks = np.unique(columns[field][rows], return_inverse=True)
+        keys.append(ranks if direction == MONGO_ASCENDING else -ranks)
+    return rows[np.lexsort(keys)]
+
+
+def _selected_fields(projection: dict, columns: dict) -> list:
+    """
+    Ex/ {name: 1, age: 1} -> ['name', 'age'], {age: 0} -> every column but age, None -> every column
+    Unlike SQL, exclusions work since every column is known
+    """
+    if not projection:
+        return list(columns)
+    included = [field for field, value in projection.items() if value]
+    if included:
+        assert len(included) == len(projection), 'Cannot mix inclusion and exclusion in a projection'
+        return included
+    return [field for field in columns if field not in projection]
+
+
+def _distinct(column: np.ndarray) -> np.ndarray:
+    """
+    :return: the distinct values of the column in order of first appearance
+    """
+    if column.dtype.kind == 'O':  # may hold None, which cannot be sorted
+        return np.array(list(dict.fromkeys(column.tolist())), dtype=object)
+    _, first = np.unique(column, return_index=True)
+    return column[np.sort(first)]
+
+
+def evaluate(query, columns: dict, optimize: bool = False):
+    """
+    Run a query over columns. see the module docstring
+    :param query: MongoQuery or mongo query string (find, count or distinct)
+    :param columns: field name -> array. All of the same length
+    :param optimize: simplify the conditions first (see QueryOptimizer). A query that can never match
+        returns without evaluating anything
+    :return: find: dict of the projected field -> array of the matching rows (sorted, skipped and limited).
+        count: number of matching rows. distinct: array of the distinct values of the field
+    """
+    if not isinstance(query, MongoQuery):
+        query = parse(query)
+    if optimize:
+        optimize_query(query)
+    if optimize and query.provably_empty:
+        rows = np.zeros(0, np.intp)
+    else:
+        rows = np.flatnonzero(condition_mask(query.where, columns))
+    if query.sort:
+        rows = _sorted_rows(rows, query.sort, columns)
+    if query.skip:
+        rows = rows[query.skip:]
+    if query.limit:
+        rows = rows[:query.limit]
+    if query.operation == FIND:
+        return {field: columns[field][rows] for field in _selected_fields(query.projection, columns)}
+    elif query.operation == COUNT:
+        return len(rows)
+    return _distinct(columns[query.distinct_field][rows])
@@ -0,0 +1,135 @@
+"""
+Precompiled query templates for hot query shapes.
+
+A template is a mongo query with named placeholders ($name, unquoted) in place of values. It is parsed
+and rendered once into an SQL skeleton. Binding values then only fills in the literals, so a call costs
+O(number of literals) instead of a parse and a render.
+
+Usage:
+    query = compile_query('db.user.find({age: {$gt: $min_age}, name: $name})')
+    query.render(min_age=21, name='Ann')  # "SELECT * FROM user WHERE (age > 21) AND (name = 'Ann');"
+    query = compile_query('db.user.find({age: {$gt: $min_age}})', paramstyle='qmark')
+    query.bind({'min_age': 21})  # ('SELECT * FROM user WHERE (age > ?);', (21,))
+
+Placeholders stand for single non null values, also inside $in lists ({id: {$in: [$a, $b]}}).
+Null is not allowed since it changes the SQL (= becomes IS). The query is not optimized, since the
+optimizer would need the values.
+"""
+from mongo_to_python.MongoQueryParser import parse
+from mongo_to_python.MongoToPythonType import is_primitive
+from mongopython_to_sql.Dialect import Dialect, get_dialect
+from mongopython_to_sql.RenderContext import RenderContext
+from mongopython_to_sql.SqlFromDict import sql_from_mongo
+
+# rendered in place of every literal of the skeleton. Templates cannot contain it, so it marks the slots
+SLOT_MARKER = '\0'
+
+
+class _SkeletonContext(RenderContext):
+    """
+    Binds every literal (constants and placeholders) and renders SLOT_MARKER in its place
+    """
+    @property
+    def parameterized(self) -> bool:
+        return True
+
+    def bind(self, value) -> str:
+        self.params.append(value)
+        return SLOT_MARKER
+
+
+def _placeholder_value(name: str) -> str:
+    """
+    :param name: placeholder name
+    :return: the string the placeholder is parsed as. The marker keeps it apart from any string of the template
+    """
+    return SLOT_MARKER + name
+
+
+class CompiledQuery:
+    """
+    A query template parsed and rendered once, ready to be bound with values.
+
+    names: the placeholder names in order of first appearance
+    """
+    __slots__ = ('template', 'query', 'paramstyle', 'dialect', 'names', '_sql', '_pieces', '_slots')
+
+    def __init__(self, template: str, paramstyle: str = None, dialect: Dialect = None):
+        """
+        :param template: mongo find/count/distinct query with $name placeholders
+        :param paramstyle: optional placeholder style of the SQL. see mongo_to_sql
+        :param dialect: optional Dialect, or one of SqlConstants.DIALECTS. Defaults to generic SQL
+        """
+        if SLOT_MARKER in template:
+            raise ValueError('A query template cannot contain NUL chars')
+        self.template = template
+        self.paramstyle = paramstyle
+        self.dialect = get_dialect(dialect)
+        self.query = parse(template, _placeholder_value)
+        context = _SkeletonContext(dialect=self.dialect)
+        skeleton, values = sql_from_mongo(self.query, context=context)
+        pieces = skeleton.split(SLOT_MARKER)
+        assert len(pieces) == len(values) + 1, 'Placeholders are only supported as query values'
+        # slots: (placeholder name, None) or (None, constant value), one per literal
+        slots = [(x[len(SLOT_MARKER):], None) if type(x) == str and x.startswith(SLOT_MARKER) else (None, x)
+                 for x in values]
+        self.names = tuple(dict.fromkeys(name for name, _ in slots if name is not None))
+        self._sql = None
+        if paramstyle is None:
+            # render the constants now. Only the placeholders are left between the pieces
+            self._pieces = [pieces[0]]
+            self._slots = []
+            for (name, value), piece in zip(slots, pieces[1:]):
+                if name is None:
+                    self._pieces[-1] += self.dialect.literal(value) + piece
+                else:
+                    self._slots.append(name)
+                    self._pieces.append(piece)
+        else:  # the SQL is final, only the params change
+            placeholders = RenderContext(paramstyle, dialect=self.dialect)
+            self._sql = pieces[0] + ''.join(placeholders.bind(value) + piece
+                                            for (_, value), piece in zip(slots, pieces[1:]))
+            self._pieces = None
+            self._slots = slots
+
+    def bind(self, values: dict):
+        """
+        :param values: dict of placeholder name -> non null primitive. Every placeholder needs a value
+        :return: SQL query, or (SQL query, params) when the query has a paramstyle
+        """
+        missing = [name for name in self.names if name not in values]
+        assert not missing, f'No value for the placeholders {missing}'
+        for name in self.names:
+            value = values[name]
+            assert is_primitive(value) and value is not None, f'{name} must be a non null primitive, got {value!r}'
+        if self.paramstyle is None:
+            pieces = self._pieces
+            literal = self.dialect.literal
+            sql = [pieces[0]]
+            for name, piece in zip(self._slots, pieces[1:]):
+                sql.append(literal(values[name]))
+                sql.append(piece)
+            return ''.join(sql)
+        return self._sql, tuple(value if name is None else values[name] for name, value in self._slots)
+
+    def render(self, **values):
+        """
+        Ex/ compile_query('db.user.find({id: $id})').render(id=1) -> 'SELECT * FROM user WHERE (id = 1);'
+        :param values: placeholder values by name
+        :return: see bind
+        """
+        return self.bind(values)
+
+    def __repr__(self):
+        return f'CompiledQuery({self.template!r}, paramstyle={self.paramstyle!r}, dialect={self.dialect.name!r})'
+
+
+def compile_query(template: str, paramstyle: str = None, dialect: Dialect = None) -> CompiledQuery:
+    """
+    Parse and render a query template once. see CompiledQuery
+    :param template: mongo query with $name placeholders. Ex/ 'db.user.find({age: {$gt: $min_age}})'
+    :param paramstyle: optional placeholder style of the SQL (qmark, format or dollar)
+    :param dialect: optional SQL dialect (sqlite, postgres or mysql). Defaults to generic SQL
+    :return: CompiledQuery
+    """
+    return CompiledQuery(template, paramstyle, dialect)
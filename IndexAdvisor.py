@@ -0,0 +1,262 @@
+"""
+Recommend SQL indexes from a log of mongo find queries.
+
+Every query is parsed and optimized, then its conditions are walked to count how each column is used
+(equality, IN, range or other) and which combination of columns (its shape) each query filters on.
+Each shape becomes a CREATE INDEX recommendation with the equality columns first, then the IN columns,
+then a single range column, since an index can only seek on the columns after the last range column.
+Recommendations are ranked by the number of queries they serve.
+
+Usage:
+    python IndexAdvisor.py --input queries.txt [-0] [--top 10]
+OR
+    advisor = IndexAdvisor()
+    for mongo in log: advisor.add_mongo(mongo)
+    for recommendation in advisor.recommend(): print(recommendation.statement)
+"""
+from collections import Counter
+import argparse
+import re
+import sys
+
+from Main import read_records
+from MongoConstants import MONGO_EQUAL, MONGO_LESS_THAN, MONGO_LESS_THAN_EQ, MONGO_GREATER_THAN, \
+    MONGO_GREATER_THAN_EQ
+from mongo_to_python.MongoQueryParser import MongoQuery, parse
+from mongo_to_python.QueryAst import Node, FieldPredicate, In, Between, And, Or
+from mongo_to_python.QueryOptimizer import optimize_query
+
+# how a predicate uses its column
+USAGE_EQUALITY = 'equality'  # {a: 1}, {a: null}
+USAGE_IN = 'in'  # {a: {$in: [1, 2]}}
+USAGE_RANGE = 'range'  # {a: {$gt: 1}}, BETWEEN
+USAGE_OTHER = 'other'  # $ne, which an index cannot seek on
+USAGES = (USAGE_EQUALITY, USAGE_IN, USAGE_RANGE, USAGE_OTHER)
+
+RANGE_OPERATORS = (MONGO_LESS_THAN, MONGO_LESS_THAN_EQ, MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ)
+INDEX_PREFIX = 'idx'
+_NAME_UNSAFE = re.compile(r'\W+')
+
+
+def predicate_usage(node: Node) -> str:
+    """
+    :param node: FieldPredicate, In or Between
+    :return: one of USAGES
+    """
+    if type(node) == In:
+        return USAGE_IN
+    elif type(node) == Between or node.operator in RANGE_OPERATORS:
+        return USAGE_RANGE
+    elif node.operator == MONGO_EQUAL:
+        return USAGE_EQUALITY
+    return USAGE_OTHER
+
+
+class IndexRecommendation:
+    """
+    A suggested index and the number of logged queries it would serve.
+    """
+    __slots__ = ('table', 'columns', 'queries')
+
+    def __init__(self, table: str, columns: tuple, queries: int):
+        self.table = table
+        self.columns = columns
+        self.queries = queries
+
+    @property
+    def name(self) -> str:
+        """
+        :return: index name. Ex/ 'idx_user_name_age'
+        """
+        return _NAME_UNSAFE.sub('_', '_'.join((INDEX_PREFIX, self.table) + self.columns))
+
+    @property
+    def statement(self) -> str:
+        """
+        :return: Ex/ 'CREATE INDEX IF NOT EXISTS idx_user_name_age ON user (name, age);'
+        """
+        return f'CREATE INDEX IF NOT EXISTS {self.name} ON {self.table} ({", ".join(self.columns)});'
+
+    def __repr__(self):
+        return f'IndexRecommendation({self.table!r}, {self.columns!r}, queries={self.queries})'
+
+
+class IndexAdvisor:
+    """
+    Aggregates the predicate usage of many queries.
+
+    usage: (table, column) -> Counter of USAGES
+    shapes: (table, equality columns, IN columns, range columns) -> number of queries with that shape.
+        The column groups are sorted tuples so that {a: 1, b: 2} and {b: 2, a: 1} share a shape
+    """
+    def __init__(self):
+        self.usage = {}
+        self.shapes = Counter()
+        self.queries = 0
+        self.failed = 0
+
+    def add_mongo(self, mongo: str) -> bool:
+        """
+        Parse a query and add it. Queries that fail to parse are counted in failed and otherwise ignored
+        :param mongo: mongo find query
+        :return: True if the query was added
+        """
+        try:
+            query = parse(mongo)
+        except (ValueError, AssertionError):
+            self.failed += 1
+            return False
+        self.add(query)
+        return True
+
+    def add(self, query: MongoQuery):
+        """
+        Count the predicates of a parsed query. The query is optimized first (see QueryOptimizer)
+        so equivalent conditions are counted the same way.
+        :param query: parsed mongo query. Its where is replaced by the optimized AST
+        """
+        optimize_query(query)
+        self.queries += 1
+        if query.provably_empty:
+            return  # never reaches the database
+        self._add_node(query.table, query.where)
+
+    def _add_node(self, table: str, node: Node):
+        """
+        Count the predicates of a conjunction and record its shape. The branches of an $or are shapes of
+        their own when the conjunction has nothing an index can seek on (SQLite can use one index per branch).
+        Walked with an explicit stack, so deep queries do not hit the recursion limit.
+        :param table: table the query runs against
+        :param node: optimized query AST node
+        """
+        # tasks, run in order: (_add_node, node), (_add_shape, predicates) or (_count_usage, node)
+        stack = [(self._add_node, node)]
+        while stack:
+            task, item = stack.pop()
+            if task != self._add_node:
+                task(table, item)
+                continue
+            predicates = []
+            junctions = []
+            tasks = []
+            for child in (item.children if type(item) == And else (item,)):
+                if type(child) == Or:
+                    junctions.append(child)
+                elif type(child) == And:  # a grouping the optimizer left in place
+                    tasks.append((self._add_node, child))
+                elif type(child) in (FieldPredicate, In, Between):
+                    predicates.append(child)
+            tasks.append((self._add_shape, predicates))
+            for junction in junctions:
+                # the $or only filters the rows the index found. Count usage, no shape
+                tasks.extend((self._count_usage if predicates else self._add_node, x) for x in junction.children)
+            stack.extend(reversed(tasks))
+
+    def _add_shape(self, table: str, predicates: list):
+        """
+        Count the predicates of a conjunction and record its shape
+        :param table: table the query runs against
+        :param predicates: FieldPredicate, In and Between of the conjunction
+        """
+        columns = {usage: set() for usage in USAGES}
+        for predicate in predicates:
+            usage = predicate_usage(predicate)
+            self.usage.setdefault((table, predicate.field), Counter())[usage] += 1
+            columns[usage].add(predicate.field)
+        # a column both compared for equality and ranged over is sought on by the equality
+        columns[USAGE_IN] -= columns[USAGE_EQUALITY]
+        columns[USAGE_RANGE] -= columns[USAGE_EQUALITY] | columns[USAGE_IN]
+        if columns[USAGE_EQUALITY] or columns[USAGE_IN] or columns[USAGE_RANGE]:
+            self.shapes[(table, tuple(sorted(columns[USAGE_EQUALITY])), tuple(sorted(columns[USAGE_IN])),
+                         tuple(sorted(columns[USAGE_RANGE])))] += 1
+
+    def _count_usage(self, table: str, node: Node):
+        """
+        Count the predicates of a subtree without recording shapes
+        :param table: table the query runs against
+        :param node: optimized query AST node
+        """
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if type(node) == And or type(node) == Or:
+                stack.extend(reversed(node.children))
+            elif type(node) in (FieldPredicate, In, Between):
+                self.usage.setdefault((table, node.field), Counter())[predicate_usage(node)] += 1
+
+    def _column_order(self, table: str, columns: tuple) -> list:
+        """
+        :param table: table name
+        :param columns: columns of one usage group
+        :return: the columns, most used first (ties by name)
+        """
+        return sorted(columns, key=lambda column: (-sum(self.usage[(table, column)].values()), column))
+
+    def recommend(self, limit: int = None) -> list:
+        """
+        Build the ranked index recommendations.
+
+        Column order: equality columns, then IN columns, then the most used range column
+        (an index cannot seek past its first range column). An index whose columns are a prefix of
+        another recommended index on the same table is folded into the longer one.
+        :param limit: optional max number of recommendations
+        :return: list of IndexRecommendation, most queries served first
+        """
+        indexes = Counter()  # (table, columns) -> queries
+        for (table, equality, in_columns, range_columns), count in self.shapes.items():
+            columns = self._column_order(table, equality) + self._column_order(table, in_columns)
+            columns += self._column_order(table, range_columns)[:1]
+            indexes[(table, tuple(columns))] += count
+        folded = Counter()
+        for (table, columns), count in sorted(indexes.items(), key=lambda x: -len(x[0][1])):
+            longer = [key for key in folded if key[0] == table and key[1][:len(columns)] == columns]
+            folded[longer[0] if longer else (table, columns)] += count
+        ranked = sorted(folded.items(), key=lambda x: (-x[1], x[0]))
+        return [IndexRecommendation(table, columns, count) for (table, columns), count in ranked[:limit]]
+
+    def report(self, limit: int = None) -> str:
+        """
+        :param limit: optional max number of recommendations
+        :return: human readable column usage table followed by the recommended statements
+        """
+        lines = [f'{self.queries} queries ({self.failed} failed to parse)', '',
+                 f'{"table.column":<40}' + ''.join(f'{usage:>10}' for usage in USAGES)]
+        for (table, column), counter in sorted(self.usage.items(), key=lambda x: (-sum(x[1].values()), x[0])):
+            lines.append(f'{table + "." + column:<40}' + ''.join(f'{counter[usage]:>10}' for usage in USAGES))
+        lines.append('')
+        for recommendation in self.recommend(limit):
+            lines.append(f'-- serves {recommendation.queries} queries')
+            lines.append(recommendation.statement)
+        return '\n'.join(lines)
+
+
+def main(argv: list = None) -> int:
+    """
+    Command line entrypoint.
+
+    python IndexAdvisor.py [--input FILE] [-0] [--top N] < queries.txt
+
+    :param argv: command line arguments without the program name. Defaults to sys.argv[1:]
+    :return: exit code
+    """
+    arg_parser = argparse.ArgumentParser(description='Recommend SQL indexes for a log of MongoDB find() calls')
+    arg_parser.add_argument('--input', help='file to read queries from (default stdin), one per line')
+    arg_parser.add_argument('-0', '--null', action='store_true', dest='nul_delimited',
+                            help='records are NUL delimited instead of newline delimited')
+    arg_parser.add_argument('--top', type=int, help='max number of recommendations')
+    args = arg_parser.parse_args(argv)
+
+    advisor = IndexAdvisor()
+    source = open(args.input, newline='' if args.nul_delimited else None) if args.input else sys.stdin
+    try:
+        for _, mongo in read_records(source, args.nul_delimited):
+            advisor.add_mongo(mongo)
+    finally:
+        if args.input:
+            source.close()
+    print(advisor.report(args.top))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,29 +19,322 @@ Output:
       Ex/ SELECT * FROM user;
 """
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, tee
+import argparse
+import os
+import sys
+import time
+
+from mongo_to_python.KeysetPagination import seek_after
 from mongo_to_python.MongoQueryParser import parse
+from mongo_to_python.QueryOptimizer import optimize_query
+from mongopython_to_sql.RenderContext import RenderContext
 from mongopython_to_sql.SqlFromDict import sql_from_mongo
-import sys
+from SqlConstants import IN_STRATEGY_TEMP_TABLE
+from StageProfiler import StageProfiler, active_profiler, count_nodes, STAGE_PARSE, STAGE_SEEK, STAGE_OPTIMIZE, \
+    STAGE_RENDER
+from TranslationCache import TranslationCache
+
+DEFAULT_CHUNKSIZE = 256
+READ_BLOCK_SIZE = 1 << 16  # chars read at a time when splitting NUL delimited input
+NUL = '\0'
 
 
-def mongo_to_sql(mongo: str) -> str:
+def mongo_to_sql(mongo: str, cache: TranslationCache = None, paramstyle: str = None, in_threshold: int = None,
+                 in_strategy: str = None, optimize: bool = False, after=None, dialect: str = None):
     """
-    Main function. Takes a mongo find query and produces the equivalent SQL
+    Main function. Takes a mongo find (or count/distinct) query and produces the equivalent SQL
 
     Example:
     input: 'db.user.find({id: true})'
     output: 'SELECT * FROM user WHERE (id = TRUE);'
 
+    With paramstyle='qmark' the same input gives ('SELECT * FROM user WHERE (id = ?);', (True,))
+
     :param mongo: mongo find query
-    :return: SQL select query
+    :param cache: optional TranslationCache to look the query up in before translating
+    :param paramstyle: optional placeholder style (qmark, format or dollar). Literals are returned as bound params
+    :param in_threshold: $in lists with more values than this are rendered with in_strategy. None always inlines
+    :param in_strategy: one of the in_strategies of the dialect. Defaults to its first (inline for generic SQL).
+        temp_table needs a RenderContext, see SqlFromDict.to_sql
+    :param optimize: simplify the conditions before rendering (see QueryOptimizer)
+    :param after: keyset pagination. The last document of the previous page (or its sort values) of a sorted
+        query. The query then seeks past it instead of skipping rows (see KeysetPagination)
+    :param dialect: optional SQL dialect (sqlite, postgres or mysql, see mongopython_to_sql.Dialect).
+        Defaults to generic SQL
+    :return: SQL select query, or (SQL select query, params) when a paramstyle is given
     """
-    return sql_from_mongo(parse(mongo))
+    assert in_strategy != IN_STRATEGY_TEMP_TABLE, 'the temp_table strategy requires to_sql with a RenderContext'
+    options = (paramstyle, in_threshold, in_strategy, optimize, dialect, after)
+    if cache is not None:
+        return cache.get_or_translate(mongo, lambda m: _translate(m, *options),
+                                      options=options[:-1] + (_after_key(after),))
+    return _translate(mongo, *options)
 
 
-if __name__ == '__main__':
-    if len(sys.argv) > 1:
-        mongo_call = sys.argv[1]
-        print(mongo_to_sql(mongo_call))
-    else:
+def _after_key(after):
+    """
+    :param after: the after arg of mongo_to_sql. A document (dict), its sort values or None
+    :return: after as a hashable cache key
+    """
+    if after is None:
+        return None
+    elif isinstance(after, dict):
+        return tuple(after.items())
+    return tuple(after)
+
+
+def _translate(mongo: str, paramstyle: str = None, in_threshold: int = None, in_strategy: str = None,
+               optimize: bool = False, dialect: str = None, after=None):
+    """
+    Uncached translation. see mongo_to_sql
+    """
+    profiler = active_profiler()
+    if profiler is not None:
+        return _translate_profiled(profiler, mongo, paramstyle, in_threshold, in_strategy, optimize, dialect, after)
+    query = parse(mongo)
+    if after is not None:
+        seek_after(query, after)
+    if optimize:
+        optimize_query(query)
+    return sql_from_mongo(query, context=RenderContext(paramstyle, in_threshold, in_strategy, dialect))
+
+
+def _translate_profiled(profiler: StageProfiler, mongo: str, paramstyle: str, in_threshold: int, in_strategy: str,
+                        optimize: bool, dialect: str, after):
+    """
+    _translate, recording every stage in profiler
+    """
+    with profiler.stage(STAGE_PARSE, len(mongo)) as timing:
+        query = parse(mongo)
+        timing.output_size = count_nodes(query.where)
+    if after is not None:
+        with profiler.stage(STAGE_SEEK, timing.output_size) as timing:
+            seek_after(query, after)
+            timing.output_size = count_nodes(query.where)
+    if optimize:
+        with profiler.stage(STAGE_OPTIMIZE, timing.output_size) as timing:
+            optimize_query(query)
+            timing.output_size = count_nodes(query.where)
+    with profiler.stage(STAGE_RENDER, timing.output_size) as timing:
+        result = sql_from_mongo(query, context=RenderContext(paramstyle, in_threshold, in_strategy, dialect))
+        timing.output_size = len(result if paramstyle is None else result[0])
+    return result
+
+
+class TranslationResult:
+    """
+    The outcome of translating one query in a batch.
+    Exactly one of sql/error is set, so a malformed query does not abort the rest of the batch.
+    """
+    __slots__ = ('mongo', 'sql', 'error')
+
+    def __init__(self, mongo: str, sql: str = None, error: Exception = None):
+        self.mongo = mongo
+        self.sql = sql
+        self.error = error
+
+    def __bool__(self) -> bool:
+        """
+        Useful for the common shorthand of 'if result'
+        :return: True if the translation succeeded
+        """
+        return self.error is None
+
+    def __repr__(self):
+        outcome = f'sql={self.sql!r}' if self else f'error={self.error!r}'
+        return f'TranslationResult(mongo={self.mongo!r}, {outcome})'
+
+
+def _translate_chunk(mongo_calls: list) -> list:
+    """
+    Translate a chunk of queries, capturing errors per query. Runs inside the worker processes.
+
+    :param mongo_calls: list of mongo find queries
+    :return: list of TranslationResult in the same order
+    """
+    results = []
+    for mongo in mongo_calls:
+        try:
+            results.append(TranslationResult(mongo, sql=mongo_to_sql(mongo)))
+        except Exception as e:  # report anything the parser/renderer raises against this query only
+            results.append(TranslationResult(mongo, error=e))
+    return results
+
+
+def _chunked(iterable, size: int):
+    """
+    :param iterable: any iterable
+    :param size: max length of each chunk
+    :return: generator of lists with up to size members
+    """
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def mongo_to_sql_many(mongo_calls, workers: int = None, chunksize: int = DEFAULT_CHUNKSIZE):
+    """
+    Translate many mongo find queries, spreading the parsing and SQL rendering over a process pool.
+
+    Results are yielded lazily in input order. The input is consumed a few chunks ahead of the
+    results, so memory stays bounded even for very large iterables.
+
+    Example:
+    input: ['db.user.find({id: 1})', 'db.user.find({id: })']
+    output: TranslationResult(sql='SELECT * FROM user WHERE (id = 1);'), TranslationResult(error=ValueError(...))
+
+    :param mongo_calls: iterable of mongo find queries
+    :param workers: number of worker processes. Defaults to the cpu count. 1 translates in this process
+    :param chunksize: number of queries sent to a worker at a time
+    :return: generator of TranslationResult
+    """
+    assert chunksize > 0, 'chunksize must be positive'
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunked(mongo_calls, chunksize)
+    if workers == 1:  # no point paying for process startup and pickling
+        for chunk in chunks:
+            yield from _translate_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()  # futures in input order
+        for chunk in chunks:
+            pending.append(pool.submit(_translate_chunk, chunk))
+            if len(pending) >= 2 * workers:  # keep every worker busy without reading the whole input
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def read_records(source, nul_delimited: bool = False):
+    """
+    Lazily split a text stream into queries. Blank records are skipped.
+    Only one line (or one NUL delimited record plus a read block) is held in memory at a time.
+
+    :param source: readable text stream (Ex/ sys.stdin or an open file)
+    :param nul_delimited: split on NUL chars instead of newlines
+    :return: generator of (record number starting at 1, query)
+    """
+    if not nul_delimited:
+        for number, line in enumerate(source, 1):
+            if line.strip():
+                yield number, line.strip()
+        return
+    number = 0
+    pending = []  # the blocks of the record that is not complete yet. Only joined once its NUL is read
+    block = source.read(READ_BLOCK_SIZE)
+    while block:
+        if NUL not in block:
+            pending.append(block)
+        else:
+            records = block.split(NUL)
+            pending.append(records[0])
+            records[0] = ''.join(pending)
+            pending = [records.pop()]
+            for record in records:
+                number += 1
+                if record.strip():
+                    yield number, record.strip()
+        block = source.read(READ_BLOCK_SIZE)
+    remainder = ''.join(pending)
+    if remainder.strip():  # the last record does not need a trailing NUL
+        yield number + 1, remainder.strip()
+
+
+def stream_translate(source, out, err, nul_delimited: bool = False, workers: int = 1,
+                     chunksize: int = DEFAULT_CHUNKSIZE) -> tuple:
+    """
+    Translate every query in source and write the SQL to out as it is produced.
+    Failures are written to err with their record number and do not stop the stream.
+    A summary with the throughput is written to err at the end.
+
+    :param source: readable text stream of queries, one per line (or NUL delimited)
+    :param out: writable text stream for the SQL, one statement per line (or NUL delimited)
+    :param err: writable text stream for failures and the summary
+    :param nul_delimited: records are delimited by NUL instead of newline in both source and out
+    :param workers: worker processes. see mongo_to_sql_many
+    :param chunksize: queries per worker task. see mongo_to_sql_many
+    :return: (number translated, number failed)
+    """
+    return translate_records(read_records(source, nul_delimited), out, err, NUL if nul_delimited else '\n',
+                             workers, chunksize)
+
+
+def translate_records(records, out, err, delimiter: str = '\n', workers: int = 1,
+                      chunksize: int = DEFAULT_CHUNKSIZE) -> tuple:
+    """
+    Translate numbered queries and write the SQL to out as it is produced. see stream_translate
+
+    :param records: iterable of (record number, query). Ex/ read_records or QueryLog.queries
+    :param out: writable text stream for the SQL, one statement per record
+    :param err: writable text stream for failures and the summary
+    :param delimiter: written after each statement
+    :param workers: worker processes. see mongo_to_sql_many
+    :param chunksize: queries per worker task. see mongo_to_sql_many
+    :return: (number translated, number failed)
+    """
+    start = time.perf_counter()
+    translated = 0
+    failed = 0
+    # one copy of the records is used for the line numbers, the other is translated.
+    # tee only buffers the records that are in flight.
+    numbered, to_translate = tee(records)
+    results = mongo_to_sql_many((query for _, query in to_translate), workers=workers, chunksize=chunksize)
+    for (number, _), result in zip(numbered, results):
+        if result:
+            translated += 1
+            out.write(result.sql + delimiter)
+        else:
+            failed += 1
+            err.write(f'line {number}: {type(result.error).__name__}: {result.error}\n')
+    out.flush()
+    elapsed = time.perf_counter() - start
+    rate = (translated + failed) / elapsed if elapsed else 0.0
+    err.write(f'translated {translated}, failed {failed} in {elapsed:.3f}s ({rate:.0f} queries/s)\n')
+    return translated, failed
+
+
+def main(argv: list = None) -> int:
+    """
+    Command line entrypoint.
+
+    python Main.py 'db.user.find({})'
+    python Main.py --stream [--input FILE] [-0] [--workers N] < queries.txt
+
+    :param argv: command line arguments without the program name. Defaults to sys.argv[1:]
+    :return: exit code
+    """
+    arg_parser = argparse.ArgumentParser(description='Convert MongoDB find() calls to SQL SELECT queries')
+    arg_parser.add_argument('query', nargs='?', help='a single mongo find query')
+    arg_parser.add_argument('--stream', action='store_true',
+                            help='translate queries read from --input (default stdin), one per line')
+    arg_parser.add_argument('--input', help='file to read queries from in --stream mode')
+    arg_parser.add_argument('-0', '--null', action='store_true', dest='nul_delimited',
+                            help='records are NUL delimited instead of newline delimited')
+    arg_parser.add_argument('--workers', type=int, default=1, help='worker processes for --stream mode')
+    arg_parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                            help='queries sent to a worker at a time in --stream mode')
+    args = arg_parser.parse_args(argv)
+
+    if args.stream:
+        source = open(args.input, newline='' if args.nul_delimited else None) if args.input else sys.stdin
+        try:
+            _, failed = stream_translate(source, sys.stdout, sys.stderr, args.nul_delimited, args.workers,
+                                         args.chunksize)
+        finally:
+            if args.input:
+                source.close()
+        return 1 if failed else 0
+    if args.query is None:
         print('Supply mongo find query as first arg')
+        return 0
+    print(mongo_to_sql(args.query))
+    return 0
 
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,9 +3,12 @@ MONGO_LESS_THAN_EQ = '$lte'
 MONGO_GREATER_THAN = '$gt'
 MONGO_GREATER_THAN_EQ = '$gte'
 MONGO_NOT_EQUAL = '$ne'
+MONGO_EQUAL = '$eq'
 MONGO_IN = '$in'
 MONGO_OR = '$or'
 MONGO_AND = '$and'
 MONGO_FALSE = 'false'
 MONGO_TRUE = 'true'
 MONGO_NULL = 'null'
+MONGO_ASCENDING = 1  # sort directions
+MONGO_DESCENDING = -1
@@ -0,0 +1,301 @@
+"""
+Compile mongo filters into Python predicates, to filter streams of documents (dicts) with the same
+queries that are translated to SQL.
+
+The condition tree is compiled once into nested closures with the constants bound in, so filtering a
+document only runs the closures: no node is inspected per document.
+    * $in becomes a frozenset lookup
+    * $and/$or short-circuit, with their cheapest conditions tested first (equality and $in before
+      ranges, leaves before nested junctions). Nested $and in $and (and $or in $or) are flattened
+    * conditions that can never match (an empty $in, a range against null) compile to a constant,
+      which decides an $and
+
+A document matches when the translated SQL would return its row. A missing field is null, and a
+comparison with null only matches {a: null} and {a: {$ne: null}} (IS NULL / IS NOT NULL). A value that
+cannot be ordered against the constant (Ex/ a string against a number) does not match a range.
+
+Usage:
+    predicate = compile_predicate({'age': {'$gt': 20}, 'name': {'$in': ['Ann', 'Bob']}})
+    predicate({'age': 30, 'name': 'Ann'})  # True
+    for document in filter_documents('db.user.find({age: {$gt: 20}}, {name: 1}).limit(5)', documents):
+        print(document)  # lazy: the documents are read one at a time
+OR
+    python PredicateCompiler.py 'db.user.find({age: {$gt: 20}})' [--input documents.jsonl] > matches.jsonl
+"""
+import argparse
+from itertools import islice
+import json
+import operator
+import sys
+
+from MongoConstants import MONGO_LESS_THAN, MONGO_LESS_THAN_EQ, MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ, \
+    MONGO_NOT_EQUAL, MONGO_EQUAL
+from mongo_to_python.MongoQueryParser import MongoQuery, parse, FIND
+from mongo_to_python.QueryAst import Node, FieldPredicate, In, Between, And, Or, from_dict
+
+_ORDERINGS = {MONGO_LESS_THAN: operator.lt, MONGO_LESS_THAN_EQ: operator.le, MONGO_GREATER_THAN: operator.gt,
+              MONGO_GREATER_THAN_EQ: operator.ge}
+# relative cost of testing a node, used to order the conditions of a junction
+COST_EQUALITY = 1  # $eq, $ne, null checks and $in: one lookup and one hash or compare
+COST_RANGE = 2  # guarded against values that cannot be ordered
+COST_JUNCTION = 1  # added to the cost of the children of a nested $and/$or
+
+
+def _never(document: dict) -> bool:
+    return False
+
+
+def _always(document: dict) -> bool:
+    return True
+
+
+def _compile_comparison(node: FieldPredicate):
+    """
+    :param node: FieldPredicate
+    :return: (predicate, cost)
+    """
+    field = node.field
+    value = node.literal.value
+    if value is None:
+        if node.operator == MONGO_EQUAL:
+            return (lambda document: document.get(field) is None), COST_EQUALITY
+        elif node.operator == MONGO_NOT_EQUAL:
+            return (lambda document: document.get(field) is not None), COST_EQUALITY
+        return _never, 0  # a < NULL is never true
+    if node.operator == MONGO_EQUAL:  # a value never equals None, so null rows are left out
+        return (lambda document: document.get(field) == value), COST_EQUALITY
+    elif node.operator == MONGO_NOT_EQUAL:
+        def not_equal(document: dict) -> bool:
+            x = document.get(field)
+            return x is not None and x != value
+        return not_equal, COST_EQUALITY
+    compare = _ORDERINGS[node.operator]
+
+    def ordered(document: dict) -> bool:
+        x = document.get(field)
+        try:
+            return x is not None and compare(x, value)
+        except TypeError:  # Ex/ '5' > 1
+            return False
+    return ordered, COST_RANGE
+
+
+def _compile_in(node: In):
+    """
+    :param node: In
+    :return: (predicate, cost)
+    """
+    field = node.field
+    values = frozenset(x for x in node.values if x is not None)  # x IN (NULL) is never true
+    if not values:
+        return _never, 0
+
+    def contained(document: dict) -> bool:
+        try:
+            return document.get(field) in values
+        except TypeError:  # unhashable value. Ex/ a list
+            return False
+    return contained, COST_EQUALITY
+
+
+def _compile_between(node: Between):
+    """
+    :param node: Between
+    :return: (predicate, cost)
+    """
+    field = node.field
+    low = node.low.value
+    high = node.high.value
+
+    def between(document: dict) -> bool:
+        x = document.get(field)
+        try:
+            return x is not None and low <= x <= high
+        except TypeError:
+            return False
+    return between, COST_RANGE
+
+
+def _compile_leaf(node: Node):
+    """
+    :param node: FieldPredicate, In, Between or Never
+    :return: (predicate, cost)
+    """
+    node_type = type(node)
+    if node_type == FieldPredicate:
+        return _compile_comparison(node)
+    elif node_type == In:
+        return _compile_in(node)
+    elif node_type == Between:
+        return _compile_between(node)
+    return _never, 0
+
+
+def _junction(is_and: bool, parts: list):
+    """
+    Ex/ (True, [a, b]) -> lambda document: a(document) and b(document)
+    :param is_and: And (else Or)
+    :param parts: compiled children, cheapest first. At least two
+    :return: the predicate of the junction. Specialized for two children
+    """
+    predicates = tuple(part[0] for part in parts)
+    if len(predicates) == 2:
+        first, second = predicates
+        if is_and:
+            return lambda document: first(document) and second(document)
+        return lambda document: first(document) or second(document)
+    elif is_and:
+        def conjunction(document: dict) -> bool:
+            for predicate in predicates:
+                if not predicate(document):
+                    return False
+            return True
+        return conjunction
+
+    def disjunction(document: dict) -> bool:
+        for predicate in predicates:
+            if predicate(document):
+                return True
+        return False
+    return disjunction
+
+
+def _closed(compiled: tuple) -> tuple:
+    """
+    :param compiled: compiled node. see compile_predicate
+    :return: the compiled node with its predicate. The predicate of a junction is built here, once no more
+        children can be flattened into it
+    """
+    predicate, cost, is_and, parts = compiled
+    if predicate is not None:
+        return compiled
+    parts.sort(key=lambda x: x[1])
+    return _junction(is_and, parts), cost, is_and, parts
+
+
+def _compile_junction(is_and: bool, children: list) -> tuple:
+    """
+    :param is_and: And (else Or)
+    :param children: compiled children. see compile_predicate
+    :return: compiled junction, without its predicate (see _closed). A junction left with one child is that child
+    """
+    decisive, neutral = (_never, _always) if is_and else (_always, _never)
+    if any(child[0] is decisive for child in children):  # Ex/ a condition that never matches in an $and
+        return decisive, 0, None, None
+    # the children of a nested junction of the same kind join this one. The longest list is extended in place,
+    # so a chain of nested $or is flattened in linear time
+    nested = [child for child in children if child[2] == is_and]
+    longest = max(nested, key=lambda x: len(x[3])) if nested else (None, COST_JUNCTION, None, [])
+    parts = longest[3]
+    cost = longest[1]
+    others = []
+    for child in children:
+        if child[3] is parts:
+            continue
+        elif child[2] == is_and:
+            parts.extend(child[3])
+            cost += child[1] - COST_JUNCTION
+        elif child[0] is not neutral:  # a condition that always matches is dropped from an $and
+            others.append(child)
+            cost += child[1]
+    if len(parts) + len(others) == 0:
+        return neutral, 0, None, None
+    elif len(parts) + len(others) == 1:  # left open, so it can still be flattened into its parent
+        return (parts or others)[0]
+    parts.extend(map(_closed, others))
+    return None, cost, is_and, parts
+
+
+def compile_predicate(conditions):
+    """
+    Ex/ compile_predicate({'a': 1, '$or': [{'b': {'$gt': 2}}, {'c': None}]}) -> predicate(document) -> bool
+    Compiled with an explicit stack (post order), so deep queries do not hit the recursion limit. Calling the
+    predicate nests one call per alternation of $and and $or.
+    :param conditions: query AST, mongo query arg encoded as dict, or the query arg in mongo syntax ('{a: 1}')
+    :return: function of a document (dict) that returns True if the document matches
+    """
+    if type(conditions) == str:
+        conditions = parse(f'db.t.find({conditions})').where
+    node = conditions if isinstance(conditions, Node) else from_dict(conditions)
+    # compiled nodes: (predicate, cost, True for And/False for Or/None for the rest, compiled children of a junction)
+    # the predicate of a junction is None until it is closed
+    compiled = []
+    stack = [(node, False)]
+    while stack:
+        node, expanded = stack.pop()
+        node_type = type(node)
+        if node_type != And and node_type != Or:
+            compiled.append((*_compile_leaf(node), None, None))
+        elif not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+        else:
+            first = len(compiled) - len(node.children)
+            children = compiled[first:]
+            del compiled[first:]
+            compiled.append(_compile_junction(node_type == And, children))
+    return _closed(compiled[0])[0]
+
+
+def _projector(projection: dict):
+    """
+    :param projection: mongo projection. Inclusions keep only the fields present in the document
+    :return: function of a document that returns the projected document, None for no projection
+    """
+    if not projection:
+        return None
+    included = tuple(field for field, value in projection.items() if value)
+    if included:
+        assert len(included) == len(projection), 'Cannot mix inclusion and exclusion in a projection'
+        return lambda document: {field: document[field] for field in included if field in document}
+    excluded = frozenset(projection)
+    return lambda document: {field: value for field, value in document.items() if field not in excluded}
+
+
+def filter_documents(query, documents):
+    """
+    Ex/ filter_documents('db.user.find({age: {$gt: 20}}).limit(2)', iter(users)) -> the first two users over 20
+    :param query: mongo find query (str or MongoQuery), or a query arg (AST or dict) to only filter
+    :param documents: iterable of dicts. Read lazily, and not past the limit
+    :return: iterator of the matching documents (projected, skipped and limited like the query)
+    """
+    if type(query) == str:
+        query = parse(query)
+    if not isinstance(query, MongoQuery):
+        return filter(compile_predicate(query), documents)
+    assert query.operation == FIND, 'Only find queries return documents'
+    assert not query.sort, 'Sorting needs the whole stream, sort the result instead'
+    matches = filter(compile_predicate(query.where), documents)
+    if query.skip or query.limit:
+        matches = islice(matches, query.skip or 0, (query.skip or 0) + query.limit if query.limit else None)
+    projector = _projector(query.projection)
+    return matches if projector is None else map(projector, matches)
+
+
+def main(argv: list = None) -> int:
+    """
+    Command line entrypoint. Filter JSON documents (one per line) with a mongo find query.
+
+    python PredicateCompiler.py QUERY [--input FILE]
+
+    :param argv: command line arguments without the program name. Defaults to sys.argv[1:]
+    :return: exit code
+    """
+    arg_parser = argparse.ArgumentParser(description='Filter JSON lines with a MongoDB find() call')
+    arg_parser.add_argument('query', help="Ex/ 'db.user.find({age: {$gt: 20}}, {name: 1})'")
+    arg_parser.add_argument('--input', help='file of JSON documents, one per line. Defaults to stdin')
+    args = arg_parser.parse_args(argv)
+
+    source = open(args.input) if args.input else sys.stdin
+    try:
+        documents = (json.loads(line) for line in source if line.strip())
+        for document in filter_documents(args.query, documents):
+            sys.stdout.write(json.dumps(document) + '\n')
+    finally:
+        if args.input:
+            source.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Query fingerprints and per shape statistics.
+
+The shape of a query is the query with its literals replaced by '?': the table, the operation, the conditions
+(with the keys of each dict and the branches of each $and/$or in a canonical order), the projection, the sort
+and whether there is a limit/skip. $in lists keep only their size bucket (see in_bucket) so lists of similar
+sizes share a shape. null is kept, since comparing with null renders different SQL.
+
+    db.user.find({name: "Ann", age: {$gt: 20}})  and  db.user.find({age: {$gt: 65}, name: "Bob"})
+        -> find user where AND(FIELD(age $gt ?), name $eq ?)
+
+The fingerprint is a stable hash of the shape (the same in every process), and ShapeStatistics aggregates
+the calls and time per fingerprint, like pg_stat_statements does for SQL.
+
+Usage:
+    statistics = ShapeStatistics()
+    sql = statistics.translate('db.user.find({id: 1})')  # times mongo_to_sql
+    executor = SqliteExecutor('app.db', statistics=statistics)  # times the database work of each cursor
+    print(statistics.report(10))
+"""
+from contextlib import contextmanager
+import hashlib
+import threading
+import time
+
+from Main import mongo_to_sql
+from MongoConstants import MONGO_IN
+from mongo_to_python.MongoQueryParser import MongoQuery, parse, DISTINCT, LIMIT, SKIP, SORT
+from mongo_to_python.QueryAst import Node, FieldPredicate, In, Between, And, Or, GROUP_DOCUMENT, GROUP_FIELD, \
+    GROUP_EXPLICIT
+
+FINGERPRINT_SIZE = 8  # bytes of the hash. 16 hex chars
+SHAPE_PLACEHOLDER = '?'
+DEFAULT_MAX_SHAPES = 5000  # like pg_stat_statements.max
+EVICT_FRACTION = 0.05  # share of the least called shapes dropped at once when a new shape does not fit
+# labels of the junctions in the shape text
+_JUNCTION_LABELS = {GROUP_DOCUMENT: 'AND', GROUP_FIELD: 'FIELD', GROUP_EXPLICIT: GROUP_EXPLICIT}
+_OR_LABEL = 'OR'
+
+
+def in_bucket(size: int) -> int:
+    """
+    Ex/ 1 -> 1, 3 -> 4, 4 -> 4, 5 -> 8, 1000 -> 1024
+    :param size: number of values in a $in list
+    :return: the smallest power of two >= size (0 for an empty list)
+    """
+    return 1 << (size - 1).bit_length() if size else 0
+
+
+def _leaf_shape(node: Node) -> str:
+    """
+    :param node: FieldPredicate, In, Between or Never
+    :return: the node with its literals replaced
+    """
+    node_type = type(node)
+    if node_type == FieldPredicate:
+        value = 'null' if node.literal.value is None else SHAPE_PLACEHOLDER
+        return f'{node.field} {node.operator} {value}'
+    elif node_type == In:
+        return f'{node.field} {MONGO_IN}[{in_bucket(len(node.values))}]'
+    elif node_type == Between:
+        return f'{node.field} BETWEEN {SHAPE_PLACEHOLDER} AND {SHAPE_PLACEHOLDER}'
+    return 'NEVER'
+
+
+def where_shape(node: Node) -> str:
+    """
+    Ex/ {b: 1, $or: [{a: null}, {a: {$in: [1, 2, 3]}}]} -> 'AND(OR(AND(FIELD(a $in[4])), AND(a $eq null)), b $eq ?)'
+    Walked with an explicit stack (post order), so deep queries do not hit the recursion limit.
+    :param node: query AST
+    :return: the conditions with their literals replaced and the children of each junction sorted
+    """
+    shapes = []  # shapes of the completed nodes. The children of a junction end up last, in order
+    stack = [(node, False)]
+    while stack:
+        node, expanded = stack.pop()
+        node_type = type(node)
+        if node_type != And and node_type != Or:
+            shapes.append(_leaf_shape(node))
+        elif not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+        else:
+            first = len(shapes) - len(node.children)
+            children = ', '.join(sorted(shapes[first:]))
+            del shapes[first:]
+            label = _OR_LABEL if node_type == Or else _JUNCTION_LABELS[node.grouping]
+            shapes.append(f'{label}({children})')
+    return shapes[0]
+
+
+def query_shape(query: MongoQuery) -> str:
+    """
+    Ex/ db.user.find({age: {$gt: 20}}, {name: 1}).sort({age: -1}).limit(5)
+        -> 'find user where AND(FIELD(age $gt ?)) fields name 1 sort age -1 limit ?'
+    :param query: parsed mongo query
+    :return: the shape text. see the module docstring
+    """
+    parts = [query.operation, query.table]
+    if query.operation == DISTINCT:
+        parts.append(f'field {query.distinct_field}')
+    parts.append(f'where {where_shape(query.where)}')
+    if query.projection:
+        fields = ', '.join(f'{field} {int(bool(query.projection[field]))}' for field in sorted(query.projection))
+        parts.append(f'fields {fields}')
+    if query.sort:
+        parts.append(f'{SORT} {", ".join(f"{field} {direction}" for field, direction in query.sort)}')
+    if query.limit:
+        parts.append(f'{LIMIT} {SHAPE_PLACEHOLDER}')
+    if query.skip:
+        parts.append(f'{SKIP} {SHAPE_PLACEHOLDER}')
+    return ' '.join(parts)
+
+
+def fingerprint(shape: str) -> str:
+    """
+    :param shape: query shape text (see query_shape)
+    :return: stable hex hash of the shape
+    """
+    return hashlib.blake2b(shape.encode(), digest_size=FINGERPRINT_SIZE).hexdigest()
+
+
+def fingerprint_query(query: MongoQuery) -> str:
+    """
+    :param query: parsed mongo query
+    :return: the fingerprint of its shape
+    """
+    return fingerprint(query_shape(query))
+
+
+class ShapeStat:
+    """
+    Calls and time of one query shape.
+    example: the first query seen with the shape, if one was given
+    """
+    __slots__ = ('fingerprint', 'shape', 'example', 'calls', 'total_seconds', 'min_seconds', 'max_seconds')
+
+    def __init__(self, shape: str, example: str = None):
+        self.fingerprint = fingerprint(shape)
+        self.shape = shape
+        self.example = example
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.min_seconds = float('inf')
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float):
+        """
+        :param seconds: time of one call
+        """
+        self.calls += 1
+        self.total_seconds += seconds
+        if seconds < self.min_seconds:
+            self.min_seconds = seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+
+    @property
+    def mean_seconds(self) -> float:
+        """
+        :return: average time of a call
+        """
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+    def to_dict(self) -> dict:
+        """
+        :return: fingerprint, shape, example, calls and the total/mean/min/max seconds
+        """
+        return {'fingerprint': self.fingerprint, 'shape': self.shape, 'example': self.example, 'calls': self.calls,
+                'total_seconds': self.total_seconds, 'mean_seconds': self.mean_seconds,
+                'min_seconds': self.min_seconds if self.calls else 0.0, 'max_seconds': self.max_seconds}
+
+    def __repr__(self):
+        return f'ShapeStat({self.shape!r}, calls={self.calls}, total_seconds={self.total_seconds:.6f})'
+
+
+class ShapeStatistics:
+    """
+    Aggregates the time of translations or executions per query shape. Safe to share between threads.
+
+    At most max_shapes shapes are kept. When a new shape does not fit, the least called EVICT_FRACTION
+    of the shapes are dropped (counted in evictions).
+    """
+    def __init__(self, max_shapes: int = DEFAULT_MAX_SHAPES):
+        assert max_shapes > 0, 'max_shapes must be positive'
+        self.max_shapes = max_shapes
+        self._shapes = {}  # fingerprint -> ShapeStat
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def record(self, shape: str, seconds: float, example: str = None):
+        """
+        Add one call of a shape
+        :param shape: query shape text (see query_shape)
+        :param seconds: time of the call
+        :param example: optional query text, kept for the first call of the shape
+        """
+        key = fingerprint(shape)
+        with self._lock:
+            stat = self._shapes.get(key)
+            if stat is None:
+                if len(self._shapes) >= self.max_shapes:
+                    self._evict()
+                stat = self._shapes[key] = ShapeStat(shape, example)
+            stat.add(seconds)
+
+    def record_query(self, query: MongoQuery, seconds: float, example: str = None):
+        """
+        Add one call of a parsed query. see record
+        """
+        self.record(query_shape(query), seconds, example)
+
+    def _evict(self):
+        """
+        Drop the least called shapes. Called with the lock held
+        """
+        count = max(1, int(len(self._shapes) * EVICT_FRACTION))
+        for stat in sorted(self._shapes.values(), key=lambda x: x.calls)[:count]:
+            del self._shapes[stat.fingerprint]
+        self.evictions += count
+
+    @contextmanager
+    def timed(self, shape: str, example: str = None):
+        """
+        Record the time of the with block under shape. Nothing is recorded if the block raises
+        Ex/ with statistics.timed(query_shape(query)): cursor.execute(sql)
+        :param shape: query shape text
+        :param example: optional query text
+        """
+        start = time.perf_counter()
+        yield
+        self.record(shape, time.perf_counter() - start, example)
+
+    def translate(self, mongo: str, **options):
+        """
+        mongo_to_sql, recording the time of the translation under the shape of the query.
+        The shape needs a parse of its own, which is not part of the recorded time
+        :param mongo: mongo query
+        :param options: mongo_to_sql keyword arguments
+        :return: the result of mongo_to_sql
+        """
+        start = time.perf_counter()
+        result = mongo_to_sql(mongo, **options)
+        seconds = time.perf_counter() - start
+        self.record(query_shape(parse(mongo)), seconds, mongo)
+        return result
+
+    def stats(self, order_by: str = 'total_seconds', limit: int = None) -> list:
+        """
+        :param order_by: ShapeStat.to_dict key to sort by, largest first. Ex/ 'calls' or 'mean_seconds'
+        :param limit: optional max number of shapes
+        :return: list of ShapeStat.to_dict
+        """
+        with self._lock:
+            stats = [stat.to_dict() for stat in self._shapes.values()]
+        return sorted(stats, key=lambda x: (-x[order_by], x['fingerprint']))[:limit]
+
+    def report(self, limit: int = None, order_by: str = 'total_seconds') -> str:
+        """
+        :param limit: optional max number of shapes
+        :param order_by: see stats
+        :return: human readable table of the shapes, most expensive first
+        """
+        lines = [f'{"fingerprint":16}  {"calls":>8}  {"total ms":>10}  {"mean ms":>9}  {"max ms":>9}  shape']
+        for stat in self.stats(order_by, limit):
+            lines.append(f'{stat["fingerprint"]:16}  {stat["calls"]:>8}  {stat["total_seconds"] * 1e3:>10.3f}  '
+                         f'{stat["mean_seconds"] * 1e3:>9.3f}  {stat["max_seconds"] * 1e3:>9.3f}  {stat["shape"]}')
+        return '\n'.join(lines)
+
+    def reset(self):
+        """
+        Forget every shape
+        """
+        with self._lock:
+            self._shapes.clear()
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self._shapes)
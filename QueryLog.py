@@ -0,0 +1,249 @@
+"""
+Memory mapped reader for big logs of mongo queries (one per line, or NUL delimited).
+
+The log is mapped instead of read, so the OS pages it in and out as needed and the file is never copied
+into Python memory. The records are found once and kept in a compact offset index (an array of the
+delimiter positions, 8 bytes per record). Records are handed out as zero copy memoryview slices of the
+mapping, and only decoded to str one at a time for translation.
+
+The index can be saved next to the log. Opening the log with it skips the scan of the indexed bytes (only
+what was appended since is scanned), and any range of records (Ex/ one shard of the log, or the records
+left after a crash) is read without touching the records before it.
+
+Usage:
+    with QueryLog('queries.log', index_path='queries.log.idx') as log:
+        start, stop = log.shard(0, 4)  # the first quarter of the records
+        for number, mongo in log.queries(start, stop):
+            print(number, mongo_to_sql(mongo))
+        log.save_index()
+OR
+    python QueryLog.py --input queries.log [--index queries.log.idx] [-0] [--shard 0 --shards 4] [--workers N]
+"""
+from array import array
+import argparse
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+from Main import translate_records, DEFAULT_CHUNKSIZE, NUL
+
+INDEX_MAGIC = b'MQLOGIDX'
+INDEX_VERSION = 1
+# magic, version, delimiter, crc32 of the start of the log, indexed bytes. Followed by the offsets
+_INDEX_HEADER = struct.Struct('<8sBcxxIQ')
+_CHECKED_PREFIX = 4096  # bytes at the start of the log covered by the crc32, to tell a rotated log from a grown one
+_OFFSET_TYPECODE = 'Q'  # unsigned 64 bit offsets, saved little endian
+
+
+class QueryLog:
+    """
+    A log of mongo queries mapped into memory, with an offset index of its records.
+
+    Records are numbered from 1 in file order like Main.read_records (blank records count), while the
+    start/stop arguments are 0 based record indexes. The mapping covers the file as it was when opened.
+    """
+    def __init__(self, path: str, nul_delimited: bool = False, index_path: str = None, encoding: str = 'utf-8'):
+        """
+        :param path: log file
+        :param nul_delimited: records are delimited by NUL instead of newline
+        :param index_path: optional index file (see save_index). Used if it exists and matches the log
+        :param encoding: text encoding of the log
+        """
+        self.path = path
+        self.index_path = index_path
+        self.encoding = encoding
+        self._delimiter = NUL.encode() if nul_delimited else b'\n'
+        self._file = open(path, 'rb')
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            # an empty file cannot be mapped
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        except BaseException:
+            self._file.close()
+            raise
+        self._ends = array(_OFFSET_TYPECODE)  # position of the delimiter of each complete record
+        self._indexed = 0  # bytes covered by _ends. The scan resumes here
+        self.index_loaded = index_path is not None and os.path.exists(index_path) and self._load_index(index_path)
+        self._saved = self._indexed  # indexed bytes in the index file
+        self._scan()
+
+    def _scan(self):
+        """
+        Add the complete records after the indexed bytes to the index
+        """
+        find = self._data.find
+        delimiter = self._delimiter
+        append = self._ends.append
+        position = self._indexed
+        end = find(delimiter, position)
+        while end >= 0:
+            append(end)
+            position = end + 1
+            end = find(delimiter, position)
+        self._indexed = position
+
+    def __len__(self) -> int:
+        """
+        :return: number of records, blank ones included. The last record does not need a delimiter
+        """
+        return len(self._ends) + (self._indexed < len(self._data))
+
+    @property
+    def index_outdated(self) -> bool:
+        """
+        :return: True if records were indexed since the index file was loaded or saved
+        """
+        return self._indexed != self._saved
+
+    def shard(self, index: int, count: int) -> tuple:
+        """
+        Ex/ a log of 10 records: shard(0, 3) -> (0, 3), shard(2, 3) -> (6, 10)
+        :param index: shard number, from 0
+        :param count: number of shards
+        :return: (start, stop) record indexes of the shard. The shards split the records evenly
+        """
+        assert 0 <= index < count, 'the shard index must be in range(count)'
+        total = len(self)
+        return total * index // count, total * (index + 1) // count
+
+    def records(self, start: int = 0, stop: int = None):
+        """
+        :param start: index of the first record
+        :param stop: index after the last record. None for the end of the log
+        :return: generator of (record number, memoryview of the record without its delimiter).
+            The views are slices of the mapping (nothing is copied). Release them before close
+        """
+        ends = self._ends
+        size = len(self._data)
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:  # the record before start may not exist. Ex/ start == len(self)
+            return
+        position = ends[start - 1] + 1 if start else 0
+        with memoryview(self._data) as view:
+            for i in range(start, stop):
+                end = ends[i] if i < len(ends) else size
+                yield i + 1, view[position:end]
+                position = end + 1
+
+    def queries(self, start: int = 0, stop: int = None):
+        """
+        Decode the records one at a time. Blank records are skipped. see Main.read_records
+        :param start: index of the first record
+        :param stop: index after the last record. None for the end of the log
+        :return: generator of (record number, query)
+        """
+        encoding = self.encoding
+        for number, record in self.records(start, stop):
+            with record:
+                query = str(record, encoding).strip()
+            if query:
+                yield number, query
+
+    def save_index(self, path: str = None):
+        """
+        Write the offset index. Only complete records are saved, so a log that is still being written
+        resumes from its last delimiter. The file is replaced in one rename, so a crash never leaves half an index.
+        :param path: index file. Defaults to index_path
+        """
+        path = path or self.index_path
+        assert path is not None, 'no index file given'
+        offsets = self._ends
+        if sys.byteorder != 'little':
+            offsets = array(_OFFSET_TYPECODE, offsets)
+            offsets.byteswap()
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as index_file:
+            index_file.write(_INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self._delimiter,
+                                                self._prefix_crc(self._indexed), self._indexed))
+            offsets.tofile(index_file)
+        os.replace(temp_path, path)
+        self._saved = self._indexed
+
+    def _load_index(self, path: str) -> bool:
+        """
+        :param path: index file written by save_index
+        :return: True if the index was used. An index of another log (or another delimiter) is ignored
+        """
+        with open(path, 'rb') as index_file:
+            header = index_file.read(_INDEX_HEADER.size)
+            if len(header) != _INDEX_HEADER.size:
+                return False
+            magic, version, delimiter, crc, indexed = _INDEX_HEADER.unpack(header)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION or delimiter != self._delimiter \
+                    or indexed > len(self._data) or crc != self._prefix_crc(indexed):
+                return False
+            ends = array(_OFFSET_TYPECODE)
+            try:
+                ends.frombytes(index_file.read())
+            except ValueError:  # truncated
+                return False
+        if sys.byteorder != 'little':
+            ends.byteswap()
+        # the last indexed record must still end where the index says
+        if (ends[-1] + 1 if ends else 0) != indexed or (ends and self._data[ends[-1]] != self._delimiter[0]):
+            return False
+        self._ends = ends
+        self._indexed = indexed
+        return True
+
+    def _prefix_crc(self, indexed: int) -> int:
+        """
+        :param indexed: indexed bytes
+        :return: crc32 of the indexed bytes at the start of the log (at most _CHECKED_PREFIX)
+        """
+        return zlib.crc32(self._data[:min(indexed, _CHECKED_PREFIX)])
+
+    def close(self):
+        """
+        Unmap and close the log. Raises BufferError while record views are still held
+        """
+        if type(self._data) == mmap.mmap:
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return f'QueryLog({self.path!r}, records={len(self)})'
+
+
+def main(argv: list = None) -> int:
+    """
+    Command line entrypoint. Translate the records of a log (or a range or shard of them) to SQL on stdout.
+
+    python QueryLog.py --input FILE [--index FILE] [-0] [--start N] [--stop M] [--shard I --shards N]
+
+    :param argv: command line arguments without the program name. Defaults to sys.argv[1:]
+    :return: exit code
+    """
+    arg_parser = argparse.ArgumentParser(description='Translate a log of MongoDB find() calls to SQL')
+    arg_parser.add_argument('--input', required=True, help='log file, one query per line')
+    arg_parser.add_argument('--index', help='offset index file. Created or updated when the log was scanned')
+    arg_parser.add_argument('-0', '--null', action='store_true', dest='nul_delimited',
+                            help='records are NUL delimited instead of newline delimited')
+    arg_parser.add_argument('--start', type=int, default=0, help='index of the first record to translate')
+    arg_parser.add_argument('--stop', type=int, help='index after the last record to translate')
+    arg_parser.add_argument('--shard', type=int, help='translate only this shard (from 0) of --shards')
+    arg_parser.add_argument('--shards', type=int, default=1, help='number of shards the log is split into')
+    arg_parser.add_argument('--workers', type=int, default=1, help='worker processes')
+    arg_parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                            help='queries sent to a worker at a time')
+    args = arg_parser.parse_args(argv)
+
+    with QueryLog(args.input, args.nul_delimited, args.index) as log:
+        if args.index and log.index_outdated:
+            log.save_index()
+        start, stop = (args.start, args.stop) if args.shard is None else log.shard(args.shard, args.shards)
+        _, failed = translate_records(log.queries(start, stop), sys.stdout, sys.stderr,
+                                      NUL if args.nul_delimited else '\n', args.workers, args.chunksize)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,13 @@
 from MongoConstants import MONGO_LESS_THAN, MONGO_LESS_THAN_EQ, \
-    MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ, MONGO_NOT_EQUAL
+    MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ, MONGO_NOT_EQUAL, MONGO_EQUAL
 
 OPERATOR_MAPPING = {
     MONGO_LESS_THAN: '<',
     MONGO_LESS_THAN_EQ: '<=',
     MONGO_GREATER_THAN: '>',
     MONGO_GREATER_THAN_EQ: '>=',
-    MONGO_NOT_EQUAL: '!='
+    MONGO_NOT_EQUAL: '!=',
+    MONGO_EQUAL: '=',
 }
 SQL_AND = "AND"
 SQL_OR = "OR"
@@ -14,5 +15,41 @@ SQL_IS = "IS"
 SQL_IS_NOT = "IS NOT"
 SQL_EQ = "="
 SQL_IN = "IN"
+SQL_BETWEEN = "BETWEEN"
+SQL_FALSE = "1 = 0"  # a condition no row satisfies
 SQL_NULL = 'NULL'
+SQL_ORDER_BY = 'ORDER BY'
+SQL_ASC = 'ASC'
+SQL_DESC = 'DESC'
+SQL_LIMIT = 'LIMIT'
+SQL_OFFSET = 'OFFSET'
+# SQLite requires a LIMIT before an OFFSET and reads a negative limit as no limit.
+# SQLite specific: PostgreSQL and MySQL reject LIMIT -1 (only skip() without limit() renders it)
+SQL_NO_LIMIT = '-1'
 SQL_ALL = '*'
+SQL_COUNT_ALL = 'COUNT(*)'
+SQL_AS = 'AS'
+SQL_COUNTED = 'counted'  # alias of the derived table a limited count counts (MySQL and PostgreSQL require one)
+SQL_DISTINCT = 'DISTINCT'
+
+# placeholder styles for parameterized output
+PARAMSTYLE_QMARK = 'qmark'  # ?
+PARAMSTYLE_FORMAT = 'format'  # %s
+PARAMSTYLE_DOLLAR = 'dollar'  # $1, $2, ...
+PARAMSTYLES = (PARAMSTYLE_QMARK, PARAMSTYLE_FORMAT, PARAMSTYLE_DOLLAR)
+
+# how a $in list above RenderContext.in_threshold is rendered
+IN_STRATEGY_INLINE = 'inline'  # col IN (1, 2, 3)
+IN_STRATEGY_JSON_EACH = 'json_each'  # col IN (SELECT value FROM json_each('[1, 2, 3]')). One literal/parameter
+IN_STRATEGY_VALUES = 'values'  # col IN (VALUES (1), (2), (3))
+IN_STRATEGY_TEMP_TABLE = 'temp_table'  # col IN (SELECT value FROM temp.<table>). The values are loaded separately
+IN_STRATEGY_ANY_ARRAY = 'any_array'  # col = ANY(ARRAY[1, 2, 3]), or col = ANY(?::bigint[]) with one array parameter
+IN_STRATEGIES = (IN_STRATEGY_INLINE, IN_STRATEGY_JSON_EACH, IN_STRATEGY_VALUES, IN_STRATEGY_TEMP_TABLE,
+                 IN_STRATEGY_ANY_ARRAY)
+
+# SQL flavors the query can be rendered in (see mongopython_to_sql.Dialect)
+DIALECT_GENERIC = 'generic'  # unquoted identifiers, TRUE/FALSE. The output before dialects existed
+DIALECT_SQLITE = 'sqlite'
+DIALECT_POSTGRES = 'postgres'
+DIALECT_MYSQL = 'mysql'
+DIALECTS = (DIALECT_GENERIC, DIALECT_SQLITE, DIALECT_POSTGRES, DIALECT_MYSQL)
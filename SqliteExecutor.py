@@ -0,0 +1,344 @@
+"""
+Run mongo find queries against sqlite3.
+
+Queries are translated with bound parameters and run on a pool of connections, so concurrent callers
+do not serialize on a single connection. Results come back through a lazy, mongo-like cursor that
+fetches batch_size rows at a time.
+
+Usage:
+    with SqliteExecutor('app.db', pool_size=4) as executor:
+        for document in executor.find('db.user.find({age: {$gt: 21}})').batch_size(500):
+            print(document['name'])
+
+Pass statistics=ShapeStatistics() to aggregate the database time of the queries per shape (see QueryFingerprint).
+"""
+from contextlib import contextmanager
+from functools import partial
+import queue
+import sqlite3
+import threading
+import time
+
+from mongo_to_python.KeysetPagination import seek_after
+from mongo_to_python.MongoQueryParser import parse, COUNT
+from mongo_to_python.QueryOptimizer import optimize_query
+from mongopython_to_sql.Dialect import SQLITE
+from mongopython_to_sql.RenderContext import RenderContext
+from mongopython_to_sql.SqlFromDict import sql_from_mongo
+from QueryFingerprint import ShapeStatistics, query_shape
+from SqlConstants import PARAMSTYLE_QMARK, IN_STRATEGY_JSON_EACH, SQL_COUNT_ALL
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_BATCH_SIZE = 100
+
+
+class ConnectionPool:
+    """
+    Bounded pool of sqlite3 connections. Connections are opened on demand, up to size, and handed out to
+    one caller at a time. Safe to share between threads.
+
+    Note: every connection to ':memory:' is a separate database. Use a file, or a shared cache URI
+    (Ex/ 'file:name?mode=memory&cache=shared' with uri=True), to share data between the connections.
+    """
+    def __init__(self, database: str, size: int = DEFAULT_POOL_SIZE, timeout: float = None, **connect_kwargs):
+        """
+        :param database: sqlite3 database path or URI
+        :param size: maximum number of open connections
+        :param timeout: seconds to wait for a free connection before acquire raises TimeoutError. None waits forever
+        :param connect_kwargs: extra sqlite3.connect arguments. Ex/ uri=True
+        """
+        assert size > 0, 'size must be positive'
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self._connect_kwargs = {**connect_kwargs, 'check_same_thread': False}
+        self._idle = queue.LifoQueue()  # the most recently used connection is handed out first
+        self._lock = threading.Lock()
+        self.created = 0
+        self._closed = False
+
+    @property
+    def idle(self) -> int:
+        """
+        :return: number of open connections that are not in use
+        """
+        return self._idle.qsize()
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Take a connection out of the pool, opening a new one if the pool is not full.
+        Blocks while all connections are in use.
+        :return: sqlite3 connection. Give it back with release
+        """
+        assert not self._closed, 'the pool is closed'
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self.created < self.size
+            if create:
+                self.created += 1
+        if create:
+            try:
+                return sqlite3.connect(self.database, **self._connect_kwargs)
+            except sqlite3.Error:
+                with self._lock:
+                    self.created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f'No connection was released within {self.timeout}s (pool size {self.size})')
+
+    def release(self, connection: sqlite3.Connection):
+        """
+        Give a connection back to the pool. An open transaction is rolled back.
+        :param connection: connection returned by acquire
+        """
+        if connection.in_transaction:
+            connection.rollback()
+        if self._closed:
+            connection.close()
+        else:
+            self._idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        Ex/ with pool.connection() as connection: connection.execute(...)
+        :return: context manager that acquires a connection and releases it on exit
+        """
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        """
+        Close the idle connections. Connections in use are closed when they are released
+        """
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class MongoCursor:
+    """
+    Lazy, mongo-like cursor over the result of one find query. Documents are dicts of column name -> value.
+
+    Nothing runs until the first document is read. Rows are then fetched batch_size at a time with
+    fetchmany, so memory use is bounded by the batch and not by the size of the result.
+    A pooled connection is held from the first read until the cursor is exhausted or closed.
+    """
+    def __init__(self, pool: ConnectionPool, sql: str = None, params: tuple = (), context: RenderContext = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, documents: list = (), on_close=None):
+        """
+        :param pool: pool to run the query on
+        :param sql: SQL to run. None for a query whose result is known without it (the database is not used)
+        :param params: values of the qmark placeholders in sql
+        :param context: RenderContext the SQL was rendered with, if it has temp tables to load
+        :param batch_size: rows fetched per round trip
+        :param documents: the known result when sql is None. Ex/ [{'COUNT(*)': 0}] for a count that matches nothing
+        :param on_close: optional callable, called once with the seconds spent running the query and fetching
+            its rows (waiting for a connection is not counted) when the cursor closes. Not called if the query
+            never ran or failed
+        """
+        assert batch_size > 0, 'batch_size must be positive'
+        self._pool = pool
+        self._sql = sql
+        self._params = params
+        self._context = context
+        self._batch_size = batch_size
+        self._connection = None
+        self._cursor = None
+        self._columns = list(documents[0]) if documents else None
+        self._rows = iter([tuple(document.values()) for document in documents])  # the current batch
+        self._exhausted = sql is None
+        self._on_close = on_close
+        self._seconds = None  # database time, set once the query ran
+
+    def batch_size(self, size: int):
+        """
+        Set the number of rows fetched per round trip. Must be called before the first read.
+        :param size: positive row count
+        :return: this cursor, so calls can be chained
+        """
+        assert self._cursor is None, 'cannot change the batch size of a cursor that has started'
+        assert size > 0, 'batch_size must be positive'
+        self._batch_size = size
+        return self
+
+    @property
+    def sql(self) -> str:
+        """
+        :return: the SQL the cursor runs, None if the result was known without running it
+        """
+        return self._sql
+
+    @property
+    def alive(self) -> bool:
+        """
+        :return: True if there may be more documents to read
+        """
+        return not self._exhausted
+
+    def _execute(self):
+        """
+        Take a connection and run the query. The connection goes back to the pool if the query fails
+        """
+        self._connection = self._pool.acquire()
+        try:
+            start = time.perf_counter()
+            self._cursor = self._connection.cursor()
+            if self._context is not None:
+                self._context.load_temp_tables(self._cursor)
+            self._cursor.execute(self._sql, self._params)
+            self._columns = [column[0] for column in self._cursor.description]
+            self._seconds = time.perf_counter() - start
+        except BaseException:
+            self.close()
+            raise
+
+    def _fetch(self):
+        """
+        Read the next batch. The cursor closes itself once the last batch is read
+        """
+        if self._cursor is None:
+            self._execute()
+        start = time.perf_counter()
+        batch = self._cursor.fetchmany(self._batch_size)
+        self._seconds += time.perf_counter() - start
+        if len(batch) < self._batch_size:
+            self.close()
+        self._rows = iter(batch)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> dict:
+        while True:
+            row = next(self._rows, None)
+            if row is not None:
+                return dict(zip(self._columns, row))
+            if self._exhausted:
+                raise StopIteration
+            self._fetch()
+
+    def next_batch(self) -> list:
+        """
+        Read up to batch_size documents at once (what is left of the current batch, else the next batch)
+        :return: list of documents, empty once the cursor is exhausted
+        """
+        documents = [dict(zip(self._columns, row)) for row in self._rows]
+        if documents or self._exhausted:
+            return documents
+        self._fetch()
+        return [dict(zip(self._columns, row)) for row in self._rows]
+
+    def to_list(self) -> list:
+        """
+        :return: all remaining documents (this loads the rest of the result into memory)
+        """
+        return list(self)
+
+    def close(self):
+        """
+        Stop reading and give the connection back to the pool. Safe to call more than once
+        """
+        self._exhausted = True
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            if self._cursor is not None:
+                self._cursor.close()
+            if self._context is not None:
+                self._context.drop_temp_tables(connection.cursor())
+                connection.commit()  # the inserts into the temp tables opened a transaction
+            self._pool.release(connection)
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None and self._seconds is not None:
+            on_close(self._seconds)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        if getattr(self, '_connection', None) is not None:
+            self.close()
+
+
+class SqliteExecutor:
+    """
+    Translates mongo find queries (in the sqlite dialect) and runs them on a ConnectionPool.
+    Queries that the optimizer proves can never match return an empty cursor (a zero count) without touching
+    the database.
+    """
+    def __init__(self, database: str, pool_size: int = DEFAULT_POOL_SIZE, optimize: bool = True,
+                 in_threshold: int = None, in_strategy: str = IN_STRATEGY_JSON_EACH, timeout: float = None,
+                 statistics: ShapeStatistics = None, **connect_kwargs):
+        """
+        :param database: sqlite3 database path or URI
+        :param pool_size: maximum number of open connections
+        :param optimize: simplify the conditions before running them (see QueryOptimizer)
+        :param in_threshold: $in lists with more values than this are rendered with in_strategy. None always inlines
+        :param in_strategy: one of SqlConstants.IN_STRATEGIES (temp_table is supported)
+        :param timeout: seconds to wait for a free connection. None waits forever
+        :param statistics: optional ShapeStatistics. The database time of every cursor is recorded under the shape
+            of its query as written (before the optimizer and keyset pagination change it)
+        :param connect_kwargs: extra sqlite3.connect arguments. Ex/ uri=True
+        """
+        self.pool = ConnectionPool(database, pool_size, timeout, **connect_kwargs)
+        self.optimize = optimize
+        self.in_threshold = in_threshold
+        self.in_strategy = in_strategy
+        self.statistics = statistics
+
+    def find(self, mongo: str, batch_size: int = DEFAULT_BATCH_SIZE, after=None) -> MongoCursor:
+        """
+        Ex/ executor.find('db.user.find({id: {$in: [1, 2]}}, {name: 1})').to_list() -> [{'name': 'A'}, {'name': 'B'}]
+        :param mongo: mongo find query (or a count/distinct query, which returns a single column)
+        :param batch_size: rows fetched per round trip
+        :param after: keyset pagination. The last document of the previous page of a sorted query
+            (see KeysetPagination)
+        :return: lazy MongoCursor over the matching documents
+        """
+        query = parse(mongo)
+        on_close = None
+        if self.statistics is not None:
+            on_close = partial(self.statistics.record, query_shape(query), example=mongo)
+        if after is not None:
+            seek_after(query, after)
+        if self.optimize:
+            optimize_query(query)
+            if query.provably_empty:  # a count still returns its single row
+                documents = [{SQL_COUNT_ALL: 0}] if query.operation == COUNT else ()
+                return MongoCursor(self.pool, batch_size=batch_size, documents=documents)
+        context = RenderContext(PARAMSTYLE_QMARK, self.in_threshold, self.in_strategy, SQLITE)
+        sql, params = sql_from_mongo(query, context=context)
+        return MongoCursor(self.pool, sql, params, context if context.temp_tables else None, batch_size,
+                           on_close=on_close)
+
+    def close(self):
+        """
+        Close the connection pool
+        """
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,253 @@
+"""
+Opt-in, in-process profiling of the translation stages.
+
+While a StageProfiler is enabled, mongo_to_sql records the wall time, input size and output size of every
+stage it runs (parse, seek, optimize, render). The profiler aggregates counters and a latency histogram
+per stage and passes every timing to its callbacks. While it is disabled the only cost is one
+function call per translation.
+
+Sizes: the parse input is in query chars, the render output in SQL chars and everything in between in
+AST nodes (each $in value counts as a node).
+
+Usage:
+    with profiling() as profiler:
+        mongo_to_sql('db.user.find({id: 1})')
+    print(profiler.snapshot())
+OR
+    enable(StageProfiler(callbacks=[lambda timing: log.debug(timing)]))
+"""
+from contextlib import contextmanager
+import threading
+import time
+
+from mongo_to_python.QueryAst import In
+
+STAGE_PARSE = 'parse'
+STAGE_SEEK = 'seek'  # keyset pagination (see KeysetPagination)
+STAGE_OPTIMIZE = 'optimize'
+STAGE_RENDER = 'render'
+STAGES = (STAGE_PARSE, STAGE_SEEK, STAGE_OPTIMIZE, STAGE_RENDER)
+
+# upper bounds of the latency histogram buckets in microseconds. The last bucket has no upper bound
+BUCKET_BOUNDS_US = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 1000000)
+PERCENTILES = (50, 90, 99)
+
+_active = None  # the enabled StageProfiler
+
+
+def count_nodes(node) -> int:
+    """
+    :param node: query AST node
+    :return: number of nodes in the tree, counting every $in value as a node
+    """
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1 + len(node.values) if type(node) == In else 1
+        stack.extend(getattr(node, 'children', ()))
+    return count
+
+
+class StageTiming:
+    """
+    One run of one stage. Passed to the callbacks of the profiler.
+    """
+    __slots__ = ('stage', 'seconds', 'input_size', 'output_size')
+
+    def __init__(self, stage: str, seconds: float = 0.0, input_size: int = 0, output_size: int = 0):
+        self.stage = stage
+        self.seconds = seconds
+        self.input_size = input_size
+        self.output_size = output_size
+
+    def __repr__(self):
+        return f'StageTiming({self.stage!r}, {self.seconds * 1e6:.1f}us, input_size={self.input_size}, ' \
+               f'output_size={self.output_size})'
+
+
+class StageStats:
+    """
+    Aggregated timings of one stage.
+    histogram: call counts per bucket of BUCKET_BOUNDS_US, then the calls slower than the last bound
+    """
+    __slots__ = ('calls', 'seconds', 'max_seconds', 'input_size', 'output_size', 'histogram')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.input_size = 0
+        self.output_size = 0
+        self.histogram = [0] * (len(BUCKET_BOUNDS_US) + 1)
+
+    def add(self, timing: StageTiming):
+        """
+        :param timing: a run of this stage
+        """
+        self.calls += 1
+        self.seconds += timing.seconds
+        self.max_seconds = max(self.max_seconds, timing.seconds)
+        self.input_size += timing.input_size
+        self.output_size += timing.output_size
+        microseconds = timing.seconds * 1e6
+        bucket = 0
+        while bucket < len(BUCKET_BOUNDS_US) and microseconds > BUCKET_BOUNDS_US[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def percentile_us(self, percent: float) -> float:
+        """
+        Approximate percentile: the upper bound of the histogram bucket it falls in (the max past the last bound)
+        :param percent: 0-100
+        :return: latency in microseconds
+        """
+        rank = max(1, round(percent / 100 * self.calls))
+        seen = 0
+        for bucket, count in enumerate(self.histogram):
+            seen += count
+            if seen >= rank:
+                break
+        return BUCKET_BOUNDS_US[bucket] if bucket < len(BUCKET_BOUNDS_US) else self.max_seconds * 1e6
+
+    def to_dict(self) -> dict:
+        """
+        :return: JSON serializable counters
+        """
+        result = {
+            'calls': self.calls,
+            'total_us': self.seconds * 1e6,
+            'mean_us': self.seconds * 1e6 / self.calls if self.calls else 0.0,
+            'max_us': self.max_seconds * 1e6,
+            'input_size': self.input_size,
+            'output_size': self.output_size,
+            'histogram': dict(zip([f'<={bound}us' for bound in BUCKET_BOUNDS_US] + ['slower'], self.histogram)),
+        }
+        for percent in PERCENTILES:
+            result[f'p{percent}_us'] = self.percentile_us(percent) if self.calls else 0.0
+        return result
+
+
+class StageProfiler:
+    """
+    Collects StageTimings. Safe to share between threads.
+    """
+    def __init__(self, callbacks=()):
+        """
+        :param callbacks: functions called with every StageTiming, in the thread that ran the stage
+        """
+        self.callbacks = list(callbacks)
+        self._stages = {}  # stage name -> StageStats
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback):
+        """
+        :param callback: function called with every StageTiming
+        """
+        self.callbacks.append(callback)
+
+    def record(self, timing: StageTiming):
+        """
+        Add a timing to the counters and pass it to the callbacks
+        :param timing: a run of a stage
+        """
+        with self._lock:
+            stats = self._stages.get(timing.stage)
+            if stats is None:
+                stats = self._stages[timing.stage] = StageStats()
+            stats.add(timing)
+        for callback in self.callbacks:
+            callback(timing)
+
+    @contextmanager
+    def stage(self, name: str, input_size: int = 0):
+        """
+        Time a block as one run of a stage. Set output_size on the yielded timing before the block ends.
+        A block that raises is not recorded.
+
+        Ex/ with profiler.stage('parse', len(mongo)) as timing: query = parse(mongo); timing.output_size = ...
+        :param name: stage name
+        :param input_size: size of the stage input
+        :return: context manager yielding the StageTiming
+        """
+        timing = StageTiming(name, input_size=input_size)
+        start = time.perf_counter()
+        yield timing
+        timing.seconds = time.perf_counter() - start
+        self.record(timing)
+
+    def stats(self) -> dict:
+        """
+        :return: dict of stage name -> StageStats.to_dict(), in pipeline order
+        """
+        with self._lock:
+            names = sorted(self._stages, key=lambda x: (STAGES.index(x) if x in STAGES else len(STAGES), x))
+            return {name: self._stages[name].to_dict() for name in names}
+
+    def snapshot(self) -> str:
+        """
+        :return: human readable table of the counters of every stage, followed by the latency histograms
+        """
+        stats = self.stats()
+        columns = ('calls', 'mean_us') + tuple(f'p{percent}_us' for percent in PERCENTILES) + \
+            ('max_us', 'input_size', 'output_size')
+        lines = [f'{"stage":<12}' + ''.join(f'{column:>12}' for column in columns)]
+        for name, stage in stats.items():
+            lines.append(f'{name:<12}' + ''.join(f'{stage[column]:>12.0f}' for column in columns))
+        for name, stage in stats.items():
+            lines.append('')
+            lines.append(f'{name} latency')
+            for bucket, count in stage['histogram'].items():
+                if count:
+                    lines.append(f'  {bucket:>12} {count:>8}')
+        return '\n'.join(lines)
+
+    def reset(self):
+        """
+        Drop all counters
+        """
+        with self._lock:
+            self._stages.clear()
+
+
+def active_profiler():
+    """
+    :return: the enabled StageProfiler, None when profiling is disabled
+    """
+    return _active
+
+
+def enable(profiler: StageProfiler = None) -> StageProfiler:
+    """
+    Start recording the stages of every translation in this process
+    :param profiler: profiler to record into. Defaults to a new one
+    :return: the enabled profiler
+    """
+    global _active
+    _active = profiler or StageProfiler()
+    return _active
+
+
+def disable():
+    """
+    Stop recording
+    """
+    global _active
+    _active = None
+
+
+@contextmanager
+def profiling(profiler: StageProfiler = None):
+    """
+    Ex/ with profiling() as profiler: ...
+    :param profiler: profiler to record into. Defaults to a new one
+    :return: context manager that enables the profiler and restores the previous one on exit
+    """
+    previous = _active
+    try:
+        yield enable(profiler)
+    finally:
+        if previous is None:
+            disable()
+        else:
+            enable(previous)
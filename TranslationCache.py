@@ -0,0 +1,103 @@
+"""
+Opt-in, in-process cache of mongo query -> SQL translations.
+
+Usage:
+    cache = TranslationCache(maxsize=4096)
+    mongo_to_sql('db.user.find({id: 1})', cache=cache)
+"""
+from collections import OrderedDict
+import re
+import threading
+
+DEFAULT_MAXSIZE = 4096
+
+# Quoted strings are kept as is (whitespace inside them is data).
+# Whitespace around punctuation is dropped and any other run of whitespace becomes a single space.
+_NORMALIZE_PATTERN = re.compile(r'''("[^"]*"|'[^']*')|\s*([{}\[\]():,])\s*|\s+''')
+
+
+def _normalize_match(match) -> str:
+    """
+    :param match: match of _NORMALIZE_PATTERN
+    :return: the replacement text for the match
+    """
+    return match.group(1) or match.group(2) or ' '
+
+
+def normalize_query(mongo: str) -> str:
+    """
+    Normalize the whitespace of a mongo query so that formatting differences share a cache entry.
+
+    Example: ' db.user.find( { id : 1 } ) ' -> 'db.user.find({id:1})'
+    :param mongo: mongo find query
+    :return: normalized query text
+    """
+    return _NORMALIZE_PATTERN.sub(_normalize_match, mongo).strip()
+
+
+class TranslationCache:
+    """
+    Bounded LRU cache of translations keyed on whitespace-normalized query text.
+    Safe to share between threads. Translations run outside of the lock so a slow translation
+    does not block hits on other keys.
+    """
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        assert maxsize > 0, 'maxsize must be positive'
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_translate(self, mongo: str, translate, options=()):
+        """
+        Return the cached translation of mongo, translating and caching it on a miss.
+        Errors are not cached.
+
+        :param mongo: mongo find query
+        :param translate: function that takes mongo and returns the translation
+        :param options: hashable extra key parts for translations that depend on more than the query text
+        :return: the translation
+        """
+        key = (normalize_query(mongo), options)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+        translation = translate(mongo)
+        with self._lock:
+            self._entries[key] = translation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return translation
+
+    def clear(self):
+        """
+        Drop all entries and reset the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """
+        :return: dict with the size, maxsize, hits, misses and evictions counters
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
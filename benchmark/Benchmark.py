@@ -0,0 +1,178 @@
+"""
+Translation micro-benchmarks.
+
+Each pipeline stage (parse, to_dict, leaf_parse, list_parser, sql_from_mongo) is timed separately
+over synthetic queries from QueryGenerator, for several query shapes (profiles).
+
+Usage:
+    python -m benchmark.Benchmark --iterations 2000 --out bench.json
+    python -m benchmark.Benchmark --profile deep --profile big_in --compare bench.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from benchmark.QueryGenerator import QueryGenerator
+from mongo_to_python.MongoJsonLeafToDict import leaf_parse
+from mongo_to_python.MongoJsonToDict import to_dict
+from mongo_to_python.MongoListParser import list_parser
+from mongo_to_python.MongoQueryParser import parse
+from mongopython_to_sql.SqlFromDict import sql_from_mongo
+
+# query shapes. Each is a set of QueryGenerator arguments
+PROFILES = {
+    'small': {'depth': 0, 'fields': 3, 'in_length': 3},
+    'deep': {'depth': 7, 'fields': 1, 'branches': 2},
+    'wide': {'depth': 1, 'fields': 60},
+    'big_in': {'depth': 0, 'fields': 1, 'in_length': 5000},
+    'long_strings': {'depth': 1, 'fields': 4, 'string_length': 1024},
+    'single_quotes': {'depth': 2, 'fields': 3, 'quote_style': 'single'},
+}
+PERCENTILES = (50, 90, 99)
+
+
+def stage_inputs(generator: QueryGenerator, samples: int) -> dict:
+    """
+    Build the inputs of every stage from the same generator.
+
+    :param generator: QueryGenerator of the profile
+    :param samples: number of distinct inputs per stage
+    :return: dict of stage name -> (function, list of inputs)
+    """
+    finds = [generator.find() for _ in range(samples)]
+    return {
+        'parse': (parse, finds),
+        'to_dict': (to_dict, [generator.query_dict() for _ in range(samples)]),
+        'leaf_parse': (leaf_parse, [generator.leaf() for _ in range(samples)]),
+        'list_parser': (list_parser, [generator.list_string() for _ in range(samples)]),
+        'sql_from_mongo': (sql_from_mongo, [parse(find) for find in finds]),
+    }
+
+
+def percentile(sorted_values: list, percent: float) -> float:
+    """
+    Nearest rank percentile
+    :param sorted_values: ascending values
+    :param percent: 0-100
+    :return: the value at that percentile
+    """
+    rank = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def time_stage(function, inputs: list, iterations: int) -> dict:
+    """
+    Call function over the inputs (cycling through them) and time every call.
+
+    :param function: stage function taking one argument
+    :param inputs: arguments to cycle through
+    :param iterations: number of timed calls
+    :return: dict with ops_per_sec, mean and percentile latencies in microseconds
+    """
+    timer = time.perf_counter_ns
+    latencies = []
+    for i in range(iterations):
+        argument = inputs[i % len(inputs)]
+        start = timer()
+        function(argument)
+        latencies.append(timer() - start)
+    latencies.sort()
+    total_ns = sum(latencies)
+    result = {
+        'iterations': iterations,
+        'ops_per_sec': iterations / (total_ns / 1e9) if total_ns else float('inf'),
+        'mean_us': total_ns / iterations / 1e3,
+        'max_us': latencies[-1] / 1e3,
+    }
+    for percent in PERCENTILES:
+        result[f'p{percent}_us'] = percentile(latencies, percent) / 1e3
+    return result
+
+
+def run(profiles: list = None, iterations: int = 1000, samples: int = 20, seed: int = 0) -> dict:
+    """
+    Run the benchmark suite.
+
+    :param profiles: names from PROFILES. Defaults to all
+    :param iterations: timed calls per stage and profile
+    :param samples: distinct generated inputs per stage and profile
+    :param seed: generator seed, keep it fixed to compare runs
+    :return: JSON serializable report
+    """
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'timestamp': time.time(),
+        'iterations': iterations,
+        'samples': samples,
+        'seed': seed,
+        'profiles': {},
+    }
+    for name in profiles or PROFILES:
+        generator = QueryGenerator(seed=seed, **PROFILES[name])
+        stages = {}
+        for stage, (function, inputs) in stage_inputs(generator, samples).items():
+            stages[stage] = time_stage(function, inputs, iterations)
+            if stage != 'sql_from_mongo':
+                stages[stage]['mean_input_chars'] = sum(len(x) for x in inputs) / len(inputs)
+        report['profiles'][name] = {'settings': generator.settings(), 'stages': stages}
+    return report
+
+
+def format_report(report: dict, baseline: dict = None) -> str:
+    """
+    Human readable table of a report.
+
+    :param report: output of run
+    :param baseline: optional earlier report. Adds the speedup of ops/sec relative to it
+    :return: table as text
+    """
+    lines = [f'{"profile":<14} {"stage":<15} {"ops/sec":>12} {"p50 us":>10} {"p90 us":>10} {"p99 us":>10}'
+             + (f' {"vs base":>8}' if baseline else '')]
+    for name, profile in report['profiles'].items():
+        for stage, result in profile['stages'].items():
+            line = f'{name:<14} {stage:<15} {result["ops_per_sec"]:>12.1f} {result["p50_us"]:>10.1f} ' \
+                   f'{result["p90_us"]:>10.1f} {result["p99_us"]:>10.1f}'
+            if baseline:
+                base = baseline.get('profiles', {}).get(name, {}).get('stages', {}).get(stage)
+                line += f' {result["ops_per_sec"] / base["ops_per_sec"]:>7.2f}x' if base else f' {"-":>8}'
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def main(argv: list = None) -> int:
+    """
+    Command line entrypoint. The JSON report goes to --out (or stdout), the table to stderr.
+
+    :param argv: command line arguments without the program name
+    :return: exit code
+    """
+    arg_parser = argparse.ArgumentParser(description='Benchmark the mongo to SQL translation stages')
+    arg_parser.add_argument('--profile', action='append', choices=sorted(PROFILES),
+                            help='query shape to run, may be repeated. Defaults to all')
+    arg_parser.add_argument('--iterations', type=int, default=1000, help='timed calls per stage')
+    arg_parser.add_argument('--samples', type=int, default=20, help='distinct inputs per stage')
+    arg_parser.add_argument('--seed', type=int, default=0, help='generator seed')
+    arg_parser.add_argument('--out', help='file to write the JSON report to. Defaults to stdout')
+    arg_parser.add_argument('--compare', help='earlier JSON report to compare ops/sec against')
+    args = arg_parser.parse_args(argv)
+
+    report = run(args.profile, args.iterations, args.samples, args.seed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    sys.stderr.write(format_report(report, baseline) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Generator of synthetic mongo find() strings for benchmarking.
+
+Every knob that changes the work done by the translator can be varied:
+nesting depth of $or/$and, number of fields per dict, $in list length, string length and quoting style.
+"""
+import random
+
+from MongoConstants import MONGO_OR, MONGO_AND, MONGO_IN, MONGO_LESS_THAN, MONGO_LESS_THAN_EQ, \
+    MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ, MONGO_NOT_EQUAL
+
+QUOTE_STYLES = ('double', 'single', 'mixed')
+COMPARISON_OPERATORS = (MONGO_LESS_THAN, MONGO_LESS_THAN_EQ, MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ,
+                        MONGO_NOT_EQUAL)
+STRING_ALPHABET = 'abcdefghijklmnopqrstuvwxyz ,:{}[]'  # includes the chars the parser has to skip over in strings
+
+
+class QueryGenerator:
+    """
+    Builds random but reproducible (seeded) mongo query strings of a chosen shape.
+    """
+    def __init__(self, depth: int = 2, fields: int = 3, in_length: int = 5, string_length: int = 8,
+                 quote_style: str = 'mixed', branches: int = 2, seed: int = 0):
+        """
+        :param depth: levels of nested $or/$and below the top level dict
+        :param fields: field conditions in each dict
+        :param in_length: number of values in each $in list
+        :param string_length: length of each string literal
+        :param quote_style: 'double', 'single' or 'mixed'
+        :param branches: dicts in each $or/$and list
+        :param seed: random seed so runs can be compared
+        """
+        assert quote_style in QUOTE_STYLES, f'quote_style must be one of {QUOTE_STYLES}'
+        self.depth = depth
+        self.fields = fields
+        self.in_length = in_length
+        self.string_length = string_length
+        self.quote_style = quote_style
+        self.branches = branches
+        self._random = random.Random(seed)
+
+    def settings(self) -> dict:
+        """
+        :return: the shape knobs, for reporting
+        """
+        return {
+            'depth': self.depth,
+            'fields': self.fields,
+            'in_length': self.in_length,
+            'string_length': self.string_length,
+            'quote_style': self.quote_style,
+            'branches': self.branches,
+        }
+
+    def string(self) -> str:
+        """
+        :return: quoted mongo string literal
+        """
+        text = ''.join(self._random.choice(STRING_ALPHABET) for _ in range(self.string_length))
+        quote = {'double': '"', 'single': "'"}.get(self.quote_style) or self._random.choice('"\'')
+        return f'{quote}{text}{quote}'
+
+    def scalar(self) -> str:
+        """
+        :return: mongo literal of a random type
+        """
+        kind = self._random.randrange(6)
+        if kind == 0:
+            return self.string()
+        elif kind == 1:
+            return str(self._random.randint(-10 ** 6, 10 ** 6))
+        elif kind == 2:
+            return str(round(self._random.uniform(-1000, 1000), 3))
+        elif kind == 3:
+            return self._random.choice(('true', 'false'))
+        elif kind == 4:
+            return 'null'
+        return str(self._random.randrange(100))
+
+    def list_string(self) -> str:
+        """
+        :return: mongo value list, as used by $in. Ex/ '[1, "a", null]'
+        """
+        return f'[{", ".join(self.scalar() for _ in range(self.in_length))}]'
+
+    def leaf(self) -> str:
+        """
+        :return: mongo leaf with an $in and a comparison operator. Ex/ '{$in: [1, 2], $gt: 0}'
+        """
+        operator = self._random.choice(COMPARISON_OPERATORS)
+        return f'{{{MONGO_IN}: {self.list_string()}, {operator}: {self.scalar()}}}'
+
+    def field_condition(self, index: int) -> str:
+        """
+        :param index: used to name the field
+        :return: 'field: value' pair with either a primitive or a leaf as the value
+        """
+        value = self.leaf() if self._random.random() < 0.5 else self.scalar()
+        return f'f{index}: {value}'
+
+    def query_dict(self, depth: int = None) -> str:
+        """
+        :param depth: remaining nesting depth. Defaults to the generator depth
+        :return: mongo query dict
+        """
+        depth = self.depth if depth is None else depth
+        pairs = [self.field_condition(i) for i in range(self.fields)]
+        if depth > 0:
+            operator = self._random.choice((MONGO_OR, MONGO_AND))
+            children = ', '.join(self.query_dict(depth - 1) for _ in range(self.branches))
+            pairs.append(f'{operator}: [{children}]')
+        return f'{{{", ".join(pairs)}}}'
+
+    def projection(self) -> str:
+        """
+        :return: mongo inclusion projection over the generated fields
+        """
+        return f'{{{", ".join(f"f{i}: 1" for i in range(self.fields))}}}'
+
+    def find(self, table: str = 'bench') -> str:
+        """
+        :param table: collection name
+        :return: complete mongo find call
+        """
+        return f'db.{table}.find({self.query_dict()}, {self.projection()})'
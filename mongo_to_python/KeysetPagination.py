@@ -0,0 +1,76 @@
+"""
+Keyset (seek) pagination. Instead of skipping rows, which the database does by reading and throwing
+them away, the next page starts right after the sort key of the last document of the previous page.
+
+db.user.find({}).sort({age: 1, id: 1}).skip(100000).limit(10), after the page that ended on {age: 30, id: 17}
+        v
+SELECT * FROM user WHERE (age >= 30) AND ((age > 30) OR (age = 30) AND (id > 17)) ORDER BY age ASC, id ASC LIMIT 10;
+
+The leading age >= 30 lets an index on the sort columns seek straight to the page.
+The sort must be a total order (end it with a unique column such as id) or documents with the same
+sort key may be skipped or repeated. Null sort values are not supported.
+"""
+from MongoConstants import MONGO_ASCENDING, MONGO_EQUAL, MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ, \
+    MONGO_LESS_THAN, MONGO_LESS_THAN_EQ
+from mongo_to_python.MongoQueryParser import MongoQuery
+from mongo_to_python.QueryAst import FieldPredicate, Literal, And, Or, GROUP_DOCUMENT
+
+
+def last_seen_values(sort: list, last_seen) -> list:
+    """
+    :param sort: list of (field, 1 or -1)
+    :param last_seen: the last document of the previous page (dict with at least the sort fields),
+        or its sort values in sort order
+    :return: the sort values in sort order
+    """
+    if isinstance(last_seen, dict):
+        missing = [field for field, _ in sort if field not in last_seen]
+        assert not missing, f'The last seen document has no value for the sort fields {missing}'
+        values = [last_seen[field] for field, _ in sort]
+    else:
+        values = list(last_seen)
+        assert len(values) == len(sort), f'Expected {len(sort)} last seen values, got {len(values)}'
+    assert None not in values, 'Keyset pagination does not support null sort values'
+    return values
+
+
+def keyset_condition(sort: list, last_seen) -> list:
+    """
+    Build the conditions that select the documents sorted after last_seen.
+
+    Ex/ ([('age', 1), ('id', -1)], {'age': 30, 'id': 17})
+        -> [age >= 30, Or([age > 30, age = 30 AND id < 17])]
+    :param sort: non empty list of (field, 1 or -1)
+    :param last_seen: see last_seen_values
+    :return: list of AST nodes to AND with the query conditions
+    """
+    assert sort, 'Keyset pagination requires a sort'
+    values = last_seen_values(sort, last_seen)
+    terms = []
+    for i, (field, direction) in enumerate(sort):
+        # every earlier sort field equal to the last seen value and this one strictly after it
+        equal = [FieldPredicate(f, MONGO_EQUAL, Literal(v)) for (f, _), v in zip(sort[:i], values[:i])]
+        after = MONGO_GREATER_THAN if direction == MONGO_ASCENDING else MONGO_LESS_THAN
+        terms.append(And(equal + [FieldPredicate(field, after, Literal(values[i]))], GROUP_DOCUMENT))
+    if len(terms) == 1:
+        return list(terms[0].children)
+    first_field, first_direction = sort[0]
+    leading = MONGO_GREATER_THAN_EQ if first_direction == MONGO_ASCENDING else MONGO_LESS_THAN_EQ
+    return [FieldPredicate(first_field, leading, Literal(values[0])), Or(terms)]
+
+
+def seek_after(query: MongoQuery, last_seen) -> MongoQuery:
+    """
+    Rewrite a sorted query in place to start after last_seen. The skip is dropped since the position
+    is now given by the sort key.
+
+    :param query: parsed query with a sort
+    :param last_seen: the last document of the previous page, or its sort values in sort order
+    :return: the same query, for chaining
+    """
+    seek = keyset_condition(query.sort, last_seen)
+    where = query.where
+    children = list(where.children) if type(where) == And and where.grouping == GROUP_DOCUMENT else [where]
+    query.where = And(children + seek, GROUP_DOCUMENT)
+    query.skip = None
+    return query
@@ -0,0 +1,323 @@
+"""
+Descent parser over the tokens of MongoTokenizer.
+
+The tokenizer reads the input once and the parser consumes each token exactly once, so
+parsing is linear in the length of the input no matter how deeply the query is nested.
+Nested objects and arrays are kept on an explicit stack instead of the Python call stack,
+so the nesting depth is only bounded by max_depth (see MAX_DEPTH), not by the recursion limit.
+
+Objects written in strict JSON (quoted keys and double quoted strings, as logged by the drivers) are
+decoded whole by the C accelerated json module. Anything it rejects (Ex/ unquoted keys, single quotes,
+trailing commas or placeholders) goes through the tokens instead, which accept a superset of JSON.
+
+grammar:
+    call     := WORD '(' [object [',' [object]]] ')'      Ex/ db.user.find({id: 1}, {id: 1})
+    object   := '{' [pair (',' pair)* [',']] '}'
+    pair     := (WORD | STRING) ':' value
+    array    := '[' [value (',' value)* [',']] ']'
+    value    := object | array | STRING | WORD
+
+A parser made with a placeholder function also accepts $name words as values (see CompiledQuery).
+"""
+
+import json
+import re
+
+from mongo_to_python.Constants import CLOSE_SQUARE, OPEN_SQUARE, COMMA, OPEN_CURLY, CLOSE_CURLY, COLON
+from mongo_to_python.MongoTokenizer import tokenize, PUNCTUATION, STRING, WORD, END
+from mongo_to_python.MongoToPythonType import cast_non_str_primitive
+
+# Flat lists of a single kind of primitive (the common shape of big $in lists) are matched whole and
+# split without tokenizing each member. Each pattern starts right after the '['.
+_NUMBER_LIST = re.compile(r'[-+\d\s,.eE]*\]')  # validated by the int/float casts
+_DOUBLE_QUOTED_LIST = re.compile(r'\s*("[^"]*"(?:\s*,\s*"[^"]*")*)\s*,?\s*\]')
+_SINGLE_QUOTED_LIST = re.compile(r"\s*('[^']*'(?:\s*,\s*'[^']*')*)\s*,?\s*\]")
+_DOUBLE_QUOTED_MEMBER = re.compile(r'"([^"]*)"')
+_SINGLE_QUOTED_MEMBER = re.compile(r"'([^']*)'")
+PLACEHOLDER_PREFIX = '$'  # a placeholder value in a query template. Ex/ {age: {$gt: $min_age}}
+# an object that may be strict JSON: the first key is quoted, or the object is empty. Starts at the '{'
+_STRICT_JSON_OBJECT = re.compile(r'\{\s*["}]')
+_JSON_DECODER = json.JSONDecoder()
+MAX_DEPTH = 100000  # default limit of nested objects and arrays (each $or level is two). Deeper input is a ValueError
+
+
+class MongoParser:
+    """
+    Holds the parse state (the token generator and the current token) for a single input string.
+    The parse_* methods each consume one grammar rule and return its Python value.
+    """
+    def __init__(self, mongo: str, placeholder=None, max_depth: int = None):
+        """
+        :param mongo: string encoded mongo call, query or projection
+        :param placeholder: optional function that takes a placeholder name and returns the value to parse it as.
+            Without it a $name value is an error
+        :param max_depth: optional limit of nested objects and arrays. Defaults to MAX_DEPTH
+        """
+        self._source = mongo
+        self._placeholder = placeholder
+        self._max_depth = MAX_DEPTH if max_depth is None else max_depth
+        # json decodes escapes in strings but the tokens keep them as written, so only use it without backslashes.
+        # The json module stops at its own recursion guard, far below MAX_DEPTH. A tighter max_depth is only
+        # enforced by the tokens
+        self._strict_json = '\\' not in mongo and self._max_depth >= MAX_DEPTH
+        self._tokens = tokenize(mongo)
+        self._current = next(self._tokens)
+
+    @property
+    def current(self):
+        """
+        :return: the token that will be consumed next
+        """
+        return self._current
+
+    def advance(self):
+        """
+        Consume the current token
+        :return: the consumed token
+        """
+        token = self._current
+        self._current = next(self._tokens)
+        return token
+
+    def at(self, punctuation: str) -> bool:
+        """
+        :param punctuation: one of the structural chars (Ex/ '{')
+        :return: True if the current token is that punctuation
+        """
+        return self._current.kind == PUNCTUATION and self._current.value == punctuation
+
+    def accept(self, punctuation: str) -> bool:
+        """
+        Consume the current token only if it is the given punctuation
+        :param punctuation: one of the structural chars (Ex/ ',')
+        :return: True if the token was consumed
+        """
+        if self.at(punctuation):
+            self.advance()
+            return True
+        return False
+
+    def expect(self, punctuation: str):
+        """
+        Consume the given punctuation or fail
+        :param punctuation: one of the structural chars (Ex/ ':')
+        """
+        if not self.accept(punctuation):
+            self.error(f"Expected '{punctuation}'")
+
+    def expect_end(self):
+        """
+        Fail if there are tokens left over
+        """
+        if self._current.kind != END:
+            self.error('Expected the end of the input')
+
+    def error(self, message: str):
+        """
+        Raise a ValueError that points at the current token
+        :param message: what went wrong
+        """
+        found = self._current.value if self._current.kind != END else 'end of input'
+        raise ValueError(f'{message} at index {self._current.position} (found {found!r}) in {self._source!r}')
+
+    def parse_value(self):
+        """
+        value := object | array | STRING | WORD
+
+        The objects and arrays that are still open are kept on a stack, innermost last. Each value is
+        stored into the innermost one, which is then either continued (after a ',') or closed and stored
+        into its own parent in turn.
+        :return: dict, list, str or a value from cast_non_str_primitive
+        """
+        if self._strict_json and self.at(OPEN_CURLY):
+            value = self._parse_strict_json()
+            if value is not None:
+                return value
+        stack = []  # (open dict or list, key the next value is stored under). The key is None for lists
+        while True:
+            if self.at(OPEN_CURLY):
+                self._check_depth(len(stack))
+                self.advance()
+                if not self.accept(CLOSE_CURLY):
+                    stack.append(({}, self._parse_key()))
+                    continue
+                value = {}
+            elif self.at(OPEN_SQUARE):
+                self._check_depth(len(stack))
+                position = self.advance().position + 1
+                value = self._parse_flat_list(position)
+                if value is None:
+                    if not self.accept(CLOSE_SQUARE):
+                        stack.append(([], None))
+                        continue
+                    value = []
+            else:
+                value = self._parse_primitive()
+            # store the value, closing every container it completes
+            while stack:
+                container, key = stack[-1]
+                if key is None:
+                    container.append(value)
+                    closing = CLOSE_SQUARE
+                else:
+                    container[key] = value  # a repeated key overrides the earlier value, like in mongo
+                    closing = CLOSE_CURLY
+                if self.accept(COMMA):
+                    if not self.accept(closing):  # a trailing comma is allowed before the close
+                        if key is not None:
+                            stack[-1] = (container, self._parse_key())
+                        break
+                else:  # without a comma the container must close now
+                    self.expect(closing)
+                value = stack.pop()[0]
+            else:
+                return value
+
+    def _parse_strict_json(self):
+        """
+        Fast path for an object in strict JSON. On success its tokens are skipped.
+        :return: the dict, or None if the object is not strict JSON (nothing is consumed in that case)
+        """
+        position = self._current.position
+        if not _STRICT_JSON_OBJECT.match(self._source, position):
+            return None
+        try:
+            value, end = _JSON_DECODER.raw_decode(self._source, position)
+        except (ValueError, RecursionError):
+            return None
+        self._skip_to(end)
+        return value
+
+    def _parse_primitive(self):
+        """
+        value := STRING | WORD
+        :return: str or a value from cast_non_str_primitive
+        """
+        token = self._current
+        if token.kind == STRING:
+            self.advance()
+            return token.value
+        elif token.kind == WORD:
+            self.advance()
+            try:
+                return cast_non_str_primitive(token.value)
+            except ValueError:
+                if self._placeholder is not None and token.value.startswith(PLACEHOLDER_PREFIX) \
+                        and len(token.value) > len(PLACEHOLDER_PREFIX):
+                    return self._placeholder(token.value[len(PLACEHOLDER_PREFIX):])
+                raise ValueError(f'Unrecognized value {token.value!r} at index {token.position} in {self._source!r}')
+        self.error('Expected a value')
+
+    def _parse_key(self) -> str:
+        """
+        pair := (WORD | STRING) ':' value
+        Consume the key and the colon of a pair
+        :return: the key
+        """
+        key = self._current
+        if key.kind not in (WORD, STRING):
+            self.error('Expected a key')
+        self.advance()
+        self.expect(COLON)
+        return key.value
+
+    def _check_depth(self, depth: int):
+        """
+        Fail before opening a container deeper than max_depth
+        :param depth: number of containers open around it
+        """
+        if depth >= self._max_depth:
+            self.error(f'Nested deeper than {self._max_depth} levels')
+
+    def parse_object(self) -> dict:
+        """
+        object := '{' [pair (',' pair)* [',']] '}'
+
+        Note: a repeated key overrides the earlier value. This matches how mongo handles duplicate keys.
+        :return: the mongo dict as a Python dict
+        """
+        if not self.at(OPEN_CURLY):
+            self.error(f"Expected '{OPEN_CURLY}'")
+        return self.parse_value()
+
+    def parse_array(self) -> list:
+        """
+        array := '[' [value (',' value)* [',']] ']'
+        :return: the mongo list as a Python list
+        """
+        if not self.at(OPEN_SQUARE):
+            self.error(f"Expected '{OPEN_SQUARE}'")
+        return self.parse_value()
+
+    def _parse_flat_list(self, position: int):
+        """
+        Fast path for a list that holds only numbers or only strings of one quote type.
+        On a match the tokens of the list are skipped by restarting the tokenizer after the closing ']'.
+
+        :param position: index right after the '['
+        :return: the Python list, or None if the list is not flat (nothing is consumed in that case)
+        """
+        match = _NUMBER_LIST.match(self._source, position)
+        if match:
+            values = _cast_numbers(self._source[position:match.end() - 1])
+            if values is None:
+                return None
+        else:
+            match = _DOUBLE_QUOTED_LIST.match(self._source, position)
+            member = _DOUBLE_QUOTED_MEMBER
+            if not match:
+                match = _SINGLE_QUOTED_LIST.match(self._source, position)
+                member = _SINGLE_QUOTED_MEMBER
+            if not match:
+                return None
+            values = member.findall(match.group(1))
+        self._skip_to(match.end())
+        return values
+
+    def _skip_to(self, position: int):
+        """
+        Restart the tokens at position, skipping the text before it
+        :param position: index in the source
+        """
+        self._tokens = tokenize(self._source, position)
+        self._current = next(self._tokens)
+
+    def parse_word(self) -> str:
+        """
+        Consume an unquoted word, like the 'db.user.find' that starts a call
+        :return: the word
+        """
+        if self._current.kind != WORD:
+            self.error('Expected a name')
+        return self.advance().value
+
+
+def _cast_numbers(list_body: str):
+    """
+    :param list_body: the text between the brackets of a list of numbers. Ex/ ' 1, 2.5,3 '
+    :return: list of int/float, or None if the text is not a well formed list of numbers
+    """
+    members = list_body.split(COMMA)
+    if not members[-1].strip():  # an empty list or a trailing comma
+        members.pop()
+    try:
+        if '.' in list_body or 'e' in list_body or 'E' in list_body:
+            return [cast_non_str_primitive(x) for x in members]
+        return list(map(int, members))  # int() ignores the surrounding whitespace
+    except ValueError:  # Ex/ '1,,2' or '1-2'. Let the token path report the error
+        return None
+
+
+def parse_whole(mongo: str, rule):
+    """
+    Parse a string that consists of exactly one grammar rule.
+
+    Example: parse_whole('[1, "a"]', MongoParser.parse_array) -> [1, 'a']
+    :param mongo: string encoded mongo object/array
+    :param rule: one of the MongoParser.parse_* methods
+    :return: the parsed Python value
+    """
+    parser = MongoParser(mongo)
+    value = rule(parser)
+    parser.expect_end()
+    return value
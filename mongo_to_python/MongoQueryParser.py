@@ -1,86 +1,237 @@
-# todo: messy
-from mongo_to_python.MongoJsonToDict import to_dict
-from mongo_to_python.Constants import CLOSE_SQUARE, OPEN_SQUARE, QUOTE_DOUBLE, QUOTE_SINGLE, COMMA, OPEN_CURLY, \
-    CLOSE_CURLY, COLON, OPEN_PAREN, CLOSE_PAREN
+from MongoConstants import MONGO_ASCENDING, MONGO_DESCENDING
+from mongo_to_python.MongoDescentParser import MongoParser
+from mongo_to_python.MongoTokenizer import WORD, STRING
+from mongo_to_python.QueryAst import Node, And, Never, from_dict
+from mongo_to_python.Constants import COMMA, OPEN_PAREN, CLOSE_PAREN
 
 DB = 'db'
+# collection methods (MongoQuery.operation)
 FIND = 'find'
+COUNT = 'count'
+COUNT_DOCUMENTS = 'countDocuments'  # parsed as COUNT
+DISTINCT = 'distinct'
+OPERATIONS = (FIND, COUNT, DISTINCT)
+# cursor methods chained after find(). Ex/ db.user.find({}).sort({age: -1}).skip(20).limit(10)
+SORT = 'sort'
+LIMIT = 'limit'
+SKIP = 'skip'
+METHOD_SEPARATOR = '.'
 
 
 class MongoQuery:
     """
-    Container for a mongo find query.
-    Has the table to query, query arg (conditions) and projection.
+    Container for a mongo find, count or distinct query.
+    Has the table to query, query arg (where), projection and the cursor modifiers (sort, limit, skip).
+    operation says what the query returns: the documents (find), their number (count) or the distinct
+    values of distinct_field (distinct).
+
+    The query arg is kept as the typed AST (see QueryAst). conditions is a dict view of it for
+    code written against the nested dict form.
     """
-    def __init__(self, table: str, conditions: dict, projection: dict):
+    __slots__ = ('table', 'where', 'projection', 'sort', 'limit', 'skip', 'operation', 'distinct_field')
+
+    def __init__(self, table: str, conditions, projection: dict, sort: list = None, limit: int = None,
+                 skip: int = None, operation: str = FIND, distinct_field: str = None):
+        """
+        :param table: collection/table name
+        :param conditions: query AST, or mongo query arg encoded as dict
+        :param projection: mongo projection arg encoded as dict
+        :param sort: list of (field, MONGO_ASCENDING or MONGO_DESCENDING). Ex/ [('age', -1), ('id', 1)]
+        :param limit: max number of documents. None (or 0, like mongo) for no limit
+        :param skip: number of documents to skip. None for none
+        :param operation: one of OPERATIONS
+        :param distinct_field: the field of a distinct query
+        """
+        assert operation in OPERATIONS, f'operation must be one of {OPERATIONS}'
+        assert (operation == DISTINCT) == bool(distinct_field), 'distinct queries (and only them) need a field'
         self.table = table
-        self.conditions = conditions
+        self.where = conditions if isinstance(conditions, Node) else from_dict(conditions)
         self.projection = projection
+        self.sort = sort or []
+        self.limit = limit or None
+        self.skip = skip or None
+        self.operation = operation
+        self.distinct_field = distinct_field
+
+    @property
+    def conditions(self) -> dict:
+        """
+        :return: the query arg as a nested dict. Built from the AST on every access
+        """
+        return self.where.to_dict()
+
+    @conditions.setter
+    def conditions(self, conditions: dict):
+        self.where = from_dict(conditions)
+
+    @property
+    def provably_empty(self) -> bool:
+        """
+        :return: True if the query arg can never match, so the query does not have to be executed.
+            Only known after the query is optimized (see QueryOptimizer.optimize_query)
+        """
+        where = self.where
+        return type(where) == Never or (type(where) == And and Never() in where.children)
 
     def __str__(self):
-        return f'MongoQuery: table={self.table} conditions={str(self.conditions)} projection={str(self.projection)}'
+        modifiers = ''.join(f' {name}={value}' for name, value in
+                            ((SORT, self.sort), (LIMIT, self.limit), (SKIP, self.skip), ('field', self.distinct_field))
+                            if value)
+        return f'MongoQuery: {self.operation} table={self.table} conditions={_nested_repr(self.conditions)} ' \
+               f'projection={str(self.projection)}{modifiers}'
 
 
-def get_json_end_index(str_with_json) -> int:
+def _nested_repr(value) -> str:
     """
-    Get the ending index of the first mongo-json dict
-    :param str_with_json:
-    :return:
+    repr() of nested dicts and lists, written with an explicit stack so deep queries do not hit the recursion limit.
+    Ex/ {'a': [1, None]} -> "{'a': [1, None]}"
+    :param value: dict, list or primitive
+    :return: the same string as repr(value)
     """
-    # state
-    open_brackets = 0
-    open_double_quote = False
-    open_single_quote = False
-    # iterate chars
-    for i in range(len(str_with_json)):
-        cur_char = str_with_json[i]
-        if open_single_quote or open_double_quote:  # skip normal counting in case of string
-            assert not (open_single_quote and open_double_quote)
-            # string should stay open if it was already and the close is not found
-            open_double_quote = open_double_quote and cur_char != QUOTE_DOUBLE
-            open_single_quote = open_single_quote and cur_char != QUOTE_SINGLE
+    parts = []
+    stack = [(False, value)]  # (True, text to write) or (False, value to write)
+    while stack:
+        is_text, item = stack.pop()
+        if is_text:
+            parts.append(item)
+        elif type(item) == dict or type(item) == list:
+            is_dict = type(item) == dict
+            tokens = [(True, '{' if is_dict else '[')]
+            for i, entry in enumerate(item.items() if is_dict else item):
+                if i:
+                    tokens.append((True, ', '))
+                if is_dict:
+                    tokens.append((True, f'{entry[0]!r}: '))
+                tokens.append((False, entry[1] if is_dict else entry))
+            tokens.append((True, '}' if is_dict else ']'))
+            stack.extend(reversed(tokens))
         else:
-            # Open a string?
-            open_single_quote = cur_char == QUOTE_SINGLE
-            open_double_quote = cur_char == QUOTE_DOUBLE
-            # count braces
-            open_brackets += 1 if cur_char == OPEN_CURLY else -1 if cur_char == CLOSE_CURLY else 0
-            assert open_brackets >= 0
-            if open_brackets == 0:
-                return i
-    raise ValueError('Malformed opening/closing braces')
-
-
-def parse(mongo_call: str) -> MongoQuery:
+            parts.append(repr(item))
+    return ''.join(parts)
+
+
+def parse(mongo_call: str, placeholder=None, max_depth: int = None) -> MongoQuery:
+    """
+    Split up a string encoded mongo call into a MongoQuery.
+    The whole call is tokenized once and the arguments are parsed from the same tokens.
+
+    Supported calls:
+        db.user.find({query}, {projection})   optionally followed by .sort(), .limit(), .skip() and .count()
+        db.user.count({query}, {limit: n, skip: n})
+        db.user.countDocuments({query}, {limit: n, skip: n})
+        db.user.distinct('field', {query})
+
+    Example input: 'db.user.find({})' or 'db.user.find({age: {$gt: 20}}).sort({age: -1}).skip(10).limit(5)'
+    :param mongo_call: String encoded mongo call
+    :param placeholder: optional function that gives the value of a $name placeholder. see MongoParser
+    :param max_depth: optional limit of nested objects and arrays. see MongoDescentParser.MAX_DEPTH
+    :return: MongoQuery containing the db name, conditions, projection and cursor modifiers
     """
-    Split up a string encoded mongo find call into a MongoQuery.
+    parser = MongoParser(mongo_call, placeholder, max_depth)
+    # First split off the db_string, table_name and method. Ex/ 'db.user.find'
+    target = parser.parse_word().split('.')
+    if len(target) < 3 or target[0] != DB:  # todo: in mongodb, does this always have to be 'db'? Not sure
+        raise ValueError(f'Expected a call of the form db.collection.{FIND}(...) in {mongo_call!r}')
+    table_name = '.'.join(target[1:-1])
+    method = target[-1]
+    if method not in (FIND, COUNT, COUNT_DOCUMENTS, DISTINCT):
+        raise ValueError(f'Only {FIND}, {COUNT}, {COUNT_DOCUMENTS} and {DISTINCT} are supported, '
+                         f'got {method!r} in {mongo_call!r}')
+
+    # now parse the arguments. Arguments must be contained by parenthesis
+    query = MongoQuery(table_name, {}, {})
+    parser.expect(OPEN_PAREN)
+    if method == DISTINCT:
+        field = parser.current
+        if field.kind != STRING or not field.value:
+            parser.error(f'{DISTINCT}() requires a field name string')
+        parser.advance()
+        query.operation = DISTINCT
+        query.distinct_field = field.value
+        if parser.accept(COMMA) and not parser.at(CLOSE_PAREN):
+            query.conditions = parser.parse_object()
+    elif not parser.at(CLOSE_PAREN):
+        query.conditions = parser.parse_object()
+        # if there is a projection (or count options) arg, there must be a comma separating it
+        if parser.accept(COMMA) and not parser.at(CLOSE_PAREN):
+            if method == FIND:
+                query.projection = parser.parse_object()
+            else:
+                parse_count_options(parser, query)
+    parser.expect(CLOSE_PAREN)
+    if method == FIND:
+        parse_cursor_methods(parser, query)
+    elif method != DISTINCT:
+        query.operation = COUNT
+    parser.expect_end()
+    return query
+
 
-    Example input: 'db.user.find({})'
-    :param mongo_call: String encoded mongo find call
-    :return: MongoQuery containing the db name, conditions and projection
+def _limit_or_skip(parser: MongoParser, query: MongoQuery, option: str, value):
     """
-    # First split off the db_string, table_name and find string
-    db_string, mongo_call = mongo_call.split('.', 1)
-    assert db_string == DB  # todo: in mongodb, does this always have to be 'db'? Not sure
-    table_name, mongo_call = mongo_call.split('.', 1)
-    mongo_call = mongo_call.strip()
-    assert mongo_call.startswith(FIND)
-    mongo_call = mongo_call.replace(FIND, '', 1).strip()  # dont need to keep the find, just making sure its there
-    assert mongo_call[0] == OPEN_PAREN and mongo_call[-1] == CLOSE_PAREN  # arguments must be contained by parenthesis
-    mongo_call = mongo_call[1:-1].strip()  # remove the parenthesis
-
-    # now split up the query/projection args
-    query_json = None
-    projection_json = None
-    if OPEN_CURLY in mongo_call:  # i.e. args always have braces
-        assert mongo_call[0] == OPEN_CURLY
-        index_of_json_end = get_json_end_index(mongo_call)
-        query_json = mongo_call[:index_of_json_end+1]  # get the query_json
-        mongo_call = mongo_call[index_of_json_end+1:].strip()  # and remove it from the mongo_call string
-        # if there is a projection arg, there must be a comma separating it
-        if mongo_call and mongo_call[0] == COMMA:
-            # since there is another arg and there can only be two, the rest of the string is the projection arg
-            projection_json = mongo_call[1:].strip()
-    return MongoQuery(table_name,
-                      to_dict(query_json),
-                      to_dict(projection_json))
+    Validate and set a limit or skip value
+    :param parser: parser, used to report errors at the current position
+    :param query: query to set the value on
+    :param option: LIMIT or SKIP
+    :param value: the parsed value
+    """
+    if type(value) != int:
+        parser.error(f'{option} requires an integer')
+    if option == LIMIT:
+        query.limit = abs(value) or None  # a negative limit is a single batch of that size in mongo
+    elif value < 0:
+        parser.error(f'{option} cannot be negative')
+    else:
+        query.skip = value or None
+
+
+def parse_count_options(parser: MongoParser, query: MongoQuery):
+    """
+    Parse the options arg of count()/countDocuments(). Only limit and skip are supported.
+    Ex/ '{limit: 10, skip: 5}'
+    :param parser: parser positioned at the options object
+    :param query: query to set the limit and skip on
+    """
+    for option, value in parser.parse_object().items():
+        if option not in (LIMIT, SKIP):
+            parser.error(f'Unsupported count option {option!r}')
+        _limit_or_skip(parser, query, option, value)
+
+
+def parse_cursor_methods(parser: MongoParser, query: MongoQuery):
+    """
+    Parse the cursor methods chained after find(...) into the query. Like in mongo, the order of the
+    calls does not matter (sort, then skip, then limit are always applied) and a repeated call overrides.
+    count() must come last. Like the mongo shell it ignores the limit and skip unless called as count(true).
+
+    Ex/ '.sort({age: -1, id: 1}).limit(10)' -> query.sort = [('age', -1), ('id', 1)], query.limit = 10
+    :param parser: parser positioned right after the closing parenthesis of find(...)
+    :param query: query to set the modifiers on
+    """
+    while parser.current.kind == WORD and parser.current.value.startswith(METHOD_SEPARATOR):
+        method = parser.current.value[len(METHOD_SEPARATOR):]
+        if method not in (SORT, LIMIT, SKIP, COUNT):
+            parser.error(f'Unsupported cursor method {method!r}')
+        parser.advance()
+        parser.expect(OPEN_PAREN)
+        if method == COUNT:
+            apply_skip_limit = False
+            if not parser.at(CLOSE_PAREN):
+                apply_skip_limit = parser.parse_value()
+                if type(apply_skip_limit) != bool:
+                    parser.error(f'{COUNT}() takes an optional boolean')
+            if not apply_skip_limit:
+                query.limit = query.skip = None
+            query.operation = COUNT
+            query.sort = []  # the order does not change a count
+            parser.expect(CLOSE_PAREN)
+            return
+        elif method == SORT:
+            query.sort = []
+            for field, direction in parser.parse_object().items():
+                if type(direction) != int or direction not in (MONGO_ASCENDING, MONGO_DESCENDING):
+                    parser.error(f'Sort direction of {field!r} must be {MONGO_ASCENDING} or {MONGO_DESCENDING}')
+                query.sort.append((field, direction))
+        else:
+            _limit_or_skip(parser, query, method, parser.parse_value())
+        parser.expect(CLOSE_PAREN)
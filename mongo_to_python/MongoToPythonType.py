@@ -1,5 +1,7 @@
 from MongoConstants import MONGO_NULL, MONGO_TRUE, MONGO_FALSE
 
+PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+
 
 def cast_non_str_primitive(s: str):
     """
@@ -19,3 +21,13 @@ def cast_non_str_primitive(s: str):
             return int(s)
         except ValueError:
             return float(s)
+
+
+def is_primitive(to_check) -> bool:
+    """
+    Check if value is primitive for the scope of this project.
+
+    :param to_check: value to check
+    :return: True if value is primitive else False
+    """
+    return type(to_check) in PRIMITIVE_TYPES
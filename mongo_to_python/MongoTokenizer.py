@@ -0,0 +1,67 @@
+import re
+
+from mongo_to_python.Constants import QUOTE_DOUBLE, QUOTE_SINGLE
+
+# token kinds
+PUNCTUATION = 1  # one of the structural chars. Ex/ '{', ':', ','
+STRING = 2  # quoted text. The token value does not include the quotes
+WORD = 3  # anything unquoted that is not punctuation. Ex/ 'db.user.find', '$gt', '100', 'null'
+END = 4  # marks the end of the input so the parser never has to check the length
+
+# One alternation per token kind. Strings are matched whole so that special chars inside
+# them (Ex/ '{' or ',') never reach the punctuation branch.
+# Any char not matched by the first four branches can only be an unclosed quote.
+_TOKEN_PATTERN = re.compile(
+    r'\s*(?:'
+    r'(?P<punctuation>[{}\[\]():,])'
+    rf'|{QUOTE_DOUBLE}(?P<double>[^{QUOTE_DOUBLE}]*){QUOTE_DOUBLE}'
+    rf"|{QUOTE_SINGLE}(?P<single>[^{QUOTE_SINGLE}]*){QUOTE_SINGLE}"
+    rf'''|(?P<word>[^\s{{}}\[\]():,{QUOTE_DOUBLE}{QUOTE_SINGLE}]+)'''
+    r'|(?P<unclosed>\S)'
+    r')'
+)
+
+
+class Token:
+    """
+    A single lexical unit of a mongo call. Keeps the position in the source string so errors
+    can point at the offending char.
+    """
+    __slots__ = ('kind', 'value', 'position')
+
+    def __init__(self, kind: int, value: str, position: int):
+        self.kind = kind
+        self.value = value
+        self.position = position
+
+    def __repr__(self):
+        return f'Token(kind={self.kind}, value={self.value!r}, position={self.position})'
+
+
+def tokenize(mongo: str, position: int = 0):
+    """
+    Read a string encoded mongo call (or any piece of one) once, from left to right, and yield its tokens.
+    Nothing is re-scanned and no substrings other than the token values are made.
+    The last token is always an END token.
+
+    Example: '{$ne: "rose"}' -> '{', '$ne', ':', 'rose' (STRING), '}', END
+    :param mongo: string encoded mongo call, query or projection
+    :param position: index to start reading from
+    :return: generator of Token
+    """
+    match_at = _TOKEN_PATTERN.match
+    while True:
+        match = match_at(mongo, position)
+        if match is None:  # only whitespace (or nothing) is left
+            break
+        kind = match.lastgroup
+        if kind == 'punctuation':
+            yield Token(PUNCTUATION, match.group(kind), match.start(kind))
+        elif kind == 'word':
+            yield Token(WORD, match.group(kind), match.start(kind))
+        elif kind == 'unclosed':
+            raise ValueError(f'Unclosed string starting at index {match.start(kind)}')
+        else:  # a string with either quote type. The position points at the opening quote
+            yield Token(STRING, match.group(kind), match.start(kind) - 1)
+        position = match.end()
+    yield Token(END, '', len(mongo))
@@ -0,0 +1,376 @@
+"""
+Typed intermediate representation of a mongo query.
+This is the contract between mongo_to_python (which builds it) and mongopython_to_sql (which renders it).
+
+{a: 1, b: {$gt: 1, $lt: 5}, $or: [{c: {$in: [1, 2]}}, {d: null}]}
+        v
+And(document)
+ |- FieldPredicate(a $eq Literal(1))
+ |- And(field)
+ |   |- FieldPredicate(b $gt Literal(1))
+ |   |- FieldPredicate(b $lt Literal(5))
+ |- Or
+     |- And(document)
+     |   |- In(c, (1, 2))
+     |- And(document)
+         |- FieldPredicate(d $eq Literal(None))
+
+Nodes use __slots__ and tuples so that big filters stay compact. They are immutable by convention,
+hashable and compare by value (with True and 1 kept distinct), which lets passes dedupe them.
+The nested dict form is still available with to_dict().
+Hashing, equality and to_dict() do not recurse (And/Or keep the hash of their children, the others walk the
+tree with an explicit stack), so they work on trees of any depth.
+"""
+from MongoConstants import MONGO_LESS_THAN, MONGO_LESS_THAN_EQ, MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ, \
+    MONGO_NOT_EQUAL, MONGO_EQUAL, MONGO_IN, MONGO_OR, MONGO_AND
+from mongo_to_python.MongoToPythonType import is_primitive, PRIMITIVE_TYPES
+
+# operators that compare a field with a single primitive
+FIELD_OPERATORS = (MONGO_LESS_THAN, MONGO_LESS_THAN_EQ, MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ,
+                   MONGO_NOT_EQUAL, MONGO_EQUAL)
+
+# And.grouping values. They record where an AND came from so the SQL keeps the grouping of the mongo query
+GROUP_DOCUMENT = 'document'  # the keys of one query dict. Ex/ {a: 1, b: 2}
+GROUP_FIELD = 'field'  # the operators applied to one field. Ex/ {b: {$gt: 1, $lt: 5}}
+GROUP_EXPLICIT = MONGO_AND  # an explicit {$and: [...]}
+GROUPINGS = (GROUP_DOCUMENT, GROUP_FIELD, GROUP_EXPLICIT)
+_END = object()  # marks an exhausted iterator in from_dict
+
+
+def unique_values(values) -> tuple:
+    """
+    Drop repeated values, keeping the first occurrence of each. True, 1 and 1.0 are kept apart.
+    Runs in C for big lists (no Python level loop).
+
+    :param values: iterable of primitives
+    :return: tuple of the distinct values in their original order
+    """
+    values = values if type(values) in (list, tuple) else list(values)
+    return tuple(dict(zip(zip(map(type, values), values), values)).values())
+
+
+def typed_key(value) -> tuple:
+    """
+    Key of a primitive that keeps values of different types apart (Python considers True == 1 == 1.0)
+    :param value: Python primitive
+    :return: hashable key
+    """
+    return type(value), value
+
+
+class Node:
+    """
+    Base of all query nodes.
+    """
+    __slots__ = ()
+
+    def _key(self) -> tuple:
+        """
+        :return: hashable value used for equality and hashing
+        """
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        # the children of And/Or are compared level by level, not by recursing into their __eq__
+        pairs = [(self, other)]
+        while pairs:
+            left, right = pairs.pop()
+            if left is right:
+                continue
+            if type(left) != type(right) or hash(left) != hash(right) or left._key() != right._key():
+                return False
+            if type(left) == And or type(left) == Or:
+                pairs.extend(zip(left.children, right.children))
+        return True
+
+    def __hash__(self):
+        return hash((type(self), self._key()))
+
+    def to_dict(self) -> dict:
+        """
+        :return: the node as a mongo query dict. The compatibility view of the pipeline before the AST
+        """
+        raise NotImplementedError
+
+
+class Literal(Node):
+    """
+    A primitive value compared against a field.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        assert is_primitive(value), f'{value!r} is not a primitive'
+        self.value = value
+
+    def _key(self) -> tuple:
+        return typed_key(self.value)
+
+    def __repr__(self):
+        return f'Literal({self.value!r})'
+
+
+class FieldPredicate(Node):
+    """
+    A single comparison of a field with a literal. Ex/ {age: {$gt: 10}} -> FieldPredicate('age', '$gt', Literal(10))
+    Equality written as {age: 10} uses the $eq operator.
+    """
+    __slots__ = ('field', 'operator', 'literal')
+
+    def __init__(self, field: str, operator: str, literal: Literal):
+        assert field, 'Cannot have an empty column name'
+        assert operator in FIELD_OPERATORS, f'Unsupported operator {operator!r}'
+        self.field = field
+        self.operator = operator
+        self.literal = literal
+
+    @property
+    def operand(self):
+        """
+        :return: the compared value as it appears in the dict form
+        """
+        return self.literal.value
+
+    def _key(self) -> tuple:
+        return self.field, self.operator, self.literal._key()
+
+    def to_dict(self) -> dict:
+        if self.operator == MONGO_EQUAL:
+            return {self.field: self.literal.value}
+        return {self.field: {self.operator: self.literal.value}}
+
+    def __repr__(self):
+        return f'FieldPredicate({self.field!r}, {self.operator!r}, {self.literal!r})'
+
+
+class In(Node):
+    """
+    Membership of a field in a list of primitives. Ex/ {id: {$in: [1, 2, 1]}} -> In('id', (1, 2))
+    The values are kept as plain primitives rather than Literal nodes since the lists can be very long.
+    Repeated values are dropped.
+    """
+    __slots__ = ('field', 'values')
+    operator = MONGO_IN
+
+    def __init__(self, field: str, values):
+        assert field, 'Cannot have an empty column name'
+        values = unique_values(values)
+        assert set(map(type, values)) <= set(PRIMITIVE_TYPES), 'All values in a list must be primitives'
+        self.field = field
+        self.values = values
+
+    @property
+    def operand(self) -> list:
+        """
+        :return: the values as they appear in the dict form
+        """
+        return list(self.values)
+
+    def _key(self) -> tuple:
+        return self.field, tuple(typed_key(x) for x in self.values)
+
+    def to_dict(self) -> dict:
+        return {self.field: {MONGO_IN: list(self.values)}}
+
+    def __repr__(self):
+        return f'In({self.field!r}, {self.values!r})'
+
+
+class Between(Node):
+    """
+    Inclusive range of a field. Ex/ {age: {$gte: 10, $lte: 20}} -> Between('age', Literal(10), Literal(20))
+    Only built by the optimizer (see QueryOptimizer), the parser keeps the two bounds.
+    """
+    __slots__ = ('field', 'low', 'high')
+
+    def __init__(self, field: str, low: Literal, high: Literal):
+        assert field, 'Cannot have an empty column name'
+        assert low.value is not None and high.value is not None, 'BETWEEN bounds cannot be null'
+        self.field = field
+        self.low = low
+        self.high = high
+
+    def _key(self) -> tuple:
+        return self.field, self.low._key(), self.high._key()
+
+    def to_dict(self) -> dict:
+        return {self.field: {MONGO_GREATER_THAN_EQ: self.low.value, MONGO_LESS_THAN_EQ: self.high.value}}
+
+    def __repr__(self):
+        return f'Between({self.field!r}, {self.low!r}, {self.high!r})'
+
+
+class Never(Node):
+    """
+    A condition that no document satisfies. Ex/ {age: {$gt: 50, $lt: 10}} or {id: {$in: []}}
+    Only built by the optimizer (see QueryOptimizer). Its dict form is an empty $or.
+    """
+    __slots__ = ()
+
+    def _key(self) -> tuple:
+        return ()
+
+    def to_dict(self) -> dict:
+        return {MONGO_OR: []}
+
+    def __repr__(self):
+        return 'Never()'
+
+
+class And(Node):
+    """
+    Conjunction of conditions. grouping records which mongo construct it came from (see GROUPINGS).
+    """
+    __slots__ = ('children', 'grouping', '_hash')
+
+    def __init__(self, children, grouping: str = GROUP_EXPLICIT):
+        assert grouping in GROUPINGS
+        self.children = tuple(children)
+        self.grouping = grouping
+        self._hash = hash((And, grouping, self.children))  # the children already know their hash
+
+    def _key(self) -> tuple:
+        return self.grouping, len(self.children)  # the children are compared by __eq__
+
+    def __hash__(self):
+        return self._hash
+
+    def to_dict(self) -> dict:
+        return _to_dict(self)
+
+    def _merge(self, children: list) -> dict:
+        """
+        :param children: the dict form of each child
+        :return: the dict form of this node
+        """
+        if self.grouping == GROUP_EXPLICIT:
+            return {MONGO_AND: children}
+        elif self.grouping == GROUP_FIELD:
+            operators = {}
+            for child in self.children:
+                if type(child) == Between:
+                    operators.update(child.to_dict()[child.field])
+                else:
+                    operators[child.operator] = child.operand
+            return {self.children[0].field: operators}
+        merged = {}
+        for child_dict in children:
+            for key, value in child_dict.items():
+                if key not in merged:
+                    merged[key] = value
+                elif type(merged[key]) == dict and type(value) == dict and key not in (MONGO_AND, MONGO_OR) \
+                        and not merged[key].keys() & value.keys():
+                    merged[key] = {**merged[key], **value}  # two operator dicts on the same field
+                else:  # the keys collide, which a dict cannot express. Fall back to an explicit $and
+                    return {MONGO_AND: children}
+        return merged
+
+    def __repr__(self):
+        return f'And({list(self.children)!r}, {self.grouping!r})'
+
+
+class Or(Node):
+    """
+    Disjunction of conditions. Ex/ {$or: [{a: 1}, {b: 2}]}
+    """
+    __slots__ = ('children', '_hash')
+
+    def __init__(self, children):
+        self.children = tuple(children)
+        self._hash = hash((Or, self.children))
+
+    def _key(self) -> tuple:
+        return len(self.children),
+
+    def __hash__(self):
+        return self._hash
+
+    def to_dict(self) -> dict:
+        return _to_dict(self)
+
+    def _merge(self, children: list) -> dict:
+        """
+        :param children: the dict form of each child
+        :return: the dict form of this node
+        """
+        return {MONGO_OR: children}
+
+    def __repr__(self):
+        return f'Or({list(self.children)!r})'
+
+
+def _to_dict(node: Node) -> dict:
+    """
+    The dict form of a tree, built bottom up with an explicit stack (post order)
+    :param node: And or Or
+    :return: mongo query dict
+    """
+    dicts = []  # the dict form of the finished nodes, in order
+    stack = [(node, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if type(node) != And and type(node) != Or:
+            dicts.append(node.to_dict())
+        elif not expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+        else:
+            first = len(dicts) - len(node.children)
+            children = dicts[first:]
+            del dicts[first:]
+            dicts.append(node._merge(children))
+    return dicts[0]
+
+
+def from_dict(dict_where: dict) -> And:
+    """
+    Build the AST of a mongo query dict.
+    Nested $and/$or lists are walked with an explicit stack, so the depth is not bounded by the recursion limit.
+
+    Ex/ {id: {$ne: 1}} -> And([And([FieldPredicate('id', '$ne', Literal(1))], 'field')], 'document')
+    :param dict_where: mongo query argument encoded as a Python dict (None means no conditions)
+    :return: And node with document grouping
+    """
+    # frames: (iterator, nodes built so far, operator). A query dict has its (key, value) items and no operator,
+    # a condition list has its query dicts and the $and/$or it belongs to
+    stack = [(iter((dict_where or {}).items()), [], None)]
+    while True:
+        entries, children, operator = stack[-1]
+        entry = next(entries, _END)
+        if entry is _END:  # the frame is complete, add its node to the parent frame
+            stack.pop()
+            if operator is None:
+                node = And(children, GROUP_DOCUMENT)
+            else:
+                node = Or(children) if operator == MONGO_OR else And(children, GROUP_EXPLICIT)
+            if not stack:
+                return node
+            stack[-1][1].append(node)
+        elif operator is not None:  # the next query dict of a condition list
+            stack.append((iter((entry or {}).items()), [], None))
+        elif entry[0] in (MONGO_OR, MONGO_AND):  # a condition list (Ex/ {$or: [{...}, {...}]})
+            key, value = entry
+            assert type(value) == list, f'{key} requires a list of conditions'
+            stack.append((iter(value), [], key))
+        else:
+            children.append(_field_condition(*entry))
+
+
+def _field_condition(key: str, value) -> Node:
+    """
+    :param key: field name
+    :param value: primitive (equality) or dict of operators. Ex/ {$ne: 1, $lt: 4}
+    :return: FieldPredicate, or And with field grouping
+    """
+    if is_primitive(value):  # ex/ {id: 1}
+        return FieldPredicate(key, MONGO_EQUAL, Literal(value))
+    # operator condition Ex/ {id: {$ne: 1, $lt: 4}}
+    assert type(value) == dict, "Must have some sort of valid conditions for the column"
+    predicates = []
+    for operator, operand in value.items():
+        if operator == MONGO_IN:
+            assert type(operand) == list, f'{MONGO_IN} requires a list of values'
+            predicates.append(In(key, operand))
+        else:
+            predicates.append(FieldPredicate(key, operator, Literal(operand)))
+    return And(predicates, GROUP_FIELD)
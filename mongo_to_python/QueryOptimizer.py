@@ -0,0 +1,440 @@
+"""
+Optimization pass over the query AST, run between parsing and SQL rendering.
+
+Rewrites (each one keeps the meaning of the query):
+  - flatten associative AND/OR:      {$and: [{$and: [a, b]}, c]}           -> a AND b AND c
+  - drop single element AND/OR:      {$or: [a]}                            -> a
+  - remove duplicate conditions:     {$or: [a, a, b]}                      -> a OR b
+  - keep the tightest range bound:   {$gt: 1} AND {$gt: 5}                 -> {$gt: 5}
+  - merge inclusive bounds:          {$gte: a, $lte: b}                    -> BETWEEN a AND b
+  - fold equalities into IN:         {$or: [{id: 1}, {id: 2}]}             -> id IN (1, 2)
+  - unsatisfiable conditions:        {age: {$gt: 50, $lt: 10}}, {id: {$in: []}}, {a: 1, $and: [{a: 2}]}
+                                                                           -> Never (the AND/OR around it
+                                                                              is simplified as well)
+  - always true conditions:          {$or: [{a: null}, {a: {$ne: null}}]}  -> no condition
+
+A query that can never match is flagged with MongoQuery.provably_empty, so callers can skip the database.
+Like parsing and rendering, the pass walks the tree with an explicit stack, so deep queries do not hit the
+recursion limit.
+
+Usage:
+    report = optimize_query(query)  # query.where is replaced
+    print(report)
+    if query.provably_empty:
+        return []
+"""
+import operator
+
+from MongoConstants import MONGO_LESS_THAN, MONGO_LESS_THAN_EQ, MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ, \
+    MONGO_EQUAL, MONGO_NOT_EQUAL
+from mongo_to_python.MongoQueryParser import MongoQuery
+from mongo_to_python.QueryAst import Node, FieldPredicate, In, Between, Never, And, Or, GROUP_DOCUMENT, GROUP_FIELD, \
+    GROUP_EXPLICIT
+
+LOWER_BOUNDS = (MONGO_GREATER_THAN, MONGO_GREATER_THAN_EQ)
+UPPER_BOUNDS = (MONGO_LESS_THAN, MONGO_LESS_THAN_EQ)
+# Python equivalent of the comparison operators, used to test candidate values against a field's conditions
+COMPARISONS = {
+    MONGO_LESS_THAN: operator.lt,
+    MONGO_LESS_THAN_EQ: operator.le,
+    MONGO_GREATER_THAN: operator.gt,
+    MONGO_GREATER_THAN_EQ: operator.ge,
+    MONGO_NOT_EQUAL: operator.ne,
+    MONGO_EQUAL: operator.eq,
+}
+
+
+class OptimizationReport:
+    """
+    Human readable list of the rewrites the optimizer made. Repeats of a rewrite are counted.
+    """
+    __slots__ = ('counts',)
+
+    def __init__(self):
+        self.counts = {}  # rewrite description -> times it was made, in the order first made
+
+    def add(self, rewrite: str):
+        """
+        :param rewrite: description of a rewrite. Ex/ 'merged the bounds of age into BETWEEN'
+        """
+        self.counts[rewrite] = self.counts.get(rewrite, 0) + 1
+
+    @property
+    def rewrites(self) -> list:
+        """
+        :return: the rewrite descriptions. Ex/ ['flattened nested AND (x2)', 'folded equalities on id into IN']
+        """
+        return [rewrite if count == 1 else f'{rewrite} (x{count})' for rewrite, count in self.counts.items()]
+
+    def __bool__(self) -> bool:
+        """
+        :return: True if anything was rewritten
+        """
+        return bool(self.counts)
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def __iter__(self):
+        return iter(self.rewrites)
+
+    def __str__(self):
+        return '\n'.join(self.rewrites) if self.rewrites else 'no rewrites'
+
+
+def optimize(node: Node, report: OptimizationReport = None) -> tuple:
+    """
+    Optimize a query AST. The input is not modified.
+
+    :param node: query AST, usually an And with document grouping
+    :param report: optional report to add the rewrites to
+    :return: (optimized AST as an And with document grouping, report). An unsatisfiable query is And([Never()])
+    """
+    report = OptimizationReport() if report is None else report
+    optimized = _optimize_node(node, report)
+    # the top level is always a document so it renders without an extra pair of parenthesis
+    if type(optimized) != And:
+        optimized = And([optimized], GROUP_DOCUMENT)
+    elif _empty_field_group(optimized):
+        optimized = And([optimized], GROUP_DOCUMENT)
+    elif optimized.grouping != GROUP_DOCUMENT:
+        optimized = And(optimized.children, GROUP_DOCUMENT)
+    return optimized, report
+
+
+def optimize_query(query: MongoQuery) -> OptimizationReport:
+    """
+    Optimize the query arg of a MongoQuery in place.
+
+    :param query: parsed mongo query
+    :return: report of the rewrites
+    """
+    query.where, report = optimize(query.where)
+    return report
+
+
+def _optimize_node(node: Node, report: OptimizationReport) -> Node:
+    """
+    Bottom up rewrite of a tree, with an explicit stack (post order)
+    :param node: query AST node
+    :param report: report to add the rewrites to
+    :return: the rewritten node
+    """
+    optimized = []  # the rewritten nodes, in order
+    # (node, None, None) or (And/Or, its number of children, rewrites to report once they are rewritten)
+    stack = [(node, None, None)]
+    while stack:
+        node, size, rewrites = stack.pop()
+        node_type = type(node)
+        if node_type != And and node_type != Or or _empty_field_group(node):
+            optimized.append(_rewrite(node, [], report))
+        elif size is None:
+            children, rewrites = _nested_children(node)
+            stack.append((node, len(children), rewrites))
+            stack.extend((child, None, None) for child in reversed(children))
+        else:
+            first = len(optimized) - size
+            children = optimized[first:]
+            del optimized[first:]
+            for rewrite in rewrites:
+                report.add(rewrite)
+            optimized.append(_rewrite(node, children, report))
+    return optimized[0]
+
+
+def _nested_children(node: Node) -> tuple:
+    """
+    The children of an And/Or, with the children of nested nodes of the same type spliced in before they are
+    rewritten, so a chain of nested $or is rewritten once and not once per level.
+    Ex/ {$or: [{$or: [a, b]}, c]} -> [a, b, c]. The query dict around a nested $or is a single element And,
+    which is looked through as well: {$or: [{$or: [a, b]}]} is Or([And([Or([a, b])])])
+    :param node: And or Or
+    :return: (the flattened children, the rewrites to report)
+    """
+    node_type = type(node)
+    children = []
+    rewrites = []
+    stack = list(reversed(node.children))
+    while stack:
+        child = stack.pop()
+        inner = child
+        while type(inner) != node_type and (type(inner) == And or type(inner) == Or) and len(inner.children) == 1:
+            inner = inner.children[0]
+        if type(inner) != node_type or _empty_field_group(inner):
+            children.append(child)
+            continue
+        while child is not inner:  # reported like _rewrite: a query dict with one condition is not nesting
+            if type(child) == Or or child.grouping == GROUP_EXPLICIT:
+                rewrites.append(f'removed single element {"$or" if type(child) == Or else "$and"}')
+            child = child.children[0]
+        stack.extend(reversed(child.children))
+        if len(child.children) == 1 and (node_type == Or or child.grouping == GROUP_EXPLICIT):
+            rewrites.append(f'removed single element {"$or" if node_type == Or else "$and"}')
+        elif node_type == Or or (child.grouping != GROUP_FIELD and len(child.children) > 1):
+            # like _flatten: field groups are not nesting to the reader, and an empty AND (always true) disappears
+            rewrites.append(f'flattened nested {"OR" if node_type == Or else "AND"}')
+    return children, rewrites
+
+
+def _rewrite(node: Node, children: list, report: OptimizationReport) -> Node:
+    """
+    Rewrite of a single node
+    :param node: query AST node
+    :param children: the rewritten children of an And/Or
+    :param report: report to add the rewrites to
+    :return: the rewritten node
+    """
+    node_type = type(node)
+    if node_type == In and not [x for x in node.values if x is not None]:  # NULL IN (...) is never true
+        report.add(f'$in on {node.field} has no values to match')
+        return Never()
+    if node_type != And and node_type != Or or _empty_field_group(node):
+        return node  # predicates are already as simple as they get
+    children = _flatten(node_type, children, report)
+    if node_type == And:
+        if Never() in children:
+            return Never()  # the reason was reported where the Never was made
+        children = _dedupe(children, report)
+        reason = _contradiction(children)
+        if reason is not None:
+            report.add(f'{reason}, the condition can never match')
+            return Never()
+        children = _merge_ranges(children, report)
+        if not children:
+            return And([], GROUP_DOCUMENT)  # always true
+    else:
+        if not children:
+            report.add('empty $or matches nothing')
+            return Never()
+        satisfiable = [x for x in children if type(x) != Never]
+        if not satisfiable:
+            return Never()
+        for _ in range(len(children) - len(satisfiable)):
+            report.add('removed unsatisfiable $or branch')
+        children = _dedupe(satisfiable, report)
+        reason = _tautology(children)
+        if reason is not None:
+            report.add(f'{reason}, the $or matches everything')
+            return And([], GROUP_DOCUMENT)
+        children = _fold_equalities(children, report)
+    if len(children) == 1:
+        if node_type == Or or node.grouping == GROUP_EXPLICIT:
+            report.add(f'removed single element {"$or" if node_type == Or else "$and"}')
+        return children[0]
+    if node_type == Or:
+        return Or(children)
+    return And(children, node.grouping)
+
+
+def _empty_field_group(node: Node) -> bool:
+    """
+    {a: {}} parses to an And without children and without the field name. It is left as it is, not taken
+    for an always true condition
+    """
+    return type(node) == And and node.grouping == GROUP_FIELD and not node.children
+
+
+def _flatten(node_type: type, children: list, report: OptimizationReport) -> list:
+    """
+    Splice the children of nested nodes of the same type into the parent. (a AND (b AND c)) -> (a AND b AND c)
+    :param node_type: And or Or
+    :param children: optimized children of the parent
+    :param report: report to add the rewrites to
+    :return: the flattened children
+    """
+    flattened = []
+    for child in children:
+        if type(child) == node_type and not _empty_field_group(child):
+            flattened.extend(child.children)
+            # field groups are not nesting to the reader, and an empty AND (always true) just disappears
+            if node_type == Or or (child.grouping != GROUP_FIELD and child.children):
+                report.add(f'flattened nested {"OR" if node_type == Or else "AND"}')
+        else:
+            flattened.append(child)
+    return flattened
+
+
+def _dedupe(children: list, report: OptimizationReport) -> list:
+    """
+    Remove repeated conditions. A AND A -> A and A OR A -> A
+    :param children: children of an And/Or
+    :param report: report to add the rewrites to
+    :return: the distinct children in their original order. Empty field groups are kept, they may be on
+        different fields
+    """
+    seen = set()
+    distinct = []
+    for child in children:
+        if _empty_field_group(child) or child not in seen:
+            seen.add(child)
+            distinct.append(child)
+    for _ in range(len(children) - len(distinct)):
+        report.add('removed duplicate condition')
+    return distinct
+
+
+def _comparable(values: list) -> bool:
+    """
+    Strings are left out: their order and equality depend on the collation of the database
+    (Ex/ 'a' = 'A' under the default MySQL collation), which Python cannot reproduce.
+    :param values: primitives
+    :return: True if they compare the same way in Python and SQL (all numbers)
+    """
+    return all(type(x) in (int, float) for x in values)
+
+
+def _contradiction(children: list):
+    """
+    Look for conditions on the same field that cannot all hold. Ex/ a > 50 AND a < 10, a = 1 AND a = 2
+    Only values that compare the same way in Python and SQL (numbers) are reasoned about, anything else is left alone.
+
+    :param children: deduplicated children of an And
+    :return: description of the contradiction, or None if the conditions may all hold
+    """
+    fields = {}  # field -> list of predicates
+    for child in children:
+        if type(child) == FieldPredicate or type(child) == In:
+            fields.setdefault(child.field, []).append(child)
+    for field, predicates in fields.items():
+        if len(predicates) > 1:
+            reason = _field_contradiction(predicates)
+            if reason is not None:
+                return f'{field} {reason}'
+    return None
+
+
+def _field_contradiction(predicates: list):
+    """
+    :param predicates: two or more distinct FieldPredicate/In on one field, all combined with AND
+    :return: description of the contradiction, or None
+    """
+    if any(type(x) == FieldPredicate and x.operator == MONGO_EQUAL and x.literal.value is None for x in predicates):
+        # any other comparison with NULL is unknown (or the opposite IS NOT NULL)
+        return 'cannot be null and compared with a value'
+    candidates = None  # the values the equalities and $in lists leave possible. None means unrestricted
+    comparisons = []  # the other predicates
+    for predicate in predicates:  # predicates on other values are left out, the rest must still all hold
+        if type(predicate) == In:
+            values = [x for x in predicate.values if x is not None]
+        elif predicate.literal.value is None:  # IS NOT NULL holds for any candidate value
+            continue
+        else:
+            values = [predicate.literal.value]
+        if not _comparable(values):
+            continue
+        elif type(predicate) == FieldPredicate and predicate.operator != MONGO_EQUAL:
+            comparisons.append(predicate)
+        elif candidates is None:
+            candidates = values
+        else:
+            candidates = [x for x in candidates if x in values]
+    if candidates == []:
+        return 'has no value that satisfies every equality'
+    if candidates is not None:
+        if not [x for x in candidates if all(COMPARISONS[y.operator](x, y.literal.value) for y in comparisons)]:
+            return 'has no value that satisfies every condition'
+        return None
+    lower = [x for x in comparisons if x.operator in LOWER_BOUNDS]
+    upper = [x for x in comparisons if x.operator in UPPER_BOUNDS]
+    for low in lower:
+        for high in upper:
+            if low.literal.value > high.literal.value or (low.literal.value == high.literal.value and (
+                    low.operator == MONGO_GREATER_THAN or high.operator == MONGO_LESS_THAN)):
+                return 'has an empty range'
+    return None
+
+
+def _tautology(children: list):
+    """
+    Look for conditions that make an $or always true. Ex/ a IS NULL OR a IS NOT NULL, or an empty query dict
+    :param children: deduplicated children of an Or
+    :return: description of the tautology, or None
+    """
+    nulls = set()  # fields compared with IS NULL
+    not_nulls = set()  # fields compared with IS NOT NULL
+    for child in children:
+        if type(child) == And and not child.children and child.grouping != GROUP_FIELD:
+            return 'an empty condition'
+        if type(child) == FieldPredicate and child.literal.value is None:
+            if child.operator == MONGO_EQUAL:
+                nulls.add(child.field)
+            elif child.operator == MONGO_NOT_EQUAL:
+                not_nulls.add(child.field)
+    both = nulls & not_nulls
+    if both:
+        return f'{min(both)} is either null or not null'
+    return None
+
+
+def _merge_ranges(children: list, report: OptimizationReport) -> list:
+    """
+    Keep only the tightest lower and upper bound of each field and merge an inclusive pair into BETWEEN.
+    :param children: children of an And
+    :param report: report to add the rewrites to
+    :return: the rewritten children. The merged bounds take the place of the first bound of their field
+    """
+    bounds = {}  # field -> list of range FieldPredicate
+    for child in children:
+        if type(child) == FieldPredicate and child.operator in LOWER_BOUNDS + UPPER_BOUNDS \
+                and child.literal.value is not None:
+            bounds.setdefault(child.field, []).append(child)
+    merged = {}  # field -> the nodes replacing its bounds
+    for field, predicates in bounds.items():
+        lower = [x for x in predicates if x.operator in LOWER_BOUNDS]
+        upper = [x for x in predicates if x.operator in UPPER_BOUNDS]
+        if len(lower) > 1 and _comparable([x.literal.value for x in lower]):
+            # the largest value wins. On a tie $gt is stricter than $gte
+            lower = [max(lower, key=lambda x: (x.literal.value, x.operator == MONGO_GREATER_THAN))]
+            report.add(f'kept the tightest lower bound of {field}')
+        if len(upper) > 1 and _comparable([x.literal.value for x in upper]):
+            upper = [min(upper, key=lambda x: (x.literal.value, x.operator != MONGO_LESS_THAN))]
+            report.add(f'kept the tightest upper bound of {field}')
+        if len(lower) == 1 and len(upper) == 1 and lower[0].operator == MONGO_GREATER_THAN_EQ \
+                and upper[0].operator == MONGO_LESS_THAN_EQ:
+            merged[field] = [Between(field, lower[0].literal, upper[0].literal)]
+            report.add(f'merged the bounds of {field} into BETWEEN')
+        elif len(lower) + len(upper) != len(predicates):
+            merged[field] = lower + upper
+    if not merged:
+        return children
+    replaced = {id(x) for field in merged for x in bounds[field]}
+    rewritten = []
+    for child in children:
+        if id(child) not in replaced:
+            rewritten.append(child)
+        elif child.field in merged:  # the first bound of the field takes all the merged nodes
+            rewritten.extend(merged.pop(child.field))
+    return rewritten
+
+
+def _fold_equalities(children: list, report: OptimizationReport) -> list:
+    """
+    Fold equalities (and $in lists) on the same field inside an $or into a single IN.
+    a = 1 OR a = 2 OR b = 3 -> a IN (1, 2) OR b = 3
+    Null equalities are not folded since SQL compares NULL with IS.
+
+    :param children: children of an Or
+    :param report: report to add the rewrites to
+    :return: the rewritten children. The IN takes the place of the first folded condition of its field
+    """
+    groups = {}  # field -> list of foldable children
+    for child in children:
+        if type(child) == In or (type(child) == FieldPredicate and child.operator == MONGO_EQUAL
+                                 and child.literal.value is not None):
+            groups.setdefault(child.field, []).append(child)
+    groups = {field: members for field, members in groups.items() if len(members) > 1}
+    if not groups:
+        return children
+    folded = {id(x) for members in groups.values() for x in members}
+    rewritten = []
+    for child in children:
+        if id(child) not in folded:
+            rewritten.append(child)
+        elif child.field in groups:  # the first folded condition of the field becomes the IN
+            members = groups.pop(child.field)
+            values = []
+            for member in members:
+                values.extend(member.values if type(member) == In else (member.literal.value,))
+            rewritten.append(In(child.field, values))
+            report.add(f'folded equalities on {child.field} into IN')
+    return rewritten
@@ -0,0 +1,254 @@
+"""
+Render the query AST (mongo_to_python.QueryAst) as SQL conditions.
+
+Parenthesis follow the grouping of the mongo query:
+  - every field condition of a query dict is wrapped:           (a = 1) AND (b > 1 AND b < 5)
+  - the conditions of an $or/$and are joined inside one pair:   ((a = 1) OR (b = 2))
+
+The write_ functions pass the SQL to a callback in fragments instead of building nested strings.
+The render_ functions join those fragments into a string.
+"""
+import json
+
+from MongoConstants import MONGO_NOT_EQUAL, MONGO_EQUAL
+from mongo_to_python.QueryAst import Node, FieldPredicate, In, Between, Never, And, Or, GROUP_DOCUMENT, GROUP_FIELD
+from mongopython_to_sql.Dialect import GENERIC
+from mongopython_to_sql.RenderContext import RenderContext
+from mongopython_to_sql.SqlLiteral import render_literal
+from SqlConstants import OPERATOR_MAPPING, SQL_AND, SQL_OR, SQL_IS, SQL_IS_NOT, SQL_IN, SQL_BETWEEN, \
+    SQL_FALSE, IN_STRATEGY_INLINE, IN_STRATEGY_JSON_EACH, IN_STRATEGY_VALUES, IN_STRATEGY_ANY_ARRAY
+
+_AND_JOIN = f' {SQL_AND} '
+_OR_JOIN = f' {SQL_OR} '
+IN_BATCH_SIZE = 1024  # values per fragment of an inline or VALUES list
+# the kinds of work on the render stack of _write_nodes
+_CONDITIONS = 0  # a condition list (write_conditions)
+_OPERAND = 1  # a parenthesized node (write_operand)
+_PREDICATE = 2  # a comparison without parenthesis (write_predicate)
+
+
+def ast_to_where_conditions(node: Node, context: RenderContext = None) -> str:
+    """
+    Convert a query AST to an SQL condition list
+
+    Ex/ input: And([FieldPredicate('id', '$eq', Literal(1))], 'document') output: '(id = 1)'
+
+    Note: This function does not append the WHERE operator.
+    :param node: query AST, usually an And with document grouping
+    :param context: optional RenderContext. When parameterized, literals are bound instead of inlined
+    :return: sql condition list ('' when there are no conditions)
+    """
+    return _render(write_conditions, node, context)
+
+
+def render_operand(node: Node, context: RenderContext = None) -> str:
+    """
+    Render a node so that it can be safely combined with AND/OR (i.e. wrapped in parenthesis)
+
+    :param node: query AST node
+    :param context: optional RenderContext
+    :return: parenthesized SQL condition
+    """
+    return _render(write_operand, node, context)
+
+
+def render_predicate(node: Node, context: RenderContext = None) -> str:
+    """
+    Render a single field comparison without parenthesis
+
+    :param node: FieldPredicate, In, Between or Never
+    :param context: optional RenderContext
+    :return: SQL comparison. Ex/ 'id IN (1, 2)'
+    """
+    return _render(write_predicate, node, context)
+
+
+def render_in(node: In, context: RenderContext = None) -> str:
+    """
+    Render a $in. see write_in
+    :param node: In node
+    :param context: optional RenderContext
+    :return: SQL membership test
+    """
+    return _render(write_in, node, context)
+
+
+def _render(writer, node: Node, context: RenderContext) -> str:
+    """
+    :param writer: one of the write_ functions
+    :return: the fragments written for node, joined
+    """
+    sql = []
+    writer(node, sql.append, context)
+    return ''.join(sql)
+
+
+def write_conditions(node: Node, write, context: RenderContext = None):
+    """
+    Write the SQL condition list of a query AST in fragments (see ast_to_where_conditions).
+    Every fragment is written once, so the SQL is produced in linear time and never has to be held in memory.
+
+    :param node: query AST, usually an And with document grouping
+    :param write: called with each str fragment in order. Ex/ the write method of a file, or list.append
+    :param context: optional RenderContext
+    """
+    _write_nodes(_CONDITIONS, node, write, context)
+
+
+def write_operand(node: Node, write, context: RenderContext = None):
+    """
+    Write a node wrapped in parenthesis (see render_operand)
+
+    :param node: query AST node
+    :param write: fragment callback. see write_conditions
+    :param context: optional RenderContext
+    """
+    _write_nodes(_OPERAND, node, write, context)
+
+
+def write_predicate(node: Node, write, context: RenderContext = None):
+    """
+    Write a single field comparison without parenthesis (see render_predicate)
+
+    :param node: FieldPredicate, In, Between or Never
+    :param write: fragment callback. see write_conditions
+    :param context: optional RenderContext
+    """
+    _write_nodes(_PREDICATE, node, write, context)
+
+
+def _write_nodes(kind: int, node: Node, write, context: RenderContext):
+    """
+    Write a node without recursion, so the nesting depth of a query is not bounded by the recursion limit.
+    The stack holds the work left, next last: str fragments to write and (kind, node) pairs to expand.
+    A node is expanded by pushing its parts in reverse order, so every node is expanded once.
+
+    :param kind: _CONDITIONS, _OPERAND or _PREDICATE (what write_conditions, write_operand and write_predicate do)
+    :param node: query AST node
+    :param write: fragment callback. see write_conditions
+    :param context: optional RenderContext
+    """
+    stack = [(kind, node)]
+    push = stack.append
+    while stack:
+        entry = stack.pop()
+        if type(entry) == str:
+            write(entry)
+            continue
+        kind, node = entry
+        node_type = type(node)
+        if kind == _PREDICATE:
+            if node_type != And and node_type != Or:
+                _write_comparison(node, write, context)
+                continue
+            kind = _OPERAND  # a junction inside a field group
+        elif kind == _CONDITIONS:
+            if node_type == And and node.grouping == GROUP_DOCUMENT:
+                # multiple mongo conditions are combined with AND
+                _push_joined(stack, node.children, _OPERAND, _AND_JOIN)
+                continue
+            kind = _OPERAND
+        # the node wrapped in parenthesis
+        push(')')
+        if node_type == And:
+            if node.grouping == GROUP_FIELD:  # {id: {$ne: 1, $lt: 4}} in SQL (id != 1 AND id < 4)
+                _push_joined(stack, node.children, _PREDICATE, _AND_JOIN)
+            elif node.grouping == GROUP_DOCUMENT:
+                push((_CONDITIONS, node))
+            else:
+                _push_joined(stack, node.children, _CONDITIONS, _AND_JOIN)
+        elif node_type == Or:
+            _push_joined(stack, node.children, _CONDITIONS, _OR_JOIN)
+        else:
+            push((_PREDICATE, node))
+        push('(')
+
+
+def _push_joined(stack: list, nodes: tuple, kind: int, separator: str):
+    """
+    Push nodes to the render stack so that they are written in order with separator between them
+    """
+    for i in range(len(nodes) - 1, -1, -1):
+        stack.append((kind, nodes[i]))
+        if i:
+            stack.append(separator)
+
+
+def _write_comparison(node: Node, write, context: RenderContext):
+    """
+    Write a FieldPredicate, In, Between or Never
+    """
+    node_type = type(node)
+    if node_type == FieldPredicate:
+        value = node.literal.value
+        sql_operator = OPERATOR_MAPPING[node.operator]
+        # SQL requires IS/IS NOT when comparing NULL
+        if value is None and node.operator == MONGO_EQUAL:
+            sql_operator = SQL_IS
+        elif value is None and node.operator == MONGO_NOT_EQUAL:
+            sql_operator = SQL_IS_NOT
+        write(f'{column(node.field, context)} {sql_operator} {render_literal(value, context)}')
+    elif node_type == In:
+        write_in(node, write, context)
+    elif node_type == Between:
+        low = render_literal(node.low.value, context)
+        write(f'{column(node.field, context)} {SQL_BETWEEN} {low} {SQL_AND} {render_literal(node.high.value, context)}')
+    else:
+        assert node_type == Never, f'Cannot render {node!r}'
+        write(SQL_FALSE)
+
+
+def write_in(node: In, write, context: RenderContext = None):
+    """
+    Write a $in. Short lists are inlined. Lists longer than the context in_threshold use the
+    context in_strategy, which keeps huge lists out of the SQL expression tree.
+    Inline and VALUES lists are written IN_BATCH_SIZE values at a time.
+
+    Ex/ inline: 'id IN (1, 2)', json_each: 'id IN (SELECT value FROM json_each(\'[1,2]\'))',
+        any_array (postgres): 'id = ANY($1::bigint[])'
+    :param node: In node
+    :param write: fragment callback. see write_conditions
+    :param context: optional RenderContext
+    """
+    strategy = context.in_strategy_for(len(node.values)) if context is not None else IN_STRATEGY_INLINE
+    field = column(node.field, context)
+    if strategy == IN_STRATEGY_ANY_ARRAY:
+        array = context.dialect.array(node.values, context)
+        if array is not None:
+            write(f'{field} = ANY({array})')
+            return
+        strategy = IN_STRATEGY_INLINE  # the values have no common array type
+    if strategy == IN_STRATEGY_INLINE:
+        # todo: SQL may not support type mixing in lists
+        write(f'{field} {SQL_IN} (')
+        _write_batches(node.values, None, write, context)
+        write(')')
+    elif strategy == IN_STRATEGY_JSON_EACH:  # the whole list is a single literal (or a single bound parameter)
+        json_list = json.dumps(node.values, separators=(',', ':'))
+        write(f'{field} {SQL_IN} (SELECT value FROM json_each({render_literal(json_list, context)}))')
+    elif strategy == IN_STRATEGY_VALUES:
+        write(f'{field} {SQL_IN} (VALUES ')
+        _write_batches(node.values, '({})', write, context)
+        write(')')
+    else:
+        write(f'{field} {SQL_IN} (SELECT value FROM temp.{context.add_temp_table(node.values)})')
+
+
+def _write_batches(values: tuple, value_format: str, write, context: RenderContext):
+    """
+    Write the literals of values separated by commas, one fragment per IN_BATCH_SIZE values
+    :param value_format: optional str.format pattern of a single value. Ex/ '({})'
+    """
+    for start in range(0, len(values), IN_BATCH_SIZE):
+        literals = [render_literal(x, context) for x in values[start:start + IN_BATCH_SIZE]]
+        batch = ', '.join(literals if value_format is None else map(value_format.format, literals))
+        write(f', {batch}' if start else batch)
+
+
+def column(field: str, context: RenderContext = None) -> str:
+    """
+    :param field: mongo field name
+    :param context: optional RenderContext
+    :return: the column as an identifier of the context dialect. Ex/ sqlite: 'age' -> '"age"'
+    """
+    return (context.dialect if context is not None else GENERIC).identifier(field)
@@ -0,0 +1,172 @@
+"""
+SQL dialects. A dialect decides how literals, identifiers, LIMIT/OFFSET and big $in lists are spelled,
+so one parsed query can be rendered for several databases:
+
+    query = parse('db.user.find({active: true}).skip(5)')
+    sql_from_mongo(query, context=RenderContext(dialect='sqlite'))
+        -> SELECT * FROM "user" WHERE ("active" = 1) LIMIT -1 OFFSET 5;
+    sql_from_mongo(query, context=RenderContext(dialect='postgres'))
+        -> SELECT * FROM "user" WHERE ("active" = TRUE) OFFSET 5;
+    sql_from_mongo(query, context=RenderContext(dialect='mysql'))
+        -> SELECT * FROM `user` WHERE (`active` = TRUE) LIMIT 18446744073709551615 OFFSET 5;
+
+The generic dialect is the output of the translator before dialects existed (unquoted identifiers).
+"""
+from mongo_to_python.MongoToPythonType import is_primitive
+from SqlConstants import SQL_NULL, SQL_LIMIT, SQL_OFFSET, SQL_NO_LIMIT, IN_STRATEGY_INLINE, IN_STRATEGY_JSON_EACH, \
+    IN_STRATEGY_VALUES, IN_STRATEGY_TEMP_TABLE, IN_STRATEGY_ANY_ARRAY, DIALECT_GENERIC, DIALECT_SQLITE, \
+    DIALECT_POSTGRES, DIALECT_MYSQL, DIALECTS
+
+MYSQL_NO_LIMIT = '18446744073709551615'  # the largest LIMIT, which is how the MySQL manual spells no limit
+
+
+class Dialect:
+    """
+    Generic SQL. Subclasses override the parts their database spells differently.
+
+    identifier_quote: char identifiers are wrapped in (a quote inside is doubled). None leaves them as they are
+    true/false: the boolean literals
+    escape_backslash: double backslashes in string literals (for databases that read them as escapes)
+    no_limit: LIMIT value that renders a skip without a limit. None renders the OFFSET alone
+    in_strategies: the IN_STRATEGIES the database supports. The first is used for big $in lists by default.
+        Generic SQL only has the portable ones
+    """
+    name = DIALECT_GENERIC
+    identifier_quote = None
+    true = 'TRUE'
+    false = 'FALSE'
+    escape_backslash = False
+    no_limit = SQL_NO_LIMIT
+    in_strategies = (IN_STRATEGY_INLINE, IN_STRATEGY_VALUES)
+
+    def identifier(self, name: str) -> str:
+        """
+        Ex/ postgres: 'user' -> '"user"'
+        :param name: table or column name
+        :return: the name as an SQL identifier
+        """
+        quote = self.identifier_quote
+        if quote is None:
+            return name
+        return f'{quote}{name.replace(quote, quote + quote)}{quote}'
+
+    def literal(self, primitive) -> str:
+        """
+        Take python primitive (term used loosely) and convert them to an SQL string.
+
+        :param primitive: Python primitive
+        :return: SQL string
+        """
+        # in the case that the value was a string, add quotes (SQL requires quotes around a string)
+        assert is_primitive(primitive)
+        if type(primitive) == str:
+            if self.escape_backslash:
+                primitive = primitive.replace('\\', '\\\\')
+            primitive = primitive.replace("'", "''")  # escape the single quotes by doubling them up
+            return f"'{primitive}'"
+        elif primitive is None:
+            return SQL_NULL
+        elif type(primitive) == bool:
+            return self.true if primitive else self.false
+        else:  # otherwise Python string casting works (for numeric)
+            return f'{primitive}'
+
+    def limit_offset(self, limit: int = None, skip: int = None) -> str:
+        """
+        Convert a mongo limit and skip to SQL LIMIT/OFFSET.
+        The values are validated integers so they are always inlined.
+
+        Ex/ (10, 20) -> ' LIMIT 10 OFFSET 20', (None, 20) -> ' LIMIT -1 OFFSET 20' (see no_limit)
+        :param limit: max number of rows, None for no limit
+        :param skip: rows to skip, None for none
+        :return: the clauses with a leading space, '' when neither is set
+        """
+        clause = ''
+        if limit:
+            clause = f' {SQL_LIMIT} {int(limit)}'
+        elif skip and self.no_limit is not None:
+            clause = f' {SQL_LIMIT} {self.no_limit}'
+        if skip:
+            clause += f' {SQL_OFFSET} {int(skip)}'
+        return clause
+
+    def array(self, values: tuple, context) -> str:
+        """
+        Render a $in list as one array value (IN_STRATEGY_ANY_ARRAY)
+        :param values: the $in values
+        :param context: RenderContext
+        :return: SQL array, or None if the values have no common array type
+        """
+        return None
+
+    def __repr__(self):
+        return f'{type(self).__name__}()'
+
+
+class SqliteDialect(Dialect):
+    """
+    SQLite: "quoted" identifiers and 1/0 booleans (TRUE and FALSE are only keywords since 3.23).
+    Big $in lists are passed as one JSON literal to json_each, or loaded into a temp table.
+    """
+    name = DIALECT_SQLITE
+    identifier_quote = '"'
+    true = '1'
+    false = '0'
+    in_strategies = (IN_STRATEGY_JSON_EACH, IN_STRATEGY_INLINE, IN_STRATEGY_VALUES, IN_STRATEGY_TEMP_TABLE)
+
+
+class PostgresDialect(Dialect):
+    """
+    PostgreSQL: "quoted" identifiers and an OFFSET without LIMIT.
+    Big $in lists are one typed array. Ex/ id = ANY($1::bigint[]) with the list bound as one parameter,
+    so the statement text (and its cached plan) does not depend on the length of the list.
+    """
+    name = DIALECT_POSTGRES
+    identifier_quote = '"'
+    no_limit = None
+    in_strategies = (IN_STRATEGY_ANY_ARRAY, IN_STRATEGY_INLINE, IN_STRATEGY_VALUES)
+    # python type -> array element type
+    ARRAY_TYPES = {bool: 'boolean', int: 'bigint', float: 'double precision', str: 'text'}
+
+    def array(self, values: tuple, context) -> str:
+        types = set(map(type, values))
+        if types == {int, float}:
+            types = {float}
+        if len(types) != 1 or None in values:
+            return None
+        array_type = self.ARRAY_TYPES[types.pop()]
+        if context.parameterized:
+            return f'{context.bind(list(values))}::{array_type}[]'
+        return f'ARRAY[{", ".join([self.literal(x) for x in values])}]::{array_type}[]'
+
+
+class MysqlDialect(Dialect):
+    """
+    MySQL: `quoted` identifiers and backslashes escaped in strings (the default sql_mode reads them as escapes).
+    MySQL sorts the constants of an IN list and binary searches them, so big lists stay inline.
+    """
+    name = DIALECT_MYSQL
+    identifier_quote = '`'
+    escape_backslash = True
+    no_limit = MYSQL_NO_LIMIT
+    in_strategies = (IN_STRATEGY_INLINE,)
+
+
+GENERIC = Dialect()
+SQLITE = SqliteDialect()
+POSTGRES = PostgresDialect()
+MYSQL = MysqlDialect()
+_BY_NAME = {dialect.name: dialect for dialect in (GENERIC, SQLITE, POSTGRES, MYSQL)}
+
+
+def get_dialect(dialect=None) -> Dialect:
+    """
+    :param dialect: Dialect, one of SqlConstants.DIALECTS, or None for the generic dialect
+    :return: the Dialect
+    """
+    if dialect is None:
+        return GENERIC
+    elif isinstance(dialect, Dialect):
+        return dialect
+    assert dialect in _BY_NAME, f'dialect must be one of {DIALECTS}'
+    return _BY_NAME[dialect]
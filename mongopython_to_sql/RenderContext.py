@@ -0,0 +1,103 @@
+from itertools import count
+
+from mongopython_to_sql.Dialect import Dialect, get_dialect
+from SqlConstants import PARAMSTYLE_QMARK, PARAMSTYLE_FORMAT, PARAMSTYLE_DOLLAR, PARAMSTYLES, \
+    IN_STRATEGY_INLINE, IN_STRATEGIES
+
+TEMP_TABLE_PREFIX = 'mongo_in_'
+_temp_table_ids = count()  # shared so that contexts rendered for the same connection never reuse a name
+
+
+class RenderContext:
+    """
+    State shared by the SQL rendering functions while a single query is rendered.
+
+    When a paramstyle is set, literals are collected in params and a placeholder is rendered in their place.
+    Otherwise literals are inlined into the SQL text.
+
+    $in lists longer than in_threshold are rendered with in_strategy (see SqlConstants.IN_STRATEGIES)
+    instead of an inline list. With the temp_table strategy the lists are collected in temp_tables
+    and have to be loaded with load_temp_tables before the SQL is executed.
+
+    The dialect (see Dialect) decides how literals, identifiers and LIMIT/OFFSET are spelled.
+    """
+    def __init__(self, paramstyle: str = None, in_threshold: int = None, in_strategy: str = None,
+                 dialect: Dialect = None):
+        """
+        :param paramstyle: optional placeholder style. One of SqlConstants.PARAMSTYLES
+        :param in_threshold: $in lists with more values than this use in_strategy. None always inlines
+        :param in_strategy: one of the in_strategies of the dialect. Defaults to the first (inline for generic SQL)
+        :param dialect: Dialect, or one of SqlConstants.DIALECTS. Defaults to generic SQL
+        """
+        self.dialect = get_dialect(dialect)
+        in_strategy = in_strategy or self.dialect.in_strategies[0]
+        assert paramstyle is None or paramstyle in PARAMSTYLES, f'paramstyle must be one of {PARAMSTYLES}'
+        assert in_strategy in IN_STRATEGIES, f'in_strategy must be one of {IN_STRATEGIES}'
+        assert in_strategy in self.dialect.in_strategies, \
+            f'the {self.dialect.name} dialect only supports the in_strategies {self.dialect.in_strategies}'
+        assert in_threshold is None or in_threshold >= 0, 'in_threshold cannot be negative'
+        self.paramstyle = paramstyle
+        self.params = []  # bound values in placeholder order
+        self.in_threshold = in_threshold
+        self.in_strategy = in_strategy
+        self.temp_tables = []  # (table name, values) for the temp_table strategy
+
+    @property
+    def parameterized(self) -> bool:
+        """
+        :return: True if literals are bound instead of inlined
+        """
+        return self.paramstyle is not None
+
+    def bind(self, value) -> str:
+        """
+        Keep value as a bound parameter.
+
+        Ex/ with the dollar paramstyle, the third bound value returns '$3'
+        :param value: Python primitive
+        :return: the placeholder to render in place of the value
+        """
+        self.params.append(value)
+        if self.paramstyle == PARAMSTYLE_QMARK:
+            return '?'
+        elif self.paramstyle == PARAMSTYLE_FORMAT:
+            return '%s'
+        assert self.paramstyle == PARAMSTYLE_DOLLAR
+        return f'${len(self.params)}'
+
+    def in_strategy_for(self, size: int) -> str:
+        """
+        :param size: number of values in the $in list
+        :return: the IN_STRATEGY to render a list of that size with
+        """
+        if self.in_threshold is None or size <= self.in_threshold or not size:
+            return IN_STRATEGY_INLINE
+        return self.in_strategy
+
+    def add_temp_table(self, values: tuple) -> str:
+        """
+        Register a $in list to be loaded into a temp table
+        :param values: the $in values
+        :return: the temp table name
+        """
+        name = f'{TEMP_TABLE_PREFIX}{next(_temp_table_ids)}'
+        self.temp_tables.append((name, values))
+        return name
+
+    def load_temp_tables(self, cursor):
+        """
+        Create and fill the temp tables of the temp_table strategy. Call before executing the SQL.
+        :param cursor: DB-API cursor (the temp tables are private to its connection)
+        """
+        placeholder = '%s' if self.paramstyle == PARAMSTYLE_FORMAT else '?'
+        for name, values in self.temp_tables:
+            cursor.execute(f'CREATE TEMP TABLE {name} (value)')
+            cursor.executemany(f'INSERT INTO {name} VALUES ({placeholder})', [(x,) for x in values])
+
+    def drop_temp_tables(self, cursor):
+        """
+        Drop the temp tables made by load_temp_tables
+        :param cursor: DB-API cursor of the same connection
+        """
+        for name, _ in self.temp_tables:
+            cursor.execute(f'DROP TABLE IF EXISTS {name}')
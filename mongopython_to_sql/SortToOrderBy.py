@@ -0,0 +1,35 @@
+from MongoConstants import MONGO_DESCENDING
+from mongopython_to_sql.Dialect import Dialect, get_dialect
+from SqlConstants import SQL_ORDER_BY, SQL_ASC, SQL_DESC
+
+
+def sort_to_order_by(sort: list, dialect: Dialect = None) -> str:
+    """
+    Convert a mongo sort (see MongoQuery.sort) to an SQL ORDER BY clause
+
+    Ex/ [('age', -1), ('id', 1)] -> ' ORDER BY age DESC, id ASC'
+    :param sort: list of (field, 1 or -1)
+    :param dialect: optional Dialect the columns are quoted for. Defaults to generic SQL
+    :return: the clause with a leading space, '' when there is no sort
+    """
+    if not sort:
+        return ''
+    identifier = get_dialect(dialect).identifier
+    columns = ', '.join([f'{identifier(field)} {SQL_DESC if direction == MONGO_DESCENDING else SQL_ASC}'
+                         for field, direction in sort])
+    return f' {SQL_ORDER_BY} {columns}'
+
+
+def limit_offset(limit: int = None, skip: int = None, dialect: Dialect = None) -> str:
+    """
+    Convert a mongo limit and skip to SQL LIMIT/OFFSET.
+    The values are validated integers so they are always inlined.
+
+    Ex/ (10, 20) -> ' LIMIT 10 OFFSET 20', (None, 20) -> ' LIMIT -1 OFFSET 20'
+    Note: LIMIT -1 (a skip without a limit) is SQLite syntax. PostgreSQL and MySQL reject it, pass their dialect
+    :param limit: max number of rows, None for no limit
+    :param skip: rows to skip, None for none
+    :param dialect: optional Dialect. Defaults to generic SQL
+    :return: the clauses with a leading space, '' when neither is set
+    """
+    return get_dialect(dialect).limit_offset(limit, skip)
@@ -1,32 +1,223 @@
 # todo: clean up tests with iteration
 # todo: move tests to a better place ;)
-from mongopython_to_sql.DictToWhere import dict_to_where_conditions
+from mongopython_to_sql.AstToWhere import write_conditions
 from mongopython_to_sql.DictToColumns import dict_to_columns
-from mongo_to_python.MongoQueryParser import MongoQuery
+from mongopython_to_sql.RenderContext import RenderContext
+from mongopython_to_sql.SortToOrderBy import sort_to_order_by, limit_offset
+from mongo_to_python.MongoQueryParser import MongoQuery, COUNT, DISTINCT
+from mongo_to_python.QueryAst import Node, And, GROUP_DOCUMENT, from_dict
+from SqlConstants import SQL_COUNT_ALL, SQL_DISTINCT, SQL_AS, SQL_COUNTED
 
+# write_sql collects fragments up to about this many chars before each write to the stream
+DEFAULT_CHUNK_SIZE = 64 * 1024
 
-def to_sql(table_name: str, conditions: dict, projection: dict) -> str:
+
+def to_sql(table_name: str, conditions, projection: dict, paramstyle: str = None, context: RenderContext = None,
+           sort: list = None, limit: int = None, skip: int = None):
     """
     Given a table name, a mongo query (conditions) and a mongo projection return the SQL equivalent
 
+    With a paramstyle the literals are not inlined. Instead a (sql, params) tuple is returned
+    Ex/ paramstyle='qmark': ('SELECT * FROM user WHERE (id IN (?, ?));', (1, 2))
+
     :param table_name: string table name
-    :param conditions: mongo query arg encoded as dict
+    :param conditions: query AST (see QueryAst), or mongo query arg encoded as dict
     :param projection: mongo projection arg encoded as dict
-    :return: SQL query
+    :param paramstyle: optional placeholder style. One of SqlConstants.PARAMSTYLES
+    :param context: optional RenderContext for the other render options (Ex/ the $in strategy or the dialect).
+        Its paramstyle is used instead of the paramstyle argument. Read its temp_tables after the call
+    :param sort: optional list of (field, 1 or -1). see MongoQuery.sort
+    :param limit: optional max number of rows
+    :param skip: optional number of rows to skip
+    :return: SQL query, or (SQL query, params) when a paramstyle is given
     """
-    condition_string = dict_to_where_conditions(conditions).strip()
-    if condition_string:  # only add the WHERE if there are conditions
-        condition_string = f' WHERE {condition_string}'
+    context = _render_context(paramstyle, context)
+    sql = []
+    _write_find(sql.append, context, table_name, conditions, projection, sort, limit, skip)
+    return _result(''.join(sql), context)
 
-    return f'SELECT {dict_to_columns(projection)} FROM {table_name}{condition_string};'
+
+def count_sql(table_name: str, conditions, paramstyle: str = None, context: RenderContext = None,
+              limit: int = None, skip: int = None):
+    """
+    SQL that counts the matching rows in the database, so only a single row is returned
+
+    Ex/ ('user', {'age': {'$gt': 20}}) -> 'SELECT COUNT(*) FROM user WHERE (age > 20);'
+    With a limit or skip the rows are counted in a subquery:
+        'SELECT COUNT(*) FROM (SELECT 1 FROM user LIMIT 5) AS counted;'
+    :param table_name: string table name
+    :param conditions: query AST, or mongo query arg encoded as dict
+    :param paramstyle: optional placeholder style. see to_sql
+    :param context: optional RenderContext. see to_sql
+    :param limit: optional max count
+    :param skip: optional number of rows to skip before counting
+    :return: SQL query, or (SQL query, params) when a paramstyle is given
+    """
+    context = _render_context(paramstyle, context)
+    sql = []
+    _write_count(sql.append, context, table_name, conditions, limit, skip)
+    return _result(''.join(sql), context)
+
+
+def distinct_sql(table_name: str, field: str, conditions, paramstyle: str = None, context: RenderContext = None):
+    """
+    SQL that returns the distinct values of a column among the matching rows
+
+    Ex/ ('user', 'name', {'age': {'$gt': 20}}) -> 'SELECT DISTINCT name FROM user WHERE (age > 20);'
+    :param table_name: string table name
+    :param field: the column
+    :param conditions: query AST, or mongo query arg encoded as dict
+    :param paramstyle: optional placeholder style. see to_sql
+    :param context: optional RenderContext. see to_sql
+    :return: SQL query, or (SQL query, params) when a paramstyle is given
+    """
+    context = _render_context(paramstyle, context)
+    sql = []
+    _write_distinct(sql.append, context, table_name, field, conditions)
+    return _result(''.join(sql), context)
+
+
+def _write_find(write, context: RenderContext, table_name: str, conditions, projection: dict,
+                sort: list = None, limit: int = None, skip: int = None):
+    """
+    Write the fragments of to_sql
+    """
+    dialect = context.dialect
+    write(f'SELECT {dict_to_columns(projection, dialect)} FROM {dialect.identifier(table_name)}')
+    _write_where(write, context, conditions)
+    write(f'{sort_to_order_by(sort, dialect)}{limit_offset(limit, skip, dialect)};')
+
+
+def _write_count(write, context: RenderContext, table_name: str, conditions, limit: int = None, skip: int = None):
+    """
+    Write the fragments of count_sql
+    """
+    table = context.dialect.identifier(table_name)
+    if limit or skip:
+        write(f'SELECT {SQL_COUNT_ALL} FROM (SELECT 1 FROM {table}')
+        _write_where(write, context, conditions)
+        write(f'{limit_offset(limit, skip, context.dialect)}) {SQL_AS} {SQL_COUNTED};')
+    else:
+        write(f'SELECT {SQL_COUNT_ALL} FROM {table}')
+        _write_where(write, context, conditions)
+        write(';')
+
+
+def _write_distinct(write, context: RenderContext, table_name: str, field: str, conditions):
+    """
+    Write the fragments of distinct_sql
+    """
+    identifier = context.dialect.identifier
+    write(f'SELECT {SQL_DISTINCT} {identifier(field)} FROM {identifier(table_name)}')
+    _write_where(write, context, conditions)
+    write(';')
 
 
-def sql_from_mongo(query: MongoQuery) -> str:
+def _render_context(paramstyle: str, context: RenderContext) -> RenderContext:
+    """
+    :return: the given context, or a new one with the paramstyle
+    """
+    if context is None:
+        return RenderContext(paramstyle)
+    assert paramstyle is None, 'set the paramstyle on the context'
+    return context
+
+
+def _write_where(write, context: RenderContext, conditions):
+    """
+    Write ' WHERE ...', or nothing when there are no conditions
+    :param write: fragment callback. see AstToWhere.write_conditions
+    :param context: RenderContext
+    :param conditions: query AST, or mongo query arg encoded as dict
+    """
+    where = conditions if isinstance(conditions, Node) else from_dict(conditions)
+    if type(where) == And and where.grouping == GROUP_DOCUMENT and not where.children:
+        return  # only add the WHERE if there are conditions
+    write(' WHERE ')
+    write_conditions(where, write, context)
+
+
+def _result(sql, context: RenderContext):
+    """
+    :param sql: the SQL, or what write_sql returns in its place
+    :return: sql, or (sql, params) when the context is parameterized
+    """
+    if context.parameterized:
+        return sql, tuple(context.params)
+    return sql
+
+
+def sql_from_mongo(query: MongoQuery, paramstyle: str = None, context: RenderContext = None):
     """
     Deconstructs MongoQuery for to_sql function and calls to_sql.
+    count and distinct queries go to count_sql and distinct_sql.
 
     see to_sql
     :param query:
+    :param paramstyle: optional placeholder style. see to_sql
+    :param context: optional RenderContext. see to_sql
     :return:
     """
-    return to_sql(query.table, query.conditions, query.projection)
\ No newline at end of file
+    if query.operation == COUNT:
+        return count_sql(query.table, query.where, paramstyle, context, query.limit, query.skip)
+    elif query.operation == DISTINCT:
+        return distinct_sql(query.table, query.distinct_field, query.where, paramstyle, context)
+    return to_sql(query.table, query.where, query.projection, paramstyle, context, query.sort, query.limit, query.skip)
+
+
+class _ChunkedWriter:
+    """
+    Collects fragments and writes them to a stream in chunks of about chunk_size chars,
+    so a stream (Ex/ a socket) is not written once per fragment
+    """
+    __slots__ = ('out', 'chunk_size', 'fragments', 'size', 'written')
+
+    def __init__(self, out, chunk_size: int):
+        self.out = out
+        self.chunk_size = chunk_size
+        self.fragments = []
+        self.size = 0
+        self.written = 0  # chars written to out
+
+    def write(self, fragment: str):
+        self.fragments.append(fragment)
+        self.size += len(fragment)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.fragments:
+            self.out.write(''.join(self.fragments))
+            self.written += self.size
+            self.fragments = []
+            self.size = 0
+
+
+def write_sql(query: MongoQuery, out, paramstyle: str = None, context: RenderContext = None,
+              chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Streaming sql_from_mongo: write the SQL of query to out instead of returning it.
+    The statement is never built as a whole, so huge filters (Ex/ $in lists of millions of values)
+    are rendered in linear time and at most about chunk_size chars are held at once.
+
+    Ex/ write_sql(parse('db.user.find({id: {$in: ids}})'), open('query.sql', 'w'))
+    If rendering fails, the chunks written so far stay in out.
+    :param query: MongoQuery
+    :param out: writable text stream. Ex/ an open file, io.StringIO or socket.makefile('w')
+    :param paramstyle: optional placeholder style. see to_sql
+    :param context: optional RenderContext. see to_sql
+    :param chunk_size: fragments are collected up to about this many chars before each out.write
+    :return: number of chars written, or (number of chars written, params) when a paramstyle is given
+    """
+    assert chunk_size > 0, 'chunk_size must be positive'
+    context = _render_context(paramstyle, context)
+    writer = _ChunkedWriter(out, chunk_size)
+    if query.operation == COUNT:
+        _write_count(writer.write, context, query.table, query.where, query.limit, query.skip)
+    elif query.operation == DISTINCT:
+        _write_distinct(writer.write, context, query.table, query.distinct_field, query.where)
+    else:
+        _write_find(writer.write, context, query.table, query.where, query.projection, query.sort, query.limit,
+                    query.skip)
+    writer.flush()
+    return _result(writer.written, context)
@@ -0,0 +1,30 @@
+from mongo_to_python.MongoToPythonType import is_primitive
+from mongopython_to_sql.Dialect import GENERIC
+from mongopython_to_sql.RenderContext import RenderContext
+
+
+def render_literal(primitive, context: RenderContext = None) -> str:
+    """
+    Render a literal either inline or, for a parameterized context, as a placeholder.
+    NULL is always inlined since SQL compares it with IS/IS NOT rather than a bound value.
+
+    :param primitive: Python primitive
+    :param context: optional RenderContext
+    :return: SQL string
+    """
+    if context is None:
+        return GENERIC.literal(primitive)
+    elif not context.parameterized or primitive is None:
+        return context.dialect.literal(primitive)
+    assert is_primitive(primitive)
+    return context.bind(primitive)
+
+
+def primitive_to_string(primitive):
+    """
+    Take python primitive (term used loosely) and convert them to an SQL string of the generic dialect.
+
+    :param primitive: Python primitive
+    :return: SQL string
+    """
+    return GENERIC.literal(primitive)
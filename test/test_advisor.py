@@ -0,0 +1,66 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from IndexAdvisor import IndexAdvisor, IndexRecommendation, main
+
+
+class IndexAdvisorTestCase(unittest.TestCase):
+    def advise(self, queries):
+        advisor = IndexAdvisor()
+        for mongo in queries:
+            advisor.add_mongo(mongo)
+        return advisor
+
+    def test_column_order(self):
+        advisor = self.advise([
+            'db.order.find({total: {$gte: 1, $lte: 10}, status: {$in: ["a", "b"]}, user_id: 1})',
+            'db.order.find({created: {$gt: 5}, total: {$lt: 3}, user_id: 2})',
+            'db.order.find({total: {$lt: 3}})',
+        ])
+        # total is the most used range column so it is the one indexed after user_id. Ties rank by name
+        self.assertEqual([(x.table, x.columns) for x in advisor.recommend()], [
+            ('order', ('total',)),
+            ('order', ('user_id', 'status', 'total')),
+            ('order', ('user_id', 'total')),
+        ])
+
+    def test_ranking(self):
+        advisor = self.advise(['db.user.find({name: "a", age: {$gt: 3}})',
+                               'db.user.find({age: {$gt: 3, $lt: 9}, name: "b"})',
+                               'db.user.find({name: "a"})',
+                               'db.user.find({$or: [{id: 1}, {id: 2}]})',
+                               'db.user.find({$or: [{id: 1}, {email: "x"}]})',
+                               'db.user.find({id: })',
+                               'db.user.find({a: {$gt: 5, $lt: 1}})'])
+        self.assertEqual((advisor.queries, advisor.failed), (6, 1))
+        recommendations = advisor.recommend()
+        self.assertEqual([(x.columns, x.queries) for x in recommendations],
+                         [(('name', 'age'), 3), (('id',), 2), (('email',), 1)])
+        self.assertEqual(recommendations[0].statement, 'CREATE INDEX IF NOT EXISTS idx_user_name_age ON user (name, age);')
+        self.assertEqual(len(advisor.recommend(limit=1)), 1)
+        self.assertEqual(advisor.usage[('user', 'id')], {'equality': 1, 'in': 1})
+
+    def test_residual_or(self):
+        advisor = self.advise(['db.user.find({name: "a", $or: [{x: 1}, {y: {$ne: 2}}]})'])
+        self.assertEqual([x.columns for x in advisor.recommend()], [('name',)])
+        self.assertEqual(advisor.usage[('user', 'y')], {'other': 1})
+
+    def test_name(self):
+        self.assertEqual(IndexRecommendation('user', ('address.city',), 1).name, 'idx_user_address_city')
+
+    def test_main(self):
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'queries.txt')
+            with open(path, 'w') as f:
+                f.write('db.user.find({id: 1})\ndb.user.find({id: 2})\n')
+            with redirect_stdout(out):
+                self.assertEqual(main(['--input', path, '--top', '1']), 0)
+        self.assertIn('-- serves 2 queries\nCREATE INDEX IF NOT EXISTS idx_user_id ON user (id);', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
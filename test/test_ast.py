@@ -0,0 +1,61 @@
+import unittest
+
+from mongo_to_python.MongoQueryParser import parse, MongoQuery
+from mongo_to_python.QueryAst import from_dict, And, Or, In, FieldPredicate, Literal, GROUP_DOCUMENT, GROUP_FIELD, \
+    GROUP_EXPLICIT
+from mongopython_to_sql.AstToWhere import ast_to_where_conditions
+from mongopython_to_sql.SqlFromDict import to_sql
+
+
+class AstTestCase(unittest.TestCase):
+    def test_from_dict(self):
+        node = from_dict({'a': 1, 'b': {'$gt': 1, '$in': [1, 'x']}, '$or': [{'c': None}], '$and': [{'d': 'e'}]})
+        self.assertEqual(node, And([
+            FieldPredicate('a', '$eq', Literal(1)),
+            And([FieldPredicate('b', '$gt', Literal(1)), In('b', (1, 'x'))], GROUP_FIELD),
+            Or([And([FieldPredicate('c', '$eq', Literal(None))], GROUP_DOCUMENT)]),
+            And([And([FieldPredicate('d', '$eq', Literal('e'))], GROUP_DOCUMENT)], GROUP_EXPLICIT),
+        ], GROUP_DOCUMENT))
+        self.assertEqual(from_dict(None), And([], GROUP_DOCUMENT))
+        self.assertRaises(AssertionError, from_dict, {'a': {'$regex': 'x'}})
+        self.assertRaises(AssertionError, from_dict, {'$or': {'a': 1}})
+        self.assertRaises(AssertionError, from_dict, {'a': {'$in': 1}})
+
+    def test_dict_view(self):
+        for conditions in [{}, {'a': 1, 'b': {'$gt': 1, '$lte': 4}},
+                           {'$or': [{'a': {'$in': [1, 2]}}, {'b': None}], '$and': [{'c': 'x'}, {}]}]:
+            with self.subTest(conditions=conditions):
+                self.assertEqual(from_dict(conditions).to_dict(), conditions)
+        colliding = And([FieldPredicate('a', '$eq', Literal(1)), FieldPredicate('a', '$eq', Literal(2))],
+                        GROUP_DOCUMENT)
+        self.assertEqual(colliding.to_dict(), {'$and': [{'a': 1}, {'a': 2}]})
+        merged = And([FieldPredicate('a', '$gt', Literal(1)), FieldPredicate('a', '$lt', Literal(2))], GROUP_DOCUMENT)
+        self.assertEqual(merged.to_dict(), {'a': {'$gt': 1, '$lt': 2}})
+
+    def test_equality(self):
+        self.assertNotEqual(Literal(True), Literal(1))
+        self.assertNotEqual(In('a', (1,)), In('a', (1.0,)))
+        self.assertEqual(len({from_dict({'a': 1}), from_dict({'a': 1}), from_dict({'a': True})}), 2)
+
+    def test_slots(self):
+        for node in [Literal(1), FieldPredicate('a', '$eq', Literal(1)), In('a', ()), And([]), Or([]),
+                     MongoQuery('t', {}, {})]:
+            with self.subTest(node=node):
+                self.assertFalse(hasattr(node, '__dict__'))
+
+    def test_mongo_query(self):
+        query = parse('db.user.find({id: {$ne: 1}, $or: [{a: 1}, {b: 2}]})')
+        self.assertIsInstance(query.where, And)
+        self.assertEqual(query.conditions, {'id': {'$ne': 1}, '$or': [{'a': 1}, {'b': 2}]})
+        query.conditions = {'x': 1}
+        self.assertEqual(query.where, from_dict({'x': 1}))
+
+    def test_render(self):
+        node = from_dict({'a': None, 'b': {'$ne': None, '$eq': 3}, '$or': [{'c': 1, 'd': 2}, {'e': 'f'}]})
+        self.assertEqual(ast_to_where_conditions(node),
+                         "(a IS NULL) AND (b IS NOT NULL AND b = 3) AND ((c = 1) AND (d = 2) OR (e = 'f'))")
+        self.assertEqual(to_sql('t', node, {}), to_sql('t', node.to_dict(), {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import sqlite3 as sql
+import tempfile
+import threading
+import time
+import unittest
+
+from AsyncApi import BoundedExecutor, AsyncSqliteExecutor, mongo_to_sql_async, INLINE_MAX_LENGTH
+from Main import mongo_to_sql
+from test.List2DToInsert import to_sql_insert
+
+
+class AsyncTestCase(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.database = os.path.join(cls.directory.name, 'test.db')
+        cls.records = [(i, chr(ord('A') + i % 26)) for i in range(120)]
+        conn = sql.connect(cls.database)
+        conn.execute('CREATE TABLE user (id int, name text)')
+        conn.execute(f'INSERT INTO user VALUES {to_sql_insert(cls.records)}')
+        conn.commit()
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.directory.cleanup()
+
+    async def test_translate(self):
+        small = 'db.user.find({id: 1})'
+        self.assertEqual(await mongo_to_sql_async(small), mongo_to_sql(small))
+        big = f'db.user.find({{id: {{$in: {list(range(INLINE_MAX_LENGTH))}}}}})'
+        self.assertEqual(await mongo_to_sql_async(big, paramstyle='qmark'), mongo_to_sql(big, paramstyle='qmark'))
+        with self.assertRaises(ValueError):
+            await mongo_to_sql_async('db.user.find({id: ' + ' ' * INLINE_MAX_LENGTH + '})')
+
+    async def test_backpressure(self):
+        threads = BoundedExecutor(max_workers=2)
+        lock = threading.Lock()
+        running = [0, 0]  # current, max
+
+        def work():
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return threading.current_thread().name
+
+        ticks = 0
+
+        async def ticker():  # the event loop keeps running while the threads work
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+        tick_task = asyncio.create_task(ticker())
+        names = await asyncio.gather(*[threads.run(work) for _ in range(10)])
+        tick_task.cancel()
+        self.assertEqual(running[1], 2)
+        self.assertLessEqual(len(set(names)), 2)
+        self.assertGreater(ticks, 10)
+        threads.shutdown()
+
+    async def test_cursor(self):
+        async with AsyncSqliteExecutor(self.database, pool_size=2) as executor:
+            documents = [x async for x in executor.find('db.user.find({id: {$lt: 50}})').batch_size(7)]
+            self.assertEqual([(x['id'], x['name']) for x in documents], self.records[:50])
+            self.assertEqual(await executor.find('db.user.count({name: "A"})').to_list(), [{'COUNT(*)': 5}])
+            results = await asyncio.gather(*[executor.find(f'db.user.find({{id: {{$gte: {i}}}}})', 10).to_list()
+                                             for i in range(6)])
+            self.assertEqual([len(x) for x in results], [len(self.records) - i for i in range(6)])
+            async with executor.find('db.user.find({})', batch_size=5) as cursor:
+                await cursor.__anext__()
+            self.assertEqual(executor.executor.pool.idle, executor.executor.pool.created)
+            self.assertEqual(await executor.find('db.user.find({id: {$in: []}})').to_list(), [])
+            with self.assertRaises(ValueError):
+                await executor.find('db.user.find({id: })').to_list()
+
+
+    async def test_more_cursors_than_connections(self):
+        async with AsyncSqliteExecutor(self.database, pool_size=2, timeout=5) as executor:
+            cursors = [executor.find(f'db.user.find({{id: {{$gte: {i}}}}})', batch_size=3) for i in range(6)]
+
+            async def read(cursor):
+                first = await cursor.__anext__()  # holds a connection between batches
+                await asyncio.sleep(0)
+                return [first] + await cursor.to_list()
+            results = await asyncio.wait_for(asyncio.gather(*[read(cursor) for cursor in cursors]), 10)
+            self.assertEqual([len(x) for x in results], [len(self.records) - i for i in range(6)])
+            self.assertLessEqual(executor.executor.pool.created, 2)
+
+            cursor = executor.find('db.user.find({})', batch_size=1)
+            await cursor.__anext__()
+            reading = asyncio.create_task(cursor.__anext__())
+            await asyncio.sleep(0)
+            await asyncio.wait_for(cursor.close(), 10)  # waits for the read instead of racing it
+            await reading
+            self.assertEqual(await cursor.to_list(), [])
+            self.assertEqual(executor.executor.pool.idle, executor.executor.pool.created)
+
+if __name__ == '__main__':
+    unittest.main()
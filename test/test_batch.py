@@ -0,0 +1,35 @@
+import unittest
+
+from Main import mongo_to_sql, mongo_to_sql_many
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.queries = [f'db.user.find({{id: {i}}})' for i in range(50)]
+        self.queries[7] = 'db.user.find({id: })'
+        self.queries[31] = 'db.user.update({})'
+
+    def check(self, results):
+        self.assertEqual([r.mongo for r in results], self.queries)
+        for i, result in enumerate(results):
+            with self.subTest(i=i):
+                if i in (7, 31):
+                    self.assertFalse(result)
+                    self.assertIsInstance(result.error, ValueError)
+                    self.assertIsNone(result.sql)
+                else:
+                    self.assertTrue(result)
+                    self.assertEqual(result.sql, mongo_to_sql(self.queries[i]))
+
+    def test_in_process(self):
+        self.check(list(mongo_to_sql_many(self.queries, workers=1, chunksize=4)))
+
+    def test_process_pool(self):
+        self.check(list(mongo_to_sql_many(iter(self.queries), workers=2, chunksize=3)))
+
+    def test_empty(self):
+        self.assertEqual(list(mongo_to_sql_many([], workers=2)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
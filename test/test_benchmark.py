@@ -0,0 +1,51 @@
+import json
+import unittest
+
+from benchmark.Benchmark import run, format_report, PROFILES, percentile
+from benchmark.QueryGenerator import QueryGenerator, QUOTE_STYLES
+from Main import mongo_to_sql
+from mongo_to_python.MongoJsonLeafToDict import leaf_parse
+from mongo_to_python.MongoListParser import list_parser
+
+
+class BenchmarkTestCase(unittest.TestCase):
+    def test_generated_queries_translate(self):
+        for name, settings in PROFILES.items():
+            with self.subTest(profile=name):
+                generator = QueryGenerator(seed=1, **settings)
+                self.assertTrue(mongo_to_sql(generator.find()).startswith('SELECT '))
+                self.assertEqual(len(list_parser(generator.list_string())), generator.in_length)
+                self.assertIn('$in', leaf_parse(generator.leaf()))
+
+    def test_quote_styles(self):
+        for quote_style in QUOTE_STYLES:
+            with self.subTest(quote_style=quote_style):
+                string = QueryGenerator(string_length=40, quote_style=quote_style).string()
+                self.assertEqual(len(string), 42)
+                self.assertEqual(string[0], string[-1])
+                if quote_style != 'mixed':
+                    self.assertEqual(string[0], '"' if quote_style == 'double' else "'")
+
+    def test_seeded(self):
+        self.assertEqual(QueryGenerator(depth=3, seed=5).find(), QueryGenerator(depth=3, seed=5).find())
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 90), 7)
+
+    def test_run(self):
+        report = json.loads(json.dumps(run(['small', 'deep'], iterations=3, samples=2)))
+        self.assertEqual(set(report['profiles']), {'small', 'deep'})
+        stages = report['profiles']['deep']['stages']
+        self.assertEqual(set(stages), {'parse', 'to_dict', 'leaf_parse', 'list_parser', 'sql_from_mongo'})
+        for result in stages.values():
+            self.assertEqual(result['iterations'], 3)
+            self.assertGreater(result['ops_per_sec'], 0)
+            self.assertLessEqual(result['p50_us'], result['p99_us'])
+        self.assertIn('1.00x', format_report(report, report))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import threading
+import unittest
+
+from Main import mongo_to_sql
+from TranslationCache import TranslationCache, normalize_query
+
+
+class CacheTestCase(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize_query(' db.user.find( { id : 1 } ,\n{ id: 1 }) '), 'db.user.find({id:1},{id:1})')
+        self.assertEqual(normalize_query('db.user.find({name: " a  b "})'), 'db.user.find({name:" a  b "})')
+        self.assertEqual(normalize_query("db.user.find({name: 'a , }'})"), "db.user.find({name:'a , }'})")
+        self.assertNotEqual(normalize_query('db.user.find({a: 1 2})'), normalize_query('db.user.find({a: 12})'))
+
+    def test_hits_and_misses(self):
+        cache = TranslationCache(maxsize=10)
+        sql = mongo_to_sql('db.user.find({id: 1})', cache=cache)
+        self.assertEqual(sql, mongo_to_sql('db.user.find({id: 1})'))
+        self.assertEqual(mongo_to_sql('db.user.find( {id:1} )', cache=cache), sql)
+        self.assertEqual(mongo_to_sql('db.user.find({name: "a  b"})', cache=cache),
+                         "SELECT * FROM user WHERE (name = 'a  b');")
+        self.assertEqual(mongo_to_sql('db.user.find({name: "a b"})', cache=cache),
+                         "SELECT * FROM user WHERE (name = 'a b');")
+        self.assertEqual(cache.stats(), {'size': 3, 'maxsize': 10, 'hits': 1, 'misses': 3, 'evictions': 0})
+
+    def test_errors_not_cached(self):
+        cache = TranslationCache()
+        for _ in range(2):
+            self.assertRaises(ValueError, mongo_to_sql, 'db.user.find({id: })', cache=cache)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.misses, 2)
+
+    def test_lru_eviction(self):
+        cache = TranslationCache(maxsize=2)
+        mongo_to_sql('db.user.find({id: 1})', cache=cache)
+        mongo_to_sql('db.user.find({id: 2})', cache=cache)
+        mongo_to_sql('db.user.find({id: 1})', cache=cache)  # 2 is now the least recently used
+        mongo_to_sql('db.user.find({id: 3})', cache=cache)
+        self.assertEqual(cache.evictions, 1)
+        mongo_to_sql('db.user.find({id: 1})', cache=cache)
+        self.assertEqual(cache.hits, 2)
+        mongo_to_sql('db.user.find({id: 2})', cache=cache)
+        self.assertEqual(cache.misses, 4)
+        cache.clear()
+        self.assertEqual(cache.stats(), {'size': 0, 'maxsize': 2, 'hits': 0, 'misses': 0, 'evictions': 0})
+
+    def test_threads(self):
+        cache = TranslationCache(maxsize=8)
+        queries = [f'db.user.find({{id: {i % 12}}})' for i in range(600)]
+        errors = []
+
+        def work(offset):
+            for query in queries[offset:] + queries[:offset]:
+                if mongo_to_sql(query, cache=cache) != mongo_to_sql(query):
+                    errors.append(query)
+
+        threads = [threading.Thread(target=work, args=(i * 50,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        stats = cache.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 8 * len(queries))
+        self.assertLessEqual(stats['size'], 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import sqlite3 as sql
+import unittest
+
+from Main import mongo_to_sql
+
+try:
+    import numpy as np
+    from ColumnarEvaluator import evaluate, condition_mask
+except ImportError:  # numpy is optional
+    np = None
+
+# the same rows as columns and as a sqlite table. None is null
+RECORDS = [(i, [18, 25, 33, None, 47, 61][i % 6], [1.5, None, 3.25][i % 3], [None, 'ann', 'bob', 'cy', 'di'][i % 5],
+            i % 4 == 0) for i in range(60)]
+QUERIES = [
+    'db.user.find({})',
+    'db.user.find({age: 25})',
+    'db.user.find({age: {$gt: 25, $lte: 47}})',
+    'db.user.find({age: null})',
+    'db.user.find({age: {$ne: null}, rate: null})',
+    'db.user.find({age: {$ne: 33}})',
+    'db.user.find({rate: {$ne: 1.5}})',
+    'db.user.find({rate: {$gte: 2}, flag: true})',
+    'db.user.find({flag: false, name: {$in: ["ann", "cy", null]}})',
+    'db.user.find({id: {$in: [1, 2, 3, 50, 70]}, age: {$in: [18, 25, 61]}})',
+    'db.user.find({name: {$lt: "c"}})',
+    'db.user.find({$or: [{age: 18}, {name: "bob", rate: {$lt: 3}}, {id: {$gt: 55}}]})',
+    'db.user.find({$and: [{$or: [{age: {$lt: 30}}, {age: {$gt: 50}}]}, {$or: [{flag: true}, {name: null}]}]})',
+    'db.user.find({age: {$gt: 50, $lt: 10}})',
+    'db.user.find({id: {$in: []}})',
+]
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class ColumnarTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        ids, ages, rates, names, flags = zip(*RECORDS)
+        cls.columns = {'id': np.array(ids), 'age': np.array(ages, dtype=object),
+                       'rate': np.array([np.nan if x is None else x for x in rates]),
+                       'name': np.array(names, dtype=object), 'flag': np.array(flags)}
+        cls.connection = sql.connect(':memory:')
+        cls.connection.execute('CREATE TABLE user (id int, age int, rate real, name text, flag bool)')
+        cls.connection.executemany('INSERT INTO user VALUES (?, ?, ?, ?, ?)', RECORDS)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.connection.close()
+
+    def sqlite(self, mongo: str) -> list:
+        return self.connection.execute(mongo_to_sql(mongo, dialect='sqlite')).fetchall()
+
+    def test_same_rows_as_sqlite(self):
+        for mongo in QUERIES:
+            for optimize in (False, True):
+                with self.subTest(mongo=mongo, optimize=optimize):
+                    expected = [row[0] for row in self.sqlite(mongo.replace('})', '}, {id: 1})', 1))]
+                    result = evaluate(mongo, self.columns, optimize)
+                    self.assertEqual(result['id'].tolist(), expected)
+                    self.assertEqual(list(result), ['id', 'age', 'rate', 'name', 'flag'])
+                    count = evaluate(mongo.replace('find', 'count', 1), self.columns, optimize)
+                    self.assertEqual(count, len(expected))
+
+    def test_projection_sort_limit(self):
+        mongo = 'db.user.find({age: {$ne: null}}, {name: 1, id: 1}).sort({age: -1, id: 1}).skip(3).limit(10)'
+        result = evaluate(mongo, self.columns)
+        self.assertEqual(list(result), ['name', 'id'])
+        self.assertEqual(list(zip(result['name'].tolist(), result['id'].tolist())), self.sqlite(mongo))
+        result = evaluate('db.user.find({id: {$in: [0, 2]}}, {age: 0, name: 0})', self.columns)
+        self.assertEqual({field: values.tolist() for field, values in result.items()},
+                         {'id': [0, 2], 'rate': [1.5, 3.25], 'flag': [True, False]})
+        self.assertEqual(evaluate('db.user.count({flag: true}, {limit: 5, skip: 12})', self.columns), 3)
+        self.assertEqual(evaluate('db.user.distinct("name", {id: {$lt: 10}})', self.columns).tolist(),
+                         [None, 'ann', 'bob', 'cy', 'di'])
+        self.assertEqual(evaluate('db.user.distinct("age", {age: {$gt: 20}})', self.columns).tolist(), [25, 33, 47, 61])
+
+    def test_types(self):
+        columns = {'code': np.array(['1', '2', 'a']), 'n': np.array([1, 2, 3])}
+        self.assertEqual(condition_mask({'code': 1}, columns).tolist(), [False, False, False])
+        self.assertEqual(condition_mask({'code': {'$ne': 1}}, columns).tolist(), [True, True, True])
+        self.assertEqual(condition_mask({'n': {'$in': ['1', 2]}}, columns).tolist(), [False, True, False])
+        self.assertEqual(condition_mask({'n': True}, columns).tolist(), [True, False, False])  # TRUE = 1 in SQL
+        self.assertRaises(TypeError, condition_mask, {'code': {'$gt': 1}}, columns)
+        self.assertRaises(KeyError, condition_mask, {'missing': 1}, columns)
+        self.assertRaises(AssertionError, condition_mask, {}, {'a': np.zeros(2), 'b': np.zeros(3)})
+
+    def test_deep(self):
+        mongo = '{id: 1}'
+        for i in range(2, 3000):
+            mongo = f'{{$or: [{mongo}, {{id: {i}}}]}}'
+        self.assertEqual(evaluate(f'db.user.count({mongo})', self.columns), 59)
+
+
+if __name__ == '__main__':
+    unittest.main()
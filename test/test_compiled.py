@@ -0,0 +1,42 @@
+import unittest
+
+from CompiledQuery import compile_query
+from Main import mongo_to_sql
+
+
+class CompiledQueryTestCase(unittest.TestCase):
+    def test_render(self):
+        template = 'db.user.find({age: {$gt: $min_age}, name: $name, id: {$in: [1, $id, 3]}, x: null}, {name: 1})' \
+                   '.sort({age: -1}).limit(5)'
+        query = compile_query(template)
+        self.assertEqual(query.names, ('min_age', 'name', 'id'))
+        for values in ({'min_age': 21, 'name': "O'Neil", 'id': 2}, {'min_age': 1.5, 'name': 'a', 'id': True}):
+            with self.subTest(values=values):
+                mongo = template
+                for name, value in values.items():
+                    mongo = mongo.replace(f'${name}', repr(value).lower() if type(value) == bool else
+                                          '"' + value + '"' if type(value) == str else str(value))
+                self.assertEqual(query.render(**values), mongo_to_sql(mongo))
+                self.assertEqual(query.bind(values), mongo_to_sql(mongo))
+
+    def test_paramstyle(self):
+        query = compile_query('db.user.count({age: {$gt: $age, $lt: 60}, name: {$in: [$a, $a]}})', 'dollar')
+        self.assertEqual(query.render(age=20, a='x'),
+                         ('SELECT COUNT(*) FROM user WHERE (age > $1 AND age < $2) AND (name IN ($3));', (20, 60, 'x')))
+        query = compile_query('db.user.find({id: $id})', 'qmark')
+        self.assertEqual(query.render(id=1), mongo_to_sql('db.user.find({id: 1})', paramstyle='qmark'))
+
+    def test_invalid(self):
+        query = compile_query('db.user.find({id: $id})')
+        self.assertRaises(AssertionError, query.render)
+        self.assertRaises(AssertionError, query.render, id=None)
+        self.assertRaises(AssertionError, query.render, id=[1])
+        self.assertEqual(compile_query('db.user.find({id: 1})').render(), 'SELECT * FROM user WHERE (id = 1);')
+        self.assertRaises(ValueError, compile_query, 'db.user.find({id: $})')
+        self.assertRaises(ValueError, compile_query, 'db.user.find({id: "\0"})')
+        self.assertRaises(ValueError, compile_query, 'db.user.find({}).limit($n)')
+        self.assertRaises(ValueError, mongo_to_sql, 'db.user.find({id: $id})')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import sqlite3 as sql
+import sys
+import tempfile
+import unittest
+
+from IndexAdvisor import IndexAdvisor
+from Main import mongo_to_sql
+from mongo_to_python.MongoDescentParser import MongoParser, parse_whole
+from mongo_to_python.MongoQueryParser import parse
+from mongo_to_python.QueryAst import from_dict
+from mongo_to_python.QueryOptimizer import optimize
+from mongopython_to_sql.AstToWhere import ast_to_where_conditions, render_predicate
+from SqliteExecutor import SqliteExecutor
+
+DEPTH = 5000
+
+
+def deep_or(depth: int) -> str:
+    """
+    :return: {$or: [{$or: [{a: 1}, {$and: [{b: 0}, {c: {$gt: 0}}]}]}, {$and: [{b: 1}, {c: {$gt: 1}}]}]} to depth levels
+    """
+    return 'db.t.find(' + '{$or: [' * depth + '{a: 1}' + \
+        ''.join(f', {{$and: [{{b: {i}}}, {{c: {{$gt: {i}}}}}]}}]}}' for i in range(depth)) + ')'
+
+
+class DeepNestingTestCase(unittest.TestCase):
+    def test_deep_query(self):
+        self.assertLess(sys.getrecursionlimit(), DEPTH * 2)
+        mongo = 'db.t.find(' + '{$or: [{x: 1}, {$and: [{y: 2}, ' * DEPTH + '{a: 1}' + ']}]}' * DEPTH + ')'
+        sql = mongo_to_sql(mongo)
+        level = '((x = 1) OR ((y = 2) AND '
+        self.assertEqual(sql, 'SELECT * FROM t WHERE ' + level * DEPTH + '(a = 1)' + '))' * DEPTH + ';')
+        sql, params = mongo_to_sql(mongo, paramstyle='qmark')
+        self.assertEqual(len(params), DEPTH * 2 + 1)
+
+    def test_deep_dict(self):
+        where = {'a': 1}
+        for i in range(DEPTH):
+            where = {'$or': [where, {'b': {'$gt': i, '$lt': 9}}]}
+        sql = ast_to_where_conditions(from_dict(where))
+        self.assertTrue(sql.startswith('(' * DEPTH + '(a = 1) OR (b > 0 AND b < 9))'))
+        self.assertTrue(sql.endswith(f' OR (b > {DEPTH - 1} AND b < 9))'))
+
+    def test_deep_passes(self):
+        where = {'a': 1}
+        for i in range(DEPTH):
+            where = {'$or': [where, {'$and': [{'b': i}, {'c': {'$gt': i}}]}]}
+        mongo = deep_or(DEPTH)
+        query = parse(mongo)
+        self.assertEqual(from_dict(where), query.where)  # dicts this deep cannot be compared with ==
+        self.assertEqual(from_dict(query.conditions), query.where)
+        self.assertTrue(str(query).startswith("MongoQuery: find table=t conditions={'$or': [{'$or': "))
+        self.assertTrue(str(query).endswith(f"{{'c': {{'$gt': {DEPTH - 1}}}}}]}}]}} projection={{}}"))
+        self.assertNotEqual(from_dict({'$or': [where, {'a': 2}]}), from_dict({'$or': [where, {'a': 3}]}))
+        optimized, report = optimize(query.where)
+        self.assertEqual(list(report), [f'flattened nested AND (x{DEPTH})', f'flattened nested OR (x{DEPTH - 1})'])
+        self.assertEqual(len(optimized.children[0].children), DEPTH + 1)
+        self.assertEqual(mongo_to_sql(mongo, optimize=True).count(' OR '), DEPTH)
+
+        advisor = IndexAdvisor()
+        self.assertTrue(advisor.add_mongo(mongo))
+        self.assertEqual(advisor.shapes[('t', ('b',), (), ('c',))], DEPTH)
+        with tempfile.NamedTemporaryFile(suffix='.db') as database:
+            connection = sql.connect(database.name)
+            connection.execute('CREATE TABLE t (a int, b int, c int)')
+            connection.executemany('INSERT INTO t VALUES (?, ?, ?)', [(1, 0, 0), (2, 3, 4), (2, 3, 3)])
+            connection.commit()
+            connection.close()
+            with SqliteExecutor(database.name) as executor:  # sqlite parses OR into a tree 1000 levels deep at most
+                self.assertEqual([x['c'] for x in executor.find(deep_or(900))], [0, 4])
+
+    def test_max_depth(self):
+        mongo = 'db.t.find(' + '{$or: [' * 10 + '{a: 1}' + ']}' * 10 + ')'
+        self.assertEqual(parse(mongo, max_depth=21).conditions, parse(mongo).conditions)
+        self.assertRaisesRegex(ValueError, 'Nested deeper than 20 levels', parse, mongo, max_depth=20)
+        self.assertRaisesRegex(ValueError, 'Nested deeper than 2 levels', MongoParser('[[[1]]]', max_depth=2).parse_array)
+
+    def test_values(self):
+        self.assertEqual(parse_whole('[{a: [1, [2, "x"], {}], b: [], "c": {d: null,},}, [], 3,]', MongoParser.parse_array),
+                         [{'a': [1, [2, 'x'], {}], 'b': [], 'c': {'d': None}}, [], 3])
+        self.assertEqual(parse_whole('{a: 1, a: 2}', MongoParser.parse_object), {'a': 2})
+        for invalid in ('{a: 1', '{a: 1 b: 2}', '{,}', '[1, , 2]', '{a: [1}', '{a: {b: 1]}', '{a}', '[1] ]'):
+            with self.subTest(invalid=invalid):
+                self.assertRaises(ValueError, parse_whole, invalid, MongoParser.parse_value)
+        self.assertRaisesRegex(ValueError, "Expected '\\['", parse_whole, '{}', MongoParser.parse_array)
+        self.assertRaisesRegex(ValueError, "Expected '{'", parse_whole, '[]', MongoParser.parse_object)
+
+    def test_predicate_junction(self):
+        self.assertEqual(render_predicate(parse('db.t.find({a: {$gt: 1, $lt: 3}})').where.children[0]),
+                         '(a > 1 AND a < 3)')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import sqlite3 as sql
+import unittest
+
+from CompiledQuery import compile_query
+from Main import mongo_to_sql
+from mongo_to_python.MongoQueryParser import parse
+from mongopython_to_sql.Dialect import get_dialect, GENERIC, SQLITE, POSTGRES, MYSQL
+from mongopython_to_sql.RenderContext import RenderContext
+from mongopython_to_sql.SqlFromDict import sql_from_mongo
+from SqlConstants import PARAMSTYLE_DOLLAR, PARAMSTYLE_FORMAT, IN_STRATEGY_JSON_EACH
+
+
+class DialectTestCase(unittest.TestCase):
+    def test_one_query_many_dialects(self):
+        query = parse('db.user.find({active: true, name: "a\\b\'c"}, {name: 1}).sort({age: -1}).skip(5)')
+        expected = {
+            GENERIC: "SELECT name FROM user WHERE (active = TRUE) AND (name = 'a\\b''c') ORDER BY age DESC "
+                     "LIMIT -1 OFFSET 5;",
+            SQLITE: 'SELECT "name" FROM "user" WHERE ("active" = 1) AND ("name" = \'a\\b\'\'c\') ORDER BY "age" DESC '
+                    'LIMIT -1 OFFSET 5;',
+            POSTGRES: 'SELECT "name" FROM "user" WHERE ("active" = TRUE) AND ("name" = \'a\\b\'\'c\') '
+                      'ORDER BY "age" DESC OFFSET 5;',
+            MYSQL: "SELECT `name` FROM `user` WHERE (`active` = TRUE) AND (`name` = 'a\\\\b''c') ORDER BY `age` DESC "
+                   "LIMIT 18446744073709551615 OFFSET 5;",
+        }
+        for dialect, sql_string in expected.items():
+            with self.subTest(dialect=dialect.name):
+                self.assertEqual(sql_from_mongo(query, context=RenderContext(dialect=dialect)), sql_string)
+                self.assertEqual(mongo_to_sql('db.user.find({active: true, name: "a\\b\'c"}, {name: 1})'
+                                              '.sort({age: -1}).skip(5)', dialect=dialect.name), sql_string)
+        self.assertEqual(sql_from_mongo(query), expected[GENERIC])
+
+    def test_identifiers(self):
+        self.assertEqual(SQLITE.identifier('a"b'), '"a""b"')
+        self.assertEqual(MYSQL.identifier('a`b'), '`a``b`')
+        self.assertEqual(GENERIC.identifier('a"b'), 'a"b')
+        self.assertEqual(mongo_to_sql('db.user.count({a: {$gte: 1, $lte: 2}}, {limit: 3})', dialect='postgres',
+                                      optimize=True),
+                         'SELECT COUNT(*) FROM (SELECT 1 FROM "user" WHERE ("a" BETWEEN 1 AND 2) LIMIT 3) AS counted;')
+        self.assertEqual(mongo_to_sql('db.user.distinct("a", {b: null})', dialect='mysql'),
+                         'SELECT DISTINCT `a` FROM `user` WHERE (`b` IS NULL);')
+
+    def test_postgres_any_array(self):
+        mongo = 'db.t.find({id: {$in: [1, 2, 3]}, rate: {$in: [1, 2.5]}, name: {$in: ["a", "b"]}, x: {$in: [1, "a"]}})'
+        self.assertEqual(mongo_to_sql(mongo, dialect='postgres', in_threshold=1, paramstyle=PARAMSTYLE_DOLLAR),
+                         ('SELECT * FROM "t" WHERE ("id" = ANY($1::bigint[])) AND ("rate" = ANY($2::double precision[])) '
+                          'AND ("name" = ANY($3::text[])) AND ("x" IN ($4, $5));', ([1, 2, 3], [1, 2.5], ['a', 'b'], 1, 'a')))
+        self.assertEqual(mongo_to_sql('db.t.find({id: {$in: [1, 2]}})', dialect='postgres', in_threshold=1),
+                         'SELECT * FROM "t" WHERE ("id" = ANY(ARRAY[1, 2]::bigint[]));')
+        self.assertEqual(mongo_to_sql('db.t.find({id: {$in: [1, 2]}})', dialect='postgres'),
+                         'SELECT * FROM "t" WHERE ("id" IN (1, 2));')
+        self.assertRaises(AssertionError, mongo_to_sql, mongo, dialect='postgres', in_strategy=IN_STRATEGY_JSON_EACH)
+        self.assertRaises(AssertionError, get_dialect, 'oracle')
+
+    def test_compiled(self):
+        query = compile_query('db.t.find({a: $a, b: true})', paramstyle=PARAMSTYLE_FORMAT, dialect='mysql')
+        self.assertEqual(query.render(a='x'), ('SELECT * FROM `t` WHERE (`a` = %s) AND (`b` = %s);', ('x', True)))
+        self.assertEqual(compile_query('db.t.find({a: $a, b: true})', dialect='sqlite').render(a=False),
+                         'SELECT * FROM "t" WHERE ("a" = 0) AND ("b" = 1);')
+
+    def test_sqlite_runs_keyword_columns(self):
+        connection = sql.connect(':memory:')
+        connection.execute('CREATE TABLE "order" ("group" int, "select" text, flag bool)')
+        connection.execute("INSERT INTO \"order\" VALUES (1, 'a', 1), (2, 'b', 0), (3, 'c', 1)")
+        mongo = 'db.order.find({flag: true, group: {$in: [1, 2, 3]}}, {select: 1}).sort({group: -1}).skip(1)'
+        for paramstyle in (None, 'qmark'):
+            with self.subTest(paramstyle=paramstyle):
+                statement = mongo_to_sql(mongo, dialect='sqlite', paramstyle=paramstyle, in_threshold=2)
+                args = statement if paramstyle else (statement,)
+                self.assertEqual(connection.execute(*args).fetchall(), [('a',)])
+        connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import sqlite3 as sql
+import tempfile
+import threading
+import unittest
+
+from SqliteExecutor import SqliteExecutor, ConnectionPool
+from test.List2DToInsert import to_sql_insert
+
+
+class ExecutorTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.database = os.path.join(cls.directory.name, 'test.db')
+        cls.records = [(i, chr(ord('A') + i % 26), i * 1.5) for i in range(250)]
+        conn = sql.connect(cls.database)
+        conn.execute('CREATE TABLE user (id int, name text, rate real)')
+        conn.execute(f'INSERT INTO user VALUES {to_sql_insert(cls.records)}')
+        conn.commit()
+        conn.close()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.directory.cleanup()
+
+    def setUp(self) -> None:
+        self.executor = SqliteExecutor(self.database, pool_size=2, timeout=1)
+
+    def tearDown(self) -> None:
+        self.executor.close()
+
+    def test_find(self):
+        documents = self.executor.find('db.user.find({id: {$lt: 3}}, {id: 1, name: 1})').to_list()
+        self.assertEqual(documents, [{'id': 0, 'name': 'A'}, {'id': 1, 'name': 'B'}, {'id': 2, 'name': 'C'}])
+        rows = [tuple(x.values()) for x in self.executor.find('db.user.find({name: {$in: ["B", "C"]}})')]
+        self.assertEqual(rows, [r for r in self.records if r[1] in ('B', 'C')])
+
+    def test_batches(self):
+        for batch_size in (1, 7, 250, 1000):
+            with self.subTest(batch_size=batch_size):
+                cursor = self.executor.find('db.user.find({})').batch_size(batch_size)
+                self.assertIsNone(cursor._cursor)  # lazy
+                first = next(cursor)
+                self.assertEqual(first, {'id': 0, 'name': 'A', 'rate': 0.0})
+                self.assertEqual(len(list(cursor._rows)) + 1, min(batch_size, len(self.records)))
+                cursor.close()
+                self.assertEqual(self.executor.pool.idle, self.executor.pool.created)
+        self.assertEqual(len(self.executor.find('db.user.find({})', batch_size=7).to_list()), len(self.records))
+
+    def test_release(self):
+        pool = self.executor.pool
+        cursor = self.executor.find('db.user.find({id: {$gt: 10}})', batch_size=10)
+        next(cursor)
+        self.assertEqual(pool.idle, 0)
+        list(cursor)
+        self.assertFalse(cursor.alive)
+        self.assertEqual(pool.idle, 1)
+        with self.executor.find('db.user.find({})') as cursor:
+            next(cursor)
+        self.assertEqual(pool.idle, 1)
+        self.assertEqual(pool.created, 1)
+
+    def test_pool_limit(self):
+        first = self.executor.find('db.user.find({})', batch_size=1)
+        second = self.executor.find('db.user.find({})', batch_size=1)
+        next(first), next(second)
+        self.executor.pool.timeout = 0.01
+        self.assertRaises(TimeoutError, next, self.executor.find('db.user.find({})'))
+        first.close()
+        self.assertEqual(len(self.executor.find('db.user.find({id: 1})').to_list()), 1)
+        second.close()
+
+    def test_concurrent(self):
+        results = {}
+
+        def run(i):
+            results[i] = len(self.executor.find(f'db.user.find({{id: {{$gte: {i}}}}})', batch_size=16).to_list())
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {i: len(self.records) - i for i in range(8)})
+        self.assertLessEqual(self.executor.pool.created, 2)
+
+    def test_provably_empty(self):
+        cursor = self.executor.find('db.user.find({id: {$gt: 5, $lt: 1}})')
+        self.assertIsNone(cursor.sql)
+        self.assertEqual(cursor.to_list(), [])
+        self.assertEqual(self.executor.pool.created, 0)
+        cursor = self.executor.find('db.user.count({id: {$gt: 5, $lt: 1}})')
+        self.assertIsNone(cursor.sql)
+        self.assertEqual(cursor.to_list(), [{'COUNT(*)': 0}])
+        self.assertEqual(self.executor.pool.created, 0)
+
+    def test_temp_table(self):
+        with SqliteExecutor(self.database, in_threshold=2, in_strategy='temp_table') as executor:
+            ids = [5, 9, 200, 1000]
+            documents = executor.find(f'db.user.find({{id: {{$in: {ids}}}}}, {{id: 1}})', batch_size=2).to_list()
+            self.assertEqual(documents, [{'id': 5}, {'id': 9}, {'id': 200}])
+            with executor.pool.connection() as connection:
+                self.assertEqual(connection.execute("SELECT name FROM sqlite_temp_master").fetchall(), [])
+
+    def test_failed_query_releases_connection(self):
+        with SqliteExecutor(self.database, pool_size=1, timeout=1) as executor:
+            for _ in range(2):
+                self.assertRaises(sql.OperationalError, executor.find('db.missing.find({})').to_list)
+            self.assertEqual(len(executor.find('db.user.find({id: 1})').to_list()), 1)
+            self.assertEqual(executor.pool.idle, 1)
+
+    def test_pool(self):
+        with ConnectionPool(self.database, size=1) as pool:
+            with pool.connection() as connection:
+                self.assertEqual(connection.execute('SELECT count(*) FROM user').fetchone(), (len(self.records),))
+            self.assertEqual(pool.idle, 1)
+        self.assertRaises(AssertionError, pool.acquire)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import sqlite3 as sql
+import tempfile
+import threading
+import unittest
+
+from Main import mongo_to_sql
+from mongo_to_python.MongoQueryParser import parse
+from QueryFingerprint import ShapeStatistics, in_bucket, query_shape, fingerprint, fingerprint_query
+from SqliteExecutor import SqliteExecutor
+from test.List2DToInsert import to_sql_insert
+
+
+class FingerprintTestCase(unittest.TestCase):
+    def assertSameShape(self, *queries):
+        fingerprints = {fingerprint_query(parse(query)) for query in queries}
+        self.assertEqual(len(fingerprints), 1, queries)
+
+    def assertDifferentShapes(self, *queries):
+        fingerprints = {fingerprint_query(parse(query)) for query in queries}
+        self.assertEqual(len(fingerprints), len(queries), queries)
+
+    def test_in_bucket(self):
+        self.assertEqual([in_bucket(x) for x in (0, 1, 2, 3, 4, 5, 8, 9, 1000)], [0, 1, 2, 4, 4, 8, 8, 16, 1024])
+
+    def test_shape(self):
+        self.assertEqual(query_shape(parse('db.user.find({name: "Ann", age: {$gt: 20}})')),
+                         'find user where AND(FIELD(age $gt ?), name $eq ?)')
+        self.assertEqual(query_shape(parse('db.user.find({$or: [{a: null}, {b: {$in: [1, 2, 3]}}]}, {name: 1, _id: 0})'
+                                           '.sort({age: -1, id: 1}).skip(10).limit(5)')),
+                         'find user where AND(OR(AND(FIELD(b $in[4])), AND(a $eq null))) fields _id 0, name 1 '
+                         'sort age -1, id 1 limit ? skip ?')
+        self.assertEqual(query_shape(parse('db.t.distinct("a", {$and: [{x: {$gte: 1, $lte: 2}}]})')),
+                         'distinct t field a where AND($and(AND(FIELD(x $gte ?, x $lte ?))))')
+
+    def test_literals_and_key_order(self):
+        self.assertSameShape('db.user.find({name: "Ann", age: {$gt: 20}})',
+                             'db.user.find({age: {$gt: 65}, name: "Bob"})',
+                             'db.user.find({age: {$gt: 1.5}, name: true})')
+        self.assertSameShape('db.t.find({$or: [{a: 1}, {b: {$lt: 2, $gt: 0}}]})',
+                             'db.t.find({$or: [{b: {$gt: 5, $lt: 9}}, {a: "x"}]})')
+        self.assertSameShape('db.t.find({}).limit(5).skip(1)', 'db.t.find({}).skip(20).limit(100)')
+        self.assertSameShape('db.t.find({a: {$in: [1, 2, 3]}})', 'db.t.find({a: {$in: ["a", "b", "c", "d"]}})')
+
+    def test_different_shapes(self):
+        self.assertDifferentShapes('db.t.find({a: 1})', 'db.t.find({a: null})', 'db.t.find({a: {$ne: 1}})',
+                                   'db.t.find({b: 1})', 'db.u.find({a: 1})', 'db.t.count({a: 1})',
+                                   'db.t.find({a: 1}).limit(1)', 'db.t.find({a: 1}, {a: 1})',
+                                   'db.t.find({a: 1}, {a: 0})', 'db.t.distinct("a", {a: 1})')
+        self.assertDifferentShapes('db.t.find({a: {$in: [1]}})', 'db.t.find({a: {$in: [1, 2, 3]}})',
+                                   'db.t.find({a: {$in: [1, 2, 3, 4, 5]}})', 'db.t.find({a: {$in: []}})')
+        self.assertDifferentShapes('db.t.find({}).sort({a: 1, b: 1})', 'db.t.find({}).sort({b: 1, a: 1})',
+                                   'db.t.find({}).sort({a: -1, b: 1})')
+        self.assertDifferentShapes('db.t.find({$or: [{a: 1, b: 1}]})', 'db.t.find({$or: [{a: 1}, {b: 1}]})')
+
+    def test_stable_hash(self):
+        # the same in every process and version, so fingerprints can be compared between runs
+        shape = 'find user where AND(FIELD(age $gt ?), name $eq ?)'
+        self.assertEqual(fingerprint(shape), '2642c2cc477aaccb')
+        self.assertEqual(fingerprint_query(parse('db.user.find({name: "Ann", age: {$gt: 20}})')), fingerprint(shape))
+
+
+class ShapeStatisticsTestCase(unittest.TestCase):
+    def test_record(self):
+        statistics = ShapeStatistics()
+        for seconds, query in ((0.5, 'db.t.find({a: 1})'), (1.5, 'db.t.find({a: 2})'), (0.25, 'db.t.find({b: 1})')):
+            statistics.record_query(parse(query), seconds, query)
+        self.assertEqual(len(statistics), 2)
+        first, second = statistics.stats()
+        self.assertEqual((first['shape'], first['calls'], first['total_seconds'], first['mean_seconds'],
+                          first['min_seconds'], first['max_seconds'], first['example']),
+                         ('find t where AND(a $eq ?)', 2, 2.0, 1.0, 0.5, 1.5, 'db.t.find({a: 1})'))
+        self.assertEqual((second['shape'], second['calls']), ('find t where AND(b $eq ?)', 1))
+        self.assertEqual([x['shape'] for x in statistics.stats('mean_seconds', limit=1)], ['find t where AND(a $eq ?)'])
+        report = statistics.report(1).splitlines()
+        self.assertEqual(len(report), 2)
+        self.assertTrue(report[1].startswith(first['fingerprint']) and report[1].endswith(first['shape']))
+        statistics.reset()
+        self.assertEqual(statistics.stats(), [])
+
+    def test_timed_and_translate(self):
+        statistics = ShapeStatistics()
+        with statistics.timed('shape'):
+            pass
+        with self.assertRaises(KeyError):
+            with statistics.timed('shape'):
+                raise KeyError()
+        self.assertEqual(statistics.stats()[0]['calls'], 1)
+        for age in (20, 30):
+            self.assertEqual(statistics.translate(f'db.user.find({{age: {age}}})', paramstyle='qmark'),
+                             mongo_to_sql(f'db.user.find({{age: {age}}})', paramstyle='qmark'))
+        self.assertEqual(statistics.stats('calls')[0]['calls'], 2)
+
+    def test_eviction(self):
+        statistics = ShapeStatistics(max_shapes=20)
+        for _ in range(3):
+            statistics.record('hot', 0.1)
+        for i in range(30):
+            statistics.record(f'cold {i}', 0.1)
+        self.assertLessEqual(len(statistics), 20)
+        self.assertEqual(statistics.evictions, 31 - len(statistics))
+        self.assertIn('hot', [x['shape'] for x in statistics.stats()])
+
+    def test_threads(self):
+        statistics = ShapeStatistics()
+
+        def work():
+            for i in range(1000):
+                statistics.record(f'shape {i % 10}', 0.001)
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([x['calls'] for x in statistics.stats()], [400] * 10)
+
+    def test_executor(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'test.db')
+            conn = sql.connect(database)
+            conn.execute('CREATE TABLE user (id int, name text)')
+            conn.execute(f'INSERT INTO user VALUES {to_sql_insert([(i, str(i)) for i in range(50)])}')
+            conn.commit()
+            conn.close()
+            statistics = ShapeStatistics()
+            with SqliteExecutor(database, statistics=statistics) as executor:
+                for i in range(3):
+                    self.assertEqual(len(executor.find(f'db.user.find({{id: {{$lt: {i + 10}}}}})',
+                                                       batch_size=4).to_list()), i + 10)
+                with executor.find('db.user.find({id: 1})') as cursor:
+                    next(cursor)
+                executor.find('db.user.find({id: 1, name: "1"})')  # never read
+                executor.find('db.user.find({id: {$in: []}})').to_list()  # provably empty, the database is not used
+            stats = {x['shape']: x for x in statistics.stats()}
+            self.assertEqual({shape: x['calls'] for shape, x in stats.items()},
+                             {'find user where AND(FIELD(id $lt ?))': 3, 'find user where AND(id $eq ?)': 1})
+            self.assertEqual(stats['find user where AND(FIELD(id $lt ?))']['example'], 'db.user.find({id: {$lt: 10}})')
+            self.assertGreater(stats['find user where AND(FIELD(id $lt ?))']['total_seconds'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
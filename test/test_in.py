@@ -0,0 +1,86 @@
+import sqlite3 as sql
+import unittest
+
+from Main import mongo_to_sql
+from mongo_to_python.MongoListParser import list_parser
+from mongo_to_python.MongoQueryParser import parse
+from mongopython_to_sql.Dialect import SQLITE
+from mongopython_to_sql.RenderContext import RenderContext
+from mongopython_to_sql.SqlFromDict import sql_from_mongo
+from SqlConstants import IN_STRATEGY_JSON_EACH, IN_STRATEGY_VALUES, IN_STRATEGY_TEMP_TABLE, \
+    PARAMSTYLE_QMARK
+from test.List2DToInsert import to_sql_insert
+
+
+class LargeInTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.conn = sql.connect(':memory:')
+        c = cls.conn.cursor()
+        c.execute("CREATE TABLE item (id int, name text)")
+        cls.records = [(i, f'n{i}') for i in range(3000)]
+        c.execute(f"INSERT INTO item VALUES {to_sql_insert(cls.records)}")
+        cls.conn.commit()
+
+    def setUp(self) -> None:
+        self.c = LargeInTestCase.conn.cursor()
+
+    def test_flat_list_parsing(self):
+        self.assertEqual(list_parser('[1, -2 ,3.5, 1e2,]'), [1, -2, 3.5, 100.0])
+        self.assertEqual(list_parser('[ "a, ]", "b" ]'), ['a, ]', 'b'])
+        self.assertEqual(list_parser("['a', 'b']"), ['a', 'b'])
+        self.assertEqual(list_parser('[1, "a", null, true]'), [1, 'a', None, True])
+        self.assertRaises(ValueError, list_parser, '[1,,2]')
+        self.assertRaises(ValueError, list_parser, '[1 2]')
+
+    def test_dedupe(self):
+        query = parse('db.item.find({id: {$in: [1, 2, 1, true, 1.0, "1", 2, null, null]}})')
+        self.assertEqual(query.conditions, {'id': {'$in': [1, 2, True, 1.0, '1', None]}})
+
+    def test_strategies(self):
+        ids = list(range(0, 6000, 3)) * 2  # half of them match, every id twice
+        mongo = 'db.item.find({id: {$in: [' + ', '.join(map(str, ids)) + ']}, name: {$ne: "n3"}})'
+        names = 'db.item.find({name: {$in: [' + ', '.join(f'"n{i}"' for i in range(0, 6000, 7)) + ']}})'
+        expected = [r for r in self.records if r[0] % 3 == 0 and r[0] != 3]
+        expected_names = [r for r in self.records if r[0] % 7 == 0]
+        for strategy in SQLITE.in_strategies:
+            for paramstyle in (None, PARAMSTYLE_QMARK):
+                with self.subTest(strategy=strategy, paramstyle=paramstyle):
+                    for query, rows in ((mongo, expected), (names, expected_names)):
+                        context = RenderContext(paramstyle, in_threshold=100, in_strategy=strategy, dialect=SQLITE)
+                        statement = sql_from_mongo(parse(query), context=context)
+                        context.load_temp_tables(self.c)
+                        args = statement if paramstyle else (statement,)
+                        self.assertEqual(list(self.c.execute(*args)), rows)
+                        context.drop_temp_tables(self.c)
+
+    def test_threshold(self):
+        mongo = 'db.item.find({id: {$in: [1, 2, 3]}})'
+        self.assertEqual(mongo_to_sql(mongo, in_threshold=3), 'SELECT * FROM item WHERE (id IN (1, 2, 3));')
+        self.assertEqual(mongo_to_sql(mongo, in_threshold=2), 'SELECT * FROM item WHERE (id IN (1, 2, 3));')
+        self.assertEqual(mongo_to_sql(mongo, in_threshold=2, dialect='sqlite'),
+                         'SELECT * FROM "item" WHERE ("id" IN (SELECT value FROM json_each(\'[1,2,3]\')));')
+        self.assertEqual(mongo_to_sql(mongo, in_threshold=2, paramstyle=PARAMSTYLE_QMARK, dialect='sqlite'),
+                         ('SELECT * FROM "item" WHERE ("id" IN (SELECT value FROM json_each(?)));', ('[1,2,3]',)))
+        self.assertEqual(mongo_to_sql(mongo, in_threshold=2, in_strategy=IN_STRATEGY_VALUES),
+                         'SELECT * FROM item WHERE (id IN (VALUES (1), (2), (3)));')
+        self.assertEqual(mongo_to_sql('db.item.find({id: {$in: []}})', in_threshold=0),
+                         'SELECT * FROM item WHERE (id IN ());')
+        self.assertRaises(AssertionError, mongo_to_sql, mongo, in_strategy=IN_STRATEGY_TEMP_TABLE)
+        # json_each and temp tables are SQLite only
+        self.assertRaises(AssertionError, mongo_to_sql, mongo, in_threshold=2, in_strategy=IN_STRATEGY_JSON_EACH)
+        self.assertRaises(AssertionError, RenderContext, in_strategy=IN_STRATEGY_TEMP_TABLE)
+
+    def test_temp_table_names(self):
+        context = RenderContext(in_threshold=1, in_strategy=IN_STRATEGY_TEMP_TABLE, dialect=SQLITE)
+        statement = sql_from_mongo(parse('db.item.find({$or: [{id: {$in: [1, 2]}}, {name: {$in: ["a", "b"]}}]})'),
+                                   context=context)
+        self.assertEqual(len(context.temp_tables), 2)
+        for name, values in context.temp_tables:
+            self.assertIn(f'temp.{name}', statement)
+        self.assertEqual(context.temp_tables[1][1], ('a', 'b'))
+        self.assertEqual(RenderContext(dialect=SQLITE).in_strategy_for(10 ** 6), 'inline')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import json
+import unittest
+from unittest import mock
+
+from Main import mongo_to_sql
+from mongo_to_python.MongoDescentParser import MongoParser, MAX_DEPTH
+from mongo_to_python.MongoQueryParser import parse
+
+
+def parsed(query) -> str:
+    # repr keeps True, 1 and 1.0 apart
+    return repr((query.operation, query.where, query.projection, query.sort, query.limit, query.skip))
+
+
+class StrictJsonTestCase(unittest.TestCase):
+    queries = [
+        'db.user.find({})',
+        'db.user.find({"id": 1, "rate": 2.5, "big": 1e3, "neg": -0, "ok": true, "no": false, "x": null})',
+        'db.user.find({"name": "O\'Neil {a: [1]}", "u": "héllo", "$or": [{"a": {"$in": [1, 2.0, "3", true, null]}}]})',
+        'db.user.find({"a": {"$gt": 1, "$lt": 5}, "a": 3}, {"name": 1, "id": true}).sort({"age": -1, "id": 1})',
+        'db.user.count({"a": {"$ne": null}}, {"limit": 5, "skip": 1})',
+        'db.user.find({ "a" : { "$in" : [ ] } , "b" : { } })',
+        # not strict JSON, decoded by the tokens
+        'db.user.find({"a": 1, b: 2})',
+        "db.user.find({'a': 1})",
+        'db.user.find({"a": {"$in": [1, 2,]}, "b": 1,})',
+        'db.user.find({"a": "x\\\\y", "b": "\\u0041"})',
+        'db.user.find({"a": +1})',
+    ]
+
+    def test_same_as_tokens(self):
+        for mongo in self.queries:
+            with self.subTest(mongo=mongo):
+                # a max_depth below MAX_DEPTH turns the fast path off
+                self.assertEqual(parsed(parse(mongo)), parsed(parse(mongo, max_depth=MAX_DEPTH - 1)))
+
+    def test_fast_path_used(self):
+        doc = {f'f{i}': {'$gt': i, '$in': ['a', 'b']} for i in range(10)}
+        mongo = f'db.user.find({json.dumps(doc)}, {{"f1": 1}}).sort({{"f2": -1}})'
+        with mock.patch.object(MongoParser, '_parse_key', side_effect=AssertionError('tokens used')):
+            query = parse(mongo)
+            self.assertRaises(AssertionError, parse, 'db.user.find({"a": 1, b: 2})')
+        self.assertEqual(query.conditions, doc)
+        self.assertEqual(mongo_to_sql(mongo), mongo_to_sql(mongo.replace('"', "'")))
+
+    def test_errors(self):
+        for mongo in ('db.user.find({"a": 1)', 'db.user.find({"a": 1}} )', 'db.user.find({"a": 1} {"b": 1})'):
+            with self.subTest(mongo=mongo):
+                self.assertRaises(ValueError, parse, mongo)
+        deep = 'db.user.find(' + '{"$or": [' * 5000 + '{"a": 1}' + ']}' * 5000 + ')'
+        self.assertEqual(mongo_to_sql(deep), 'SELECT * FROM user WHERE ' + '(' * 5000 + '(a = 1)' + ')' * 5000 + ';')
+        self.assertRaises(ValueError, parse, deep, max_depth=100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import contextlib
+import io
+import mmap
+import os
+import tempfile
+import unittest
+
+from Main import mongo_to_sql, read_records
+from QueryLog import QueryLog, main
+
+
+class QueryLogTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'queries.log')
+        self.index_path = self.path + '.idx'
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def write(self, text: str, mode: str = 'w'):
+        with open(self.path, mode, newline='') as log_file:
+            log_file.write(text)
+
+    def test_same_as_read_records(self):
+        for text, nul_delimited in (('db.a.find()\n\n  \r\ndb.b.find({name: "é"})  \ndb.c.find()', False),
+                                    ('db.a.find()\n', False), ('', False), ('\n\n', False),
+                                    ('db.a.find()\0\0db.b.find({a:\n1})\0', True)):
+            with self.subTest(text=text):
+                self.write(text)
+                with QueryLog(self.path, nul_delimited) as log, \
+                        open(self.path, newline='' if nul_delimited else None) as source:
+                    self.assertEqual(list(log.queries()), list(read_records(source, nul_delimited)))
+
+    def test_zero_copy_ranges(self):
+        self.write(''.join(f'db.user.find({{id: {i}}})\n' for i in range(10)))
+        with QueryLog(self.path) as log:
+            self.assertEqual(len(log), 10)
+            number, record = next(log.records(3))
+            self.assertEqual((number, bytes(record)), (4, b'db.user.find({id: 3})'))
+            self.assertIsInstance(record.obj, mmap.mmap)
+            record.release()
+            self.assertEqual([number for number, _ in log.queries(8, 20)], [9, 10])
+            self.assertEqual(list(log.queries(20)), [])
+            shards = [log.shard(i, 3) for i in range(3)]
+            self.assertEqual(shards, [(0, 3), (3, 6), (6, 10)])
+            self.assertEqual([q for shard in shards for q in log.queries(*shard)], list(log.queries()))
+
+    def test_index(self):
+        self.write('db.a.find()\ndb.b.find()\ndb.c.f')
+        with QueryLog(self.path, index_path=self.index_path) as log:
+            self.assertFalse(log.index_loaded)
+            self.assertTrue(log.index_outdated)
+            log.save_index()
+            self.assertFalse(log.index_outdated)
+        self.write('ind()\ndb.d.find()\n', 'a')  # the partial record was not indexed
+        with QueryLog(self.path, index_path=self.index_path) as log:
+            self.assertTrue(log.index_loaded)
+            self.assertTrue(log.index_outdated)
+            self.assertEqual([q for _, q in log.queries()], ['db.a.find()', 'db.b.find()', 'db.c.find()', 'db.d.find()'])
+            log.save_index()
+        with QueryLog(self.path, index_path=self.index_path) as log:
+            self.assertTrue(log.index_loaded)
+            self.assertFalse(log.index_outdated)
+        # a rotated log, a shorter log and another delimiter do not use the index
+        for text, nul_delimited in (('db.x.find()\ndb.y.find()\ndb.z.find()\ndb.w.find()\n', False),
+                                    ('db.a.find()\n', False), ('db.a.find()\ndb.b.find()\ndb.c.find()\n', True)):
+            with self.subTest(text=text, nul_delimited=nul_delimited):
+                self.write(text)
+                with QueryLog(self.path, nul_delimited, self.index_path) as log, \
+                        open(self.path, newline='') as source:
+                    self.assertFalse(log.index_loaded)
+                    self.assertEqual(list(log.queries()), list(read_records(source, nul_delimited)))
+        with open(self.index_path, 'wb') as index_file:
+            index_file.write(b'garbage')
+        with QueryLog(self.path, index_path=self.index_path) as log:
+            self.assertFalse(log.index_loaded)
+
+    def test_empty_ranges(self):
+        self.write('db.a.find()\ndb.b.find()')  # the last record has no delimiter
+        with QueryLog(self.path) as log:
+            self.assertEqual(len(log), 2)
+            for start in (2, 3):
+                with self.subTest(start=start):
+                    self.assertEqual(list(log.records(start)), [])
+                    self.assertEqual(list(log.queries(start, 5)), [])
+            self.assertEqual(list(log.queries(1, 1)), [])
+            self.assertEqual(list(log.queries(1)), [(2, 'db.b.find()')])
+
+    def test_main(self):
+        queries = [f'db.user.find({{id: {i}}})' for i in range(6)] + ['db.user.find({id: })']
+        self.write('\n'.join(queries))
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            self.assertEqual(main(['--input', self.path, '--index', self.index_path, '--shard', '1', '--shards', '2']), 1)
+        self.assertTrue(os.path.exists(self.index_path))
+        self.assertEqual(out.getvalue(), ''.join(mongo_to_sql(q) + '\n' for q in queries[3:6]))
+        self.assertTrue(err.getvalue().startswith('line 7: ValueError'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,8 @@ import unittest
 
 from mongo_to_python.MongoJsonLeafToDict import leaf_parse
 from mongo_to_python.MongoJsonToDict import to_dict
+from mongo_to_python.MongoListParser import list_parser
+from mongo_to_python.MongoQueryParser import parse
 
 
 class MyTestCase(unittest.TestCase):
@@ -26,6 +28,54 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(val, {'type': 1, '$or': [{'type':{'$ne': "rose"}}, {'type':{'$ne': "rose"}}]})
         self.assertEqual(val2, {'type': {'$ne': 'rose'}, '$or': [{'type':{'$ne': "rose"}}, {'type':{'$ne': "rose"}}]})
         self.assertEqual(to_dict('{_id: 1}'), {'_id': 1})
+        self.assertEqual(to_dict('{"_id": 1, \'name\': "a"}'), {'_id': 1, 'name': 'a'})
+        self.assertEqual(to_dict('  '), {})
+        self.assertEqual(to_dict('{$and: [{$or: [{a: {$in: [1, "}"]}}, {b: null}]}, {c: {$gt: -1.5}}]}'),
+                         {'$and': [{'$or': [{'a': {'$in': [1, '}']}}, {'b': None}]}, {'c': {'$gt': -1.5}}]})
+
+    def test_list(self):
+        self.assertEqual(list_parser('[false, null, 1]'), [False, None, 1])
+        self.assertEqual(list_parser('[ ]'), [])
+        self.assertEqual(list_parser('["a,b", \'[c]\', 2.5,]'), ['a,b', '[c]', 2.5])
+
+    def test_parse(self):
+        query = parse('db.user.find( {id: {$ne: 1}} , {id: 1} )')
+        self.assertEqual(query.table, 'user')
+        self.assertEqual(query.conditions, {'id': {'$ne': 1}})
+        self.assertEqual(query.projection, {'id': 1})
+        self.assertEqual(parse('db.user.find()').conditions, {})
+
+    def test_count_distinct(self):
+        query = parse('db.user.countDocuments({a: 1}, {limit: 5, skip: 2})')
+        self.assertEqual((query.operation, query.conditions, query.limit, query.skip), ('count', {'a': 1}, 5, 2))
+        query = parse('db.user.find({a: 1}).sort({b: 1}).limit(3).count()')
+        self.assertEqual((query.operation, query.sort, query.limit), ('count', [], None))
+        self.assertEqual(parse('db.user.find().skip(3).count(true)').skip, 3)
+        query = parse("db.user.distinct('name', {a: {$gt: 1}})")
+        self.assertEqual((query.operation, query.distinct_field, query.conditions), ('distinct', 'name', {'a': {'$gt': 1}}))
+        self.assertEqual(parse('db.user.count()').operation, 'count')
+        for bad in ['db.user.count({}, {hint: 1})', 'db.user.distinct()', 'db.user.distinct(name)',
+                    'db.user.distinct("")', 'db.user.find().count(1)', 'db.user.find().count().limit(1)',
+                    'db.user.count().limit(1)', 'db.user.aggregate([])']:
+            with self.subTest(bad=bad):
+                self.assertRaises(ValueError, parse, bad)
+
+    def test_cursor_methods(self):
+        query = parse('db.user.find({a: 1}).limit(-5) .sort({age: -1, "id": 1}).skip(10)')
+        self.assertEqual((query.sort, query.limit, query.skip), ([('age', -1), ('id', 1)], 5, 10))
+        query = parse('db.user.find().sort({a: 1}).sort({b: -1}).limit(0).skip(0)')
+        self.assertEqual((query.sort, query.limit, query.skip), ([('b', -1)], None, None))
+        for bad in ['db.user.find().sort({a: 2})', 'db.user.find().sort({a: true})', 'db.user.find().limit("1")',
+                    'db.user.find().limit(1.5)', 'db.user.find().skip(-1)', 'db.user.find().explain()',
+                    'db.user.find().limit(1', 'db.user.find().limit()', 'db.user.find().limit(1) x']:
+            with self.subTest(bad=bad):
+                self.assertRaises(ValueError, parse, bad)
+
+    def test_malformed(self):
+        for bad in ['db.user.find({a: })', 'db.user.find({a: 1)', 'db.user.find({a: "1})', 'db.user.find(',
+                    'db.user.find() extra', 'db.user.update({})', 'user.find({})', 'db.user.find({a: abc})']:
+            with self.subTest(bad=bad):
+                self.assertRaises(ValueError, parse, bad)
 
 
 if __name__ == '__main__':
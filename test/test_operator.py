@@ -2,6 +2,7 @@ import sqlite3 as sql
 import unittest
 
 from Main import mongo_to_sql
+from SqlConstants import PARAMSTYLE_QMARK
 from test.List2DToInsert import to_sql_insert
 
 
@@ -43,6 +44,11 @@ class MongoOperatorTestCase(unittest.TestCase):
             with self.subTest(i=i):
                 result = self.query(cases[i][0])
                 self.assertEqual(result, cases[i][1])
+            with self.subTest(i=i, paramstyle=PARAMSTYLE_QMARK):
+                self.assertEqual(list(self.c.execute(*mongo_to_sql(cases[i][0], paramstyle=PARAMSTYLE_QMARK))),
+                                 cases[i][1])
+            with self.subTest(i=i, optimize=True):
+                self.assertEqual(list(self.c.execute(mongo_to_sql(cases[i][0], optimize=True))), cases[i][1])
 
     def test_all(self):
         self.case_iter([
@@ -161,6 +167,23 @@ class MongoOperatorTestCase(unittest.TestCase):
             ('db.user.find({rate: {$ne: 15.3} })', list(filter(lambda r: r[2] != 15.3, self.records))),
         ])
 
+    def test_count(self):
+        self.case_iter([
+            ('db.user.count()', [(5,)]),
+            ('db.user.count({id: {$gt: 1}})', [(3,)]),
+            ('db.user.countDocuments({id: {$gt: 1}}, {limit: 2})', [(2,)]),
+            ('db.user.countDocuments({}, {skip: 4})', [(1,)]),
+            ('db.user.find({rate: {$lt: 16}}).limit(1).count()', [(3,)]),
+            ('db.user.find({rate: {$lt: 16}}).limit(1).count(true)', [(1,)]),
+            ('db.user.count({id: {$gt: 3, $lt: 1}})', [(0,)]),
+        ])
+
+    def test_distinct(self):
+        self.case_iter([
+            ('db.user.distinct("name", {id: {$in: [1, 2]}})', [('B',), ('C',)]),
+            ('db.user.distinct("id", {id: {$lt: 0}})', []),
+        ])
+
     def test_projection(self):
         self.case_iter([
             ('db.user.find({}, {id: 1})', list(map(lambda r: tuple([r[0]]), self.records))),
@@ -0,0 +1,132 @@
+import sqlite3 as sql
+import unittest
+
+from Main import mongo_to_sql
+from mongo_to_python.MongoQueryParser import parse
+from mongo_to_python.QueryAst import from_dict, And, In, Between, Never, FieldPredicate, Literal, GROUP_DOCUMENT
+from mongo_to_python.QueryOptimizer import optimize, optimize_query
+from mongopython_to_sql.SqlFromDict import sql_from_mongo
+from test.List2DToInsert import to_sql_insert
+
+
+class OptimizerTestCase(unittest.TestCase):
+    def optimized_sql(self, mongo):
+        query = parse(mongo)
+        optimize_query(query)
+        return sql_from_mongo(query)
+
+    def test_rewrites(self):
+        cases = [
+            ('db.t.find({$and: [{$and: [{a: 1}, {b: 2}]}, {c: 3}]})',
+             'SELECT * FROM t WHERE (a = 1) AND (b = 2) AND (c = 3);'),
+            ('db.t.find({$or: [{id: 1}, {id: 2}, {id: {$in: [3, 1]}}, {name: "x"}, {id: null}]})',
+             "SELECT * FROM t WHERE ((id IN (1, 2, 3)) OR (name = 'x') OR (id IS NULL));"),
+            ('db.t.find({age: {$gte: 1, $lte: 5}, x: {$gt: 1, $gte: 3, $lt: 10, $lte: 10}})',
+             'SELECT * FROM t WHERE (age BETWEEN 1 AND 5) AND (x >= 3) AND (x < 10);'),
+            ('db.t.find({$or: [{a: 1}]})', 'SELECT * FROM t WHERE (a = 1);'),
+            ('db.t.find({$or: [{a: 1}, {a: 1}, {$or: [{b: 2}, {a: 1}]}]})',
+             'SELECT * FROM t WHERE ((a = 1) OR (b = 2));'),
+            ('db.t.find({a: {$gt: 1, $lt: "z"}})', "SELECT * FROM t WHERE (a > 1) AND (a < 'z');"),
+            ('db.t.find({a: {$gt: 1, $gt: "b"}})', "SELECT * FROM t WHERE (a > 'b');"),
+            ('db.t.find({a: 1})', 'SELECT * FROM t WHERE (a = 1);'),
+            ('db.t.find({})', 'SELECT * FROM t;'),
+        ]
+        for mongo, expected in cases:
+            with self.subTest(mongo=mongo):
+                self.assertEqual(self.optimized_sql(mongo), expected)
+
+    def test_contradictions(self):
+        empty = [
+            'db.t.find({age: {$gt: 50, $lt: 10}})',
+            'db.t.find({a: {$gt: 3, $lte: 3}})',
+            'db.t.find({id: {$in: []}})',
+            'db.t.find({id: {$in: [null]}})',
+            'db.t.find({a: 1, $and: [{a: 2}]})',
+            'db.t.find({a: {$in: [1, 2, 3]}, $and: [{a: {$in: [3, 4]}}, {a: {$ne: 3}}]})',
+            'db.t.find({a: 5, $and: [{a: {$lt: 5}}]})',
+            'db.t.find({a: null, $and: [{a: 3}]})',
+            'db.t.find({a: null, $and: [{a: {$ne: null}}]})',
+            'db.t.find({$or: [{a: {$in: []}}, {b: {$gt: 2, $lt: 1}}]})',
+            'db.t.find({a: "x", $and: [{a: 1}, {a: {$in: [2, "y"]}}, {a: {$in: [2, 3]}}]})',
+            'db.t.find({$or: []})',
+        ]
+        for mongo in empty:
+            with self.subTest(mongo=mongo):
+                query = parse(mongo)
+                self.assertFalse(query.provably_empty)
+                optimize_query(query)
+                self.assertTrue(query.provably_empty)
+                self.assertEqual(query.where, And([Never()], GROUP_DOCUMENT))
+                self.assertEqual(sql_from_mongo(query), 'SELECT * FROM t WHERE (1 = 0);')
+        satisfiable = [
+            'db.t.find({a: {$gte: 3, $lte: 3}})',
+            'db.t.find({a: 1, $and: [{a: "1"}]})',  # SQL type affinity may make these equal
+            'db.t.find({a: true, $and: [{a: 1}]})',
+            'db.t.find({a: {$in: [1, 2]}, $and: [{a: {$ne: 1}}, {a: {$ne: null}}]})',
+            'db.t.find({a: 1, $or: [{a: {$in: [2, 3]}}, {c: 1}]})',
+            # strings compare by the collation of the database. Ex/ 'x' = 'X' under the default MySQL collation
+            'db.t.find({b: {$gt: "b", $lt: "a"}})',
+            'db.t.find({a: "x", $and: [{a: "X"}]})',
+            'db.t.find({a: {$in: ["x", "y"]}, $and: [{a: {$in: ["X"]}}]})',
+        ]
+        for mongo in satisfiable:
+            with self.subTest(mongo=mongo):
+                query = parse(mongo)
+                optimize_query(query)
+                self.assertFalse(query.provably_empty)
+        self.assertEqual(self.optimized_sql('db.t.find({$or: [{a: {$gt: 5, $lt: 1}}, {b: 1}]})'),
+                         'SELECT * FROM t WHERE (b = 1);')
+        self.assertEqual(self.optimized_sql('db.t.find({a: {$gt: "a"}, $and: [{a: {$gt: "B"}}]})'),
+                         "SELECT * FROM t WHERE (a > 'a') AND (a > 'B');")
+
+    def test_tautologies(self):
+        self.assertEqual(self.optimized_sql('db.t.find({$or: [{a: null}, {a: {$ne: null}}], b: 1})'),
+                         'SELECT * FROM t WHERE (b = 1);')
+        self.assertEqual(self.optimized_sql('db.t.find({$or: [{}, {a: 1}]})'), 'SELECT * FROM t;')
+        self.assertEqual(self.optimized_sql('db.t.find({$and: []})'), 'SELECT * FROM t;')
+        # an empty field group is not an empty query, it is rendered as it is
+        for mongo in ('db.t.find({a: {}})', 'db.t.find({a: {}, b: 1})', 'db.t.find({a: {}, b: {}})',
+                      'db.t.find({$or: [{a: {}}, {b: 1}]})'):
+            with self.subTest(mongo=mongo):
+                self.assertEqual(self.optimized_sql(mongo), mongo_to_sql(mongo))
+
+    def test_report(self):
+        query = parse('db.t.find({$or: [{a: 1}, {a: 1}, {a: 1}, {b: {$gte: 1, $lte: 2}}]})')
+        report = optimize_query(query)
+        self.assertEqual(list(report), ['merged the bounds of b into BETWEEN', 'removed duplicate condition (x2)'])
+        self.assertEqual(len(report), 3)
+        _, report = optimize(from_dict({'a': 1}))
+        self.assertFalse(report)
+        self.assertEqual(str(report), 'no rewrites')
+
+    def test_input_unchanged(self):
+        node = from_dict({'$or': [{'a': 1}, {'a': 2}]})
+        optimized, _ = optimize(node)
+        self.assertEqual(node, from_dict({'$or': [{'a': 1}, {'a': 2}]}))
+        self.assertEqual(optimized, And([In('a', (1, 2))], GROUP_DOCUMENT))
+        self.assertEqual(optimize(from_dict({'a': {'$gte': 1, '$lte': 2}}))[0],
+                         And([Between('a', Literal(1), Literal(2))], GROUP_DOCUMENT))
+        self.assertEqual(Between('a', Literal(1), Literal(2)).to_dict(), {'a': {'$gte': 1, '$lte': 2}})
+        self.assertRaises(AssertionError, Between, 'a', Literal(None), Literal(1))
+        self.assertEqual(optimize(from_dict({'a': {'$ne': None}}))[0],
+                         And([FieldPredicate('a', '$ne', Literal(None))], GROUP_DOCUMENT))
+
+    def test_same_rows(self):
+        conn = sql.connect(':memory:')
+        c = conn.cursor()
+        c.execute('CREATE TABLE user (id int, name text, rate real)')
+        c.execute(f"INSERT INTO user VALUES {to_sql_insert([(0, 'A', 1.1), (1, 'B', 10.2), (2, None, 15.3), (3, 'D', None)])}")
+        for mongo in ['db.user.find({$or: [{id: 0}, {id: 2}, {name: null}, {id: {$in: [3]}}]})',
+                      'db.user.find({rate: {$gte: 1.1, $lte: 15.3, $lt: 15.3}, id: {$gt: -1, $gt: 0}})',
+                      'db.user.find({$and: [{$or: [{id: 1}, {id: 1}]}, {$and: [{rate: {$gte: 10.2}}]}]})',
+                      'db.user.find({$or: [{name: "A"}, {name: "D"}, {$and: [{id: {$lte: 2}}, {id: {$gte: 2}}]}]})',
+                      'db.user.find({$or: [{name: null}, {name: {$ne: null}}]})',
+                      'db.user.find({$or: [{id: {$gt: 2, $lte: 2}}, {rate: {$in: [1.1, 15.3]}, $and: [{rate: 1.1}]}]})',
+                      'db.user.find({name: null, $and: [{name: {$ne: "A"}}]})']:
+            with self.subTest(mongo=mongo):
+                expected = sorted(c.execute(mongo_to_sql(mongo)).fetchall(), key=repr)
+                self.assertEqual(sorted(c.execute(mongo_to_sql(mongo, optimize=True)).fetchall(), key=repr), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
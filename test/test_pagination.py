@@ -0,0 +1,64 @@
+import sqlite3 as sql
+import unittest
+
+from Main import mongo_to_sql
+from mongo_to_python.KeysetPagination import keyset_condition, seek_after
+from mongo_to_python.MongoQueryParser import parse
+from mongopython_to_sql.SqlFromDict import sql_from_mongo
+from SqlConstants import PARAMSTYLE_QMARK
+from test.List2DToInsert import to_sql_insert
+
+
+class PaginationTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.conn = sql.connect(':memory:')
+        # few distinct ages so that the pages have to break ties on id
+        cls.records = [(i, i % 7, chr(ord('A') + i % 3)) for i in range(60)]
+        cls.conn.execute('CREATE TABLE user (id int, age int, name text)')
+        cls.conn.execute(f'INSERT INTO user VALUES {to_sql_insert(cls.records)}')
+
+    def test_sql(self):
+        self.assertEqual(mongo_to_sql('db.user.find({}).sort({age: 1, id: 1}).skip(100000).limit(10)',
+                                      after={'age': 30, 'id': 17, 'name': 'x'}),
+                         'SELECT * FROM user WHERE (age >= 30) AND ((age > 30) OR (age = 30) AND (id > 17)) '
+                         'ORDER BY age ASC, id ASC LIMIT 10;')
+        self.assertEqual(mongo_to_sql('db.user.find({name: "A"}).sort({id: -1}).limit(10)', after=[5],
+                                      paramstyle=PARAMSTYLE_QMARK),
+                         ('SELECT * FROM user WHERE (name = ?) AND (id < ?) ORDER BY id DESC LIMIT 10;', ('A', 5)))
+        self.assertRaises(AssertionError, keyset_condition, [], [])
+        self.assertRaises(AssertionError, keyset_condition, [('a', 1)], {'b': 1})
+        self.assertRaises(AssertionError, keyset_condition, [('a', 1)], [1, 2])
+        self.assertRaises(AssertionError, keyset_condition, [('a', 1)], [None])
+
+    def test_pages_match_offset(self):
+        for mongo in ['db.user.find({}).sort({age: 1, id: 1})', 'db.user.find({}).sort({age: -1, id: 1})',
+                      'db.user.find({name: {$ne: "B"}}).sort({name: -1, age: 1, id: -1})',
+                      'db.user.find({$or: [{age: 1}, {age: 2}]}, {id: 1, age: 1}).sort({id: 1})']:
+            with self.subTest(mongo=mongo):
+                expected = self.conn.execute(mongo_to_sql(mongo)).fetchall()
+                query = parse(mongo)
+                columns = [column for column, _ in query.sort]
+                pages = []
+                last_seen = None
+                while True:
+                    query = parse(mongo + '.limit(7)')
+                    if last_seen is not None:
+                        seek_after(query, last_seen)
+                    cursor = self.conn.execute(*sql_from_mongo(query, paramstyle=PARAMSTYLE_QMARK))
+                    names = [x[0] for x in cursor.description]
+                    page = cursor.fetchall()
+                    if not page:
+                        break
+                    pages.extend(page)
+                    last_seen = {column: page[-1][names.index(column)] for column in columns}
+                self.assertEqual(pages, expected)
+
+    def test_skip_dropped(self):
+        query = seek_after(parse('db.user.find({age: 1}).sort({id: 1}).skip(500)'), {'id': 3})
+        self.assertIsNone(query.skip)
+        self.assertEqual(query.conditions, {'age': 1, 'id': {'$gt': 3}})
+
+
+if __name__ == '__main__':
+    unittest.main()
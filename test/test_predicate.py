@@ -0,0 +1,128 @@
+import contextlib
+import io
+import json
+import os
+import sqlite3 as sql
+import tempfile
+import unittest
+
+from Main import mongo_to_sql
+from mongo_to_python.MongoQueryParser import parse
+from PredicateCompiler import compile_predicate, filter_documents, main
+
+FIELDS = ('id', 'age', 'rate', 'name', 'flag')
+# None is null in sqlite and a missing key in the documents
+RECORDS = [(i, [18, 25, 33, None, 47, 61][i % 6], [1.5, None, 3.25][i % 3], [None, 'ann', 'bob', 'cy', 'di'][i % 5],
+            i % 4 == 0) for i in range(60)]
+DOCUMENTS = [{field: value for field, value in zip(FIELDS, record) if value is not None} for record in RECORDS]
+QUERIES = [
+    '{}',
+    '{age: 25}',
+    '{age: {$gt: 25, $lte: 47}}',
+    '{age: null}',
+    '{age: {$ne: null}, rate: null}',
+    '{age: {$ne: 33}}',
+    '{rate: {$ne: 1.5}}',
+    '{rate: {$gte: 2}, flag: true}',
+    '{flag: false, name: {$in: ["ann", "cy", null]}}',
+    '{id: {$in: [1, 2, 3, 50, 70]}, age: {$in: [18, 25, 61]}}',
+    '{name: {$lt: "c"}}',
+    '{age: {$lt: null}}',
+    '{$or: [{age: 18}, {name: "bob", rate: {$lt: 3}}, {id: {$gt: 55}}]}',
+    '{$and: [{$or: [{age: {$lt: 30}}, {age: {$gt: 50}}]}, {$or: [{flag: true}, {name: null}]}]}',
+    '{$or: [{id: {$in: []}}, {$and: [{age: {$in: []}}, {id: 1}]}, {id: 2}]}',
+    '{age: {$gt: 50, $lt: 10}}',
+]
+
+
+class CountingDocument(dict):
+    """
+    Counts the fields read by a predicate
+    """
+    reads = 0
+
+    def get(self, key, default=None):
+        CountingDocument.reads += 1
+        return super().get(key, default)
+
+
+class PredicateTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.connection = sql.connect(':memory:')
+        cls.connection.execute('CREATE TABLE user (id int, age int, rate real, name text, flag bool)')
+        cls.connection.executemany('INSERT INTO user VALUES (?, ?, ?, ?, ?)', RECORDS)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.connection.close()
+
+    def test_same_documents_as_sqlite(self):
+        for conditions in QUERIES:
+            with self.subTest(conditions=conditions):
+                sql_query = mongo_to_sql(f'db.user.find({conditions}, {{id: 1}})', dialect='sqlite')
+                expected = [row[0] for row in self.connection.execute(sql_query)]
+                self.assertEqual([x['id'] for x in DOCUMENTS if compile_predicate(conditions)(x)], expected)
+                where = parse(f'db.user.find({conditions})').where
+                self.assertEqual([x['id'] for x in filter_documents(where, DOCUMENTS)], expected)
+                self.assertEqual([x['id'] for x in filter_documents(where.to_dict(), DOCUMENTS)], expected)
+
+    def test_values(self):
+        predicate = compile_predicate({'tags': {'$in': [1, 'a']}, 'n': {'$gt': 1}})
+        self.assertTrue(predicate({'tags': 'a', 'n': 2}))
+        self.assertFalse(predicate({'tags': ['a'], 'n': 2}))  # unhashable
+        self.assertFalse(predicate({'tags': 1, 'n': '2'}))  # cannot be ordered
+        self.assertFalse(compile_predicate({'a': 1})({'a': '1'}))
+        self.assertTrue(compile_predicate({'a': {'$ne': 1}})({'a': '1'}))
+        self.assertTrue(compile_predicate({'a': 1})({'a': True}))  # TRUE = 1 in SQL
+        self.assertTrue(compile_predicate({})({}))
+
+    def test_cheap_first(self):
+        predicate = compile_predicate('{$or: [{a: {$gt: 1}}, {b: {$lt: 3}}], c: {$lte: 5}, d: 1}')
+        CountingDocument.reads = 0
+        self.assertFalse(predicate(CountingDocument(a=2, c=1, d=2)))
+        self.assertEqual(CountingDocument.reads, 1)  # d decides before the range and the $or
+        CountingDocument.reads = 0
+        self.assertTrue(predicate(CountingDocument(a=2, c=1, d=1)))
+        self.assertEqual(CountingDocument.reads, 3)  # d, c, then a decides the $or
+        # a condition that never matches decides the $and without reading the document
+        CountingDocument.reads = 0
+        self.assertFalse(compile_predicate('{a: 1, b: {$gt: null}}')(CountingDocument(a=1)))
+        self.assertEqual(CountingDocument.reads, 0)
+
+    def test_lazy_stream(self):
+        read = []
+
+        def documents():
+            for document in DOCUMENTS:
+                read.append(document['id'])
+                yield document
+        matches = filter_documents('db.user.find({flag: true}, {id: 1, name: 1}).skip(1).limit(3)', documents())
+        self.assertEqual(read, [])
+        self.assertEqual(list(matches), [{'id': 4, 'name': 'di'}, {'id': 8, 'name': 'cy'}, {'id': 12, 'name': 'bob'}])
+        self.assertEqual(read, list(range(13)))
+        self.assertEqual(list(filter_documents('db.user.find({id: {$lt: 2}}, {age: 0, rate: 0})', DOCUMENTS)),
+                         [{'id': 0, 'flag': True}, {'id': 1, 'name': 'ann', 'flag': False}])
+        self.assertRaises(AssertionError, filter_documents, 'db.user.find({}).sort({id: 1})', DOCUMENTS)
+        self.assertRaises(AssertionError, filter_documents, 'db.user.count({})', DOCUMENTS)
+
+    def test_deep(self):
+        conditions = '{id: 0}'
+        for i in range(1, 5000):
+            conditions = f'{{$or: [{conditions}, {{$and: [{{id: {i}}}, {{flag: true}}]}}]}}'
+        predicate = compile_predicate(conditions)
+        self.assertEqual([x['id'] for x in DOCUMENTS if predicate(x)], [x['id'] for x in DOCUMENTS if x['flag']])
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'documents.jsonl')
+            with open(path, 'w') as documents:
+                documents.write('\n'.join(json.dumps(x) for x in DOCUMENTS[:10]) + '\n\n')
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                self.assertEqual(main(['db.user.find({age: {$gte: 47}}, {id: 1})', '--input', path]), 0)
+        self.assertEqual(out.getvalue(), '{"id": 4}\n{"id": 5}\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+
+from Main import mongo_to_sql
+from StageProfiler import StageProfiler, StageStats, StageTiming, profiling, enable, disable, active_profiler, \
+    count_nodes, STAGE_PARSE, STAGE_SEEK, STAGE_OPTIMIZE, STAGE_RENDER, BUCKET_BOUNDS_US
+from mongo_to_python.MongoQueryParser import parse
+
+
+class ProfilerTestCase(unittest.TestCase):
+    def tearDown(self) -> None:
+        disable()
+
+    def test_stages(self):
+        timings = []
+        mongo = 'db.user.find({id: {$in: [1, 2, 3]}, age: {$gt: 1}}).sort({id: 1})'
+        with profiling(StageProfiler(callbacks=[timings.append])) as profiler:
+            sql = mongo_to_sql(mongo, optimize=True, after={'id': 7})
+            self.assertIs(active_profiler(), profiler)
+        self.assertIsNone(active_profiler())
+        self.assertEqual([x.stage for x in timings], [STAGE_PARSE, STAGE_SEEK, STAGE_OPTIMIZE, STAGE_RENDER])
+        self.assertEqual(timings[0].input_size, len(mongo))
+        self.assertEqual(timings[0].output_size, count_nodes(parse(mongo).where))
+        for before, after in zip(timings, timings[1:]):
+            self.assertEqual(after.input_size, before.output_size)
+        self.assertEqual(timings[-1].output_size, len(sql))
+        stats = profiler.stats()
+        self.assertEqual(list(stats), [STAGE_PARSE, STAGE_SEEK, STAGE_OPTIMIZE, STAGE_RENDER])
+        self.assertEqual(stats[STAGE_PARSE]['calls'], 1)
+        self.assertEqual(sum(stats[STAGE_RENDER]['histogram'].values()), 1)
+        self.assertIn('optimize latency', profiler.snapshot())
+
+    def test_disabled(self):
+        profiler = enable()
+        mongo_to_sql('db.user.find({id: 1})', paramstyle='qmark')
+        self.assertEqual(list(profiler.stats()), [STAGE_PARSE, STAGE_RENDER])
+        disable()
+        mongo_to_sql('db.user.find({id: 1})')
+        self.assertEqual(profiler.stats()[STAGE_PARSE]['calls'], 1)
+        profiler.reset()
+        self.assertEqual(profiler.stats(), {})
+
+    def test_failure_not_recorded(self):
+        with profiling() as profiler:
+            self.assertRaises(ValueError, mongo_to_sql, 'db.user.find({id: })')
+        self.assertEqual(profiler.stats(), {})
+
+    def test_histogram(self):
+        stats = StageStats()
+        for microseconds in (5, 5, 15, 40, 2e6):
+            stats.add(StageTiming('parse', microseconds / 1e6))
+        self.assertEqual(stats.histogram[:3], [2, 1, 1])
+        self.assertEqual(stats.histogram[-1], 1)
+        self.assertEqual(stats.percentile_us(50), BUCKET_BOUNDS_US[0])
+        self.assertEqual(stats.percentile_us(90), BUCKET_BOUNDS_US[2])
+        self.assertAlmostEqual(stats.percentile_us(99), 2e6)
+
+    def test_count_nodes(self):
+        self.assertEqual(count_nodes(parse('db.user.find({})').where), 1)
+        # And(document) > And(field) > In with 2 values
+        self.assertEqual(count_nodes(parse('db.user.find({id: {$in: [1, 2]}})').where), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ import sqlite3 as sql
 import unittest
 
 from Main import mongo_to_sql
+from SqlConstants import PARAMSTYLE_QMARK
 from test.List2DToInsert import to_sql_insert
 
 
@@ -54,6 +55,9 @@ class QuoteTestCase(unittest.TestCase):
                     self.assertEqual(result, cases[i][1], cases[i][2])
                 else:
                     self.assertEqual(result, cases[i][1])
+            with self.subTest(i=i, paramstyle=PARAMSTYLE_QMARK):
+                self.assertEqual(list(self.c.execute(*mongo_to_sql(cases[i][0], paramstyle=PARAMSTYLE_QMARK))),
+                                 cases[i][1])
 
     def test_double(self):
         self.case_iter([
@@ -1,8 +1,8 @@
 import unittest
 
-from SqlConstants import SQL_ALL
+from SqlConstants import SQL_ALL, PARAMSTYLE_QMARK, PARAMSTYLE_FORMAT, PARAMSTYLE_DOLLAR
 from mongopython_to_sql.DictToColumns import dict_to_columns, UNSUPPORTED_ERROR
-from mongopython_to_sql.SqlFromDict import to_sql
+from mongopython_to_sql.SqlFromDict import to_sql, count_sql
 
 
 class MyTestCase(unittest.TestCase):
@@ -64,6 +64,32 @@ class MyTestCase(unittest.TestCase):
                      None)
         self.assertTrue('(key != \'nottest\' AND key > 100)' in val or '(key > 100 AND key != \'nottest\')' in val)
 
+    def test_parameterized(self):
+        conditions = {'name': "O'Hara", 'id': {'$in': [1, 2, None]}, 'rate': {'$ne': None}, '$or': [{'a': True}]}
+        self.assertEqual(to_sql('users', conditions, {}, paramstyle=PARAMSTYLE_QMARK), (
+            'SELECT * FROM users WHERE (name = ?) AND (id IN (?, ?, NULL)) AND (rate IS NOT NULL) AND ((a = ?));',
+            ("O'Hara", 1, 2, True)))
+        self.assertEqual(to_sql('users', conditions, {}, paramstyle=PARAMSTYLE_FORMAT)[0],
+                         'SELECT * FROM users WHERE (name = %s) AND (id IN (%s, %s, NULL)) AND (rate IS NOT NULL) '
+                         'AND ((a = %s));')
+        self.assertEqual(to_sql('users', conditions, {}, paramstyle=PARAMSTYLE_DOLLAR)[0],
+                         'SELECT * FROM users WHERE (name = $1) AND (id IN ($2, $3, NULL)) AND (rate IS NOT NULL) '
+                         'AND ((a = $4));')
+        self.assertEqual(to_sql('users', {}, {}, paramstyle=PARAMSTYLE_QMARK), ('SELECT * FROM users;', ()))
+        self.assertRaises(AssertionError, to_sql, 'users', {}, {}, paramstyle='named')
+
+    def test_sort_limit_skip(self):
+        self.assertEqual(to_sql('users', {'a': 1}, {'a': 1}, sort=[('age', -1), ('id', 1)], limit=5, skip=10),
+                         'SELECT a FROM users WHERE (a = 1) ORDER BY age DESC, id ASC LIMIT 5 OFFSET 10;')
+        self.assertEqual(to_sql('users', {}, {}, limit=5), 'SELECT * FROM users LIMIT 5;')
+        self.assertEqual(to_sql('users', {}, {}, skip=5), 'SELECT * FROM users LIMIT -1 OFFSET 5;')
+        self.assertEqual(to_sql('users', {}, {}, sort=[]), 'SELECT * FROM users;')
+
+    def test_count(self):
+        self.assertEqual(count_sql('users', {'a': 1}), 'SELECT COUNT(*) FROM users WHERE (a = 1);')
+        self.assertEqual(count_sql('users', {'a': 1}, limit=5),
+                         'SELECT COUNT(*) FROM (SELECT 1 FROM users WHERE (a = 1) LIMIT 5) AS counted;')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,47 @@
+import io
+import unittest
+
+from Main import mongo_to_sql, read_records, stream_translate, READ_BLOCK_SIZE
+
+
+class StreamTestCase(unittest.TestCase):
+    def test_read_lines(self):
+        source = io.StringIO('db.a.find()\n\n  \ndb.b.find({})  \n')
+        self.assertEqual(list(read_records(source)), [(1, 'db.a.find()'), (4, 'db.b.find({})')])
+
+    def test_read_nul(self):
+        long_query = 'db.a.find({name: "' + 'x' * (READ_BLOCK_SIZE * 2) + '"})'
+        source = io.StringIO(f'db.a.find()\0\0{long_query}\0db.b.find({{a:\n1}})')
+        self.assertEqual(list(read_records(source, nul_delimited=True)),
+                         [(1, 'db.a.find()'), (3, long_query), (4, 'db.b.find({a:\n1})')])
+
+    def test_read_nul_small_blocks(self):
+        class SmallReads(io.StringIO):
+            def read(self, size=-1):
+                return super().read(3)
+        text = 'db.a.find()\0\0db.b.find({a: "' + 'y' * 100 + '"})\0db.c.find()\0'
+        self.assertEqual(list(read_records(SmallReads(text), nul_delimited=True)),
+                         list(read_records(io.StringIO(text), nul_delimited=True)))
+        self.assertEqual([x[0] for x in read_records(SmallReads(text), nul_delimited=True)], [1, 3, 4])
+
+    def test_stream(self):
+        source = io.StringIO('db.user.find({id: 1})\ndb.user.find({id: })\n\ndb.user.find({}, {id: 1})\n')
+        out = io.StringIO()
+        err = io.StringIO()
+        self.assertEqual(stream_translate(source, out, err), (2, 1))
+        self.assertEqual(out.getvalue(), f'{mongo_to_sql("db.user.find({id: 1})")}\nSELECT id FROM user;\n')
+        errors = err.getvalue().splitlines()
+        self.assertTrue(errors[0].startswith('line 2: ValueError'))
+        self.assertTrue(errors[1].startswith('translated 2, failed 1 in '))
+
+    def test_stream_nul_workers(self):
+        queries = [f'db.user.find({{id: {i}}})' for i in range(20)]
+        out = io.StringIO()
+        err = io.StringIO()
+        self.assertEqual(stream_translate(io.StringIO('\0'.join(queries)), out, err, nul_delimited=True, workers=2,
+                                          chunksize=3), (20, 0))
+        self.assertEqual(out.getvalue(), ''.join(mongo_to_sql(q) + '\0' for q in queries))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import io
+import unittest
+
+from mongo_to_python.MongoQueryParser import parse
+from mongo_to_python.QueryAst import from_dict
+from mongopython_to_sql.AstToWhere import write_conditions, ast_to_where_conditions, IN_BATCH_SIZE
+from mongopython_to_sql.RenderContext import RenderContext
+from mongopython_to_sql.SqlFromDict import write_sql, sql_from_mongo
+
+
+class ChunkRecorder(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def write(self, chunk):
+        self.chunks.append(chunk)
+        return super().write(chunk)
+
+
+class WriterTestCase(unittest.TestCase):
+    queries = [
+        'db.user.find({})',
+        'db.user.find({name: "a", age: {$gt: 1, $lt: 9}}, {name: 1}).sort({age: -1}).limit(3).skip(1)',
+        'db.user.find({$or: [{a: 1}, {$and: [{b: {$ne: null}}, {c: {$in: [1, 2, 3]}}]}], d: {$ne: "x"}})',
+        'db.user.count({a: {$gte: 1}}, {limit: 5})',
+        'db.user.count({})',
+        'db.user.distinct("a", {b: true})',
+    ]
+
+    def test_same_sql(self):
+        for mongo in self.queries:
+            for paramstyle in (None, 'dollar'):
+                with self.subTest(mongo=mongo, paramstyle=paramstyle):
+                    out = io.StringIO()
+                    expected = sql_from_mongo(parse(mongo), paramstyle)
+                    written = write_sql(parse(mongo), out, paramstyle)
+                    if paramstyle:
+                        self.assertEqual((out.getvalue(), written[1]), expected)
+                        self.assertEqual(written[0], len(expected[0]))
+                    else:
+                        self.assertEqual(out.getvalue(), expected)
+                        self.assertEqual(written, len(expected))
+
+    def test_in_strategies(self):
+        query = parse(f'db.user.find({{id: {{$in: {list(range(IN_BATCH_SIZE * 2 + 5))}}}}})')
+        for strategy in ('inline', 'values', 'json_each'):
+            with self.subTest(strategy=strategy):
+                out = io.StringIO()
+                write_sql(query, out, context=RenderContext(in_threshold=10, in_strategy=strategy, dialect='sqlite'))
+                self.assertEqual(out.getvalue(), sql_from_mongo(
+                    query, context=RenderContext(in_threshold=10, in_strategy=strategy, dialect='sqlite')))
+
+    def test_chunks(self):
+        query = parse('db.user.find({id: {$in: [1, 2, 3]}})')
+        query.where = from_dict({'$or': [{f'field{i}': i} for i in range(1000)]})
+        out = ChunkRecorder()
+        write_sql(query, out, chunk_size=100)
+        self.assertEqual(out.getvalue(), sql_from_mongo(query))
+        self.assertGreater(len(out.chunks), 100)
+        self.assertTrue(all(len(chunk) < 200 for chunk in out.chunks))
+        out = ChunkRecorder()
+        write_sql(query, out)
+        self.assertEqual(len(out.chunks), 1)
+        self.assertRaises(AssertionError, write_sql, query, out, chunk_size=0)
+
+    def test_fragments(self):
+        where = parse('db.user.find({a: 1, $or: [{b: 2}, {c: {$in: [3, 4]}}]})').where
+        fragments = []
+        write_conditions(where, fragments.append)
+        self.assertEqual(''.join(fragments), ast_to_where_conditions(where))
+        self.assertEqual(''.join(fragments), '(a = 1) AND ((b = 2) OR (c IN (3, 4)))')
+        self.assertGreater(len(fragments), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()